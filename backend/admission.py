@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Admission Control
+Decides whether a new caller gets a room now or waits in a FIFO queue, from the capacity
+agent workers report through their heartbeats and, optionally, their jobs' event-loop lag
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+from worker_heartbeat import CapacitySnapshot, WorkerHeartbeatStore
+
+logger = logging.getLogger("admission")
+
+@dataclass
+class QueueEntry:
+    ticket: str
+    name: str
+    room: str
+    enqueued_at: float
+    last_seen: float
+    seq: int
+    admitted: bool = False
+    admitted_at: Optional[float] = None
+    tenant: str = ""
+    event: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+class AdmissionController:
+    """Admits callers while the live workers have free call slots and queues the rest.
+
+    A token that was issued but whose call hasn't reached a worker yet holds a reservation,
+    so a burst of callers can't all take the same free slot. If no worker has reported a
+    heartbeat the controller admits everyone, which is how the token server behaved before.
+    With max_loop_lag_s, workers whose jobs' event loops lag behind get no new calls
+    """
+
+    def __init__(self, store: WorkerHeartbeatStore, max_queue: int = 200, refresh_interval_s: float = 1.0,
+                 stale_after_s: float = 15.0, reservation_ttl_s: float = 30.0,
+                 abandon_after_s: float = 30.0, default_call_s: float = 300.0,
+                 max_loop_lag_s: Optional[float] = None):
+        self.store = store
+        self.max_queue = max_queue
+        self.refresh_interval_s = refresh_interval_s
+        self.stale_after_s = stale_after_s
+        self.reservation_ttl_s = reservation_ttl_s
+        self.abandon_after_s = abandon_after_s
+        self.default_call_s = default_call_s
+        self.max_loop_lag_s = max_loop_lag_s
+
+        self.snapshot: Optional[CapacitySnapshot] = None
+        self._queue: "OrderedDict[str, QueueEntry]" = OrderedDict()
+        self._reservations: Dict[str, float] = {}  # room name -> expiry
+        self._seq = itertools.count()
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._reading: Optional[asyncio.Future] = None
+
+    @property
+    def limited(self) -> bool:
+        """True when workers report capacity; otherwise every caller is admitted"""
+        return self.snapshot is not None and self.snapshot.workers > 0
+
+    @property
+    def queue_length(self) -> int:
+        return sum(1 for entry in self._queue.values() if not entry.admitted)
+
+    def free_slots(self) -> int:
+        if not self.limited:
+            return self.max_queue
+        pending = sum(1 for room in self._reservations if room not in self.snapshot.rooms)
+        return max(0, self.snapshot.capacity - self.snapshot.active_calls - pending)
+
+    def _reserve(self, room: str):
+        self._reservations[room] = time.monotonic() + self.reservation_ttl_s
+
+    def try_admit(self, room: str) -> bool:
+        """Admit a new caller straight away when nobody is queued and a slot is free"""
+        if not self.limited:
+            return True
+        if self.queue_length == 0 and self.free_slots() > 0:
+            self._reserve(room)
+            return True
+        return False
+
+    def enqueue(self, name: str, room: str, tenant: str = "") -> Optional[QueueEntry]:
+        """Put a caller at the back of the queue; None when the queue is full"""
+        if self.queue_length >= self.max_queue:
+            return None
+        now = time.monotonic()
+        entry = QueueEntry(uuid.uuid4().hex, name, room, now, now, next(self._seq), tenant=tenant)
+        self._queue[entry.ticket] = entry
+        return entry
+
+    def get(self, ticket: str) -> Optional[QueueEntry]:
+        entry = self._queue.get(ticket)
+        if entry is not None:
+            entry.last_seen = time.monotonic()
+        return entry
+
+    def leave(self, ticket: str, release: bool = True) -> Optional[QueueEntry]:
+        """Remove a caller from the queue. An admitted caller keeps its slot reserved when it
+        leaves to join the room (release=False) and gives it back when it gave up"""
+        entry = self._queue.pop(ticket, None)
+        if entry is not None and entry.admitted and release:
+            self._reservations.pop(entry.room, None)
+        return entry
+
+    def position(self, entry: QueueEntry) -> int:
+        """1-based place in line; 0 once admitted"""
+        if entry.admitted:
+            return 0
+        return 1 + sum(1 for other in self._queue.values() if not other.admitted and other.seq < entry.seq)
+
+    def estimated_wait_s(self, position: int) -> int:
+        """Expected wait for the given place in line: one average call ends every
+        average_call / capacity seconds"""
+        if position <= 0:
+            return 0
+        avg_call_s = (self.snapshot.avg_call_s if self.snapshot else None) or self.default_call_s
+        capacity = max(1, self.snapshot.capacity if self.snapshot else 1)
+        return int(round(position * avg_call_s / capacity))
+
+    async def wait_for_change(self, entry: QueueEntry, timeout: float):
+        """Long-poll helper: return when the caller is admitted, the queue moves or timeout passes"""
+        if entry.admitted:
+            return
+        changed = self._changed
+        waiters = [asyncio.ensure_future(changed.wait()), asyncio.ensure_future(entry.event.wait())]
+        try:
+            await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+
+    def _notify(self):
+        # Wake every long-poll waiting on the current generation and start a new one
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def apply_snapshot(self, snapshot: Optional[CapacitySnapshot]):
+        """Update capacity, expire reservations and abandoned callers, and admit from the head"""
+        now = time.monotonic()
+        self.snapshot = snapshot
+        changed = False
+
+        # A reservation ends once its call shows up on a worker, or when it expires
+        for room, expires_at in list(self._reservations.items()):
+            if expires_at < now or (snapshot is not None and room in snapshot.rooms):
+                del self._reservations[room]
+
+        for ticket, entry in list(self._queue.items()):
+            expired = entry.admitted and entry.admitted_at + self.reservation_ttl_s < now
+            if expired or entry.last_seen + self.abandon_after_s < now:
+                self.leave(ticket)
+                changed = True
+
+        free = self.free_slots()
+        for entry in self._queue.values():
+            if free <= 0:
+                break
+            if entry.admitted:
+                continue
+            entry.admitted = True
+            entry.admitted_at = now
+            self._reserve(entry.room)
+            entry.event.set()
+            free -= 1
+            changed = True
+
+        if changed:
+            self._notify()
+
+    async def refresh(self):
+        try:
+            # Shielded so aclose() can wait for a read in progress rather than leave it running
+            self._reading = asyncio.ensure_future(asyncio.to_thread(self.store.snapshot, self.stale_after_s,
+                                                                    max_loop_lag_s=self.max_loop_lag_s))
+            snapshot = await asyncio.shield(self._reading)
+        except Exception as e:
+            logger.error(f"Error reading worker heartbeats: {e}")
+            snapshot = None
+        self.apply_snapshot(snapshot)
+
+    async def _run(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_interval_s)
+
+    async def start(self):
+        await self.refresh()
+        self._task = asyncio.create_task(self._run())
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._reading is not None:
+            await asyncio.gather(self._reading, return_exceptions=True)
+            self._reading = None
+        self._notify()
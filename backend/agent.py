@@ -2,23 +2,114 @@ from __future__ import annotations
 from livekit.agents import (
     AutoSubscribe,
     JobContext,
+    JobProcess,
     WorkerOptions,
     cli,
-    llm
+    llm,
+    metrics
 )
 from livekit.agents import voice
 from livekit.plugins import openai
+from openai.types.beta.realtime.session import InputAudioTranscription
 from dotenv import load_dotenv
-from api import AssistantFnc
+from api import AssistantFnc, DB, JOURNAL, TENANTS
+from asset_inventory import asset_inventory
+from building_directory import building_directory
 from prompts import WELCOME_MESSAGE, INSTRUCTIONS, LOOKUP_TICKET_MESSAGE
 from token_tracker import token_tracker
+from db_token_usage import token_db
+from db_transcript import transcript_db, transcript_writer
+from inc_fastpath import IncidentFastPath
+from transcript_relay import TranscriptRelay, TRANSCRIPTION_SOURCE_REALTIME, get_transcription_source
+from worker_heartbeat import HeartbeatPublisher, default_worker_id, heartbeat_store
+from tool_metrics import tool_latency
+from job_profiler import profiler_for_job
+from budget_guard import BudgetGuard
+from loop_monitor import monitor_for_job
+from tenant_db import tenant_for_call
+from structured_logging import RateLimitedLog, bind_session, configure_logging
 import os
 import asyncio
+import logging
+import time
 
 load_dotenv()
 
+logger = logging.getLogger("agent")
+# Per-event debug records (e.g. token tracking on every agent response) are thinned out
+event_log = RateLimitedLog(logger)
+
+# "split" runs the transcriber as its own worker (transcriber.py); "combined" hosts the
+# transcription pipeline inside this job, sharing its room connection and audio stream
+WORKER_MODE = os.getenv("WORKER_MODE", "split").strip().lower()
+
+# "stt" transcribes the caller with a separate STT pass; "realtime" publishes the realtime
+# model's own input audio transcription, so no second model receives the caller's audio
+TRANSCRIPTION_SOURCE = get_transcription_source(os.getenv("TRANSCRIPTION_SOURCE"))
+REALTIME_TRANSCRIPTION_MODEL = os.getenv("REALTIME_TRANSCRIPTION_MODEL", "whisper-1")
+
+# Look up incident numbers heard in user transcripts before the model asks for them
+INC_FAST_PATH = os.getenv("INC_FAST_PATH", "on").strip().lower() != "off"
+
+# Concurrent calls this worker advertises to the token server's admission control. Job
+# processes inherit AGENT_WORKER_ID from the worker, so their calls count against it
+AGENT_MAX_CALLS = int(os.getenv("AGENT_MAX_CALLS", "4"))
+AGENT_WORKER_ID = os.getenv("AGENT_WORKER_ID", "")
+
+# Port of this worker's health check server; run_services.py gives each worker its own
+WORKER_HTTP_PORT = os.getenv("WORKER_HTTP_PORT")
+
+# How often a job writes its tool call latencies to the heartbeat store, in seconds
+TOOL_METRICS_FLUSH_INTERVAL = 30
+
+# How often a call reloads its user's and the deployment's token usage for today, in seconds
+TOKEN_BUDGET_REFRESH_INTERVAL = 30
+
+def _log_asset_reload_error(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Error reloading the asset inventory: %s", task.exception())
+
+class ServiceDeskAgent(voice.Agent):
+    """The service desk agent. In combined mode the caller's audio goes through the same
+    preprocessor and VAD gate on its way to the in-job STT as in the transcriber worker"""
+
+    def __init__(self, *, stt_audio=None, **kwargs):
+        # (VADConfig, STT sample rate) from transcriber.stt_audio_settings(); None leaves the STT input untouched
+        self.stt_audio = stt_audio
+        super().__init__(**kwargs)
+
+    def stt_node(self, audio, model_settings):
+        if self.stt_audio is not None:
+            from transcriber import gate_stt_audio
+            audio = gate_stt_audio(audio, *self.stt_audio)
+        return voice.Agent.default.stt_node(self, audio, model_settings)
+
+def prewarm(proc: JobProcess):
+    """Create database schemas and load lookup files while the job process is idle,
+    instead of on the first call it serves"""
+    configure_logging()
+    DB.ensure_initialized()
+    if JOURNAL is not None:
+        # Replays tickets an earlier process journaled but didn't get into the database
+        JOURNAL.start()
+    token_db.ensure_initialized()
+    transcript_db.ensure_initialized()
+    heartbeat_store.ensure_initialized()
+    asset_inventory.reload_if_changed()
+    building_directory.reload_if_changed()
+
 async def entrypoint(ctx: JobContext):
-    print(f"AGENT: Entrypoint called for room: {ctx.room.name if ctx.room else 'No room yet'}")
+    bind_session(room=ctx.room.name)
+    logger.info("Entrypoint called for room: %s", ctx.room.name)
+    
+    # Profile this job if PROFILE_ROOMS/PROFILE_SAMPLE_RATE select it; SIGUSR1 toggles it later
+    profiler = profiler_for_job(ctx.room.name)
+    ctx.add_shutdown_callback(profiler.aclose)
+    
+    # Measure event-loop lag and catch stalls for the whole job; admission control reads the lag
+    loop_monitor = monitor_for_job(heartbeat_store, AGENT_WORKER_ID)
+    if loop_monitor:
+        ctx.add_shutdown_callback(loop_monitor.aclose)
     
     # Azure OpenAI Configuration
     azure_api_key = os.getenv("AZURE_OPENAI_API_KEY")
@@ -29,159 +120,282 @@ async def entrypoint(ctx: JobContext):
     if not all([azure_api_key, azure_endpoint, azure_deployment]):
         raise ValueError("Missing required Azure OpenAI environment variables. Please check your .env file.")
     
-    print("AGENT: Creating Azure OpenAI model...")
-    print(f"AGENT: Using endpoint: {azure_endpoint}")
-    print(f"AGENT: Using deployment: {azure_deployment}")
-    print(f"AGENT: Using API version: {azure_api_version}")
+    logger.info("Creating Azure OpenAI model", extra={
+        "endpoint": azure_endpoint, "deployment": azure_deployment, "api_version": azure_api_version
+    })
     
-    # Create Azure OpenAI realtime model (without transcription - handled by separate transcriber)
+    # Create Azure OpenAI realtime model. Its input transcription is only enabled when it is
+    # the transcription source, otherwise the separate STT already covers the caller's audio
+    realtime_transcription = TRANSCRIPTION_SOURCE == TRANSCRIPTION_SOURCE_REALTIME
     model = openai.realtime.RealtimeModel.with_azure(
         azure_deployment=azure_deployment,
         azure_endpoint=azure_endpoint,
         api_key=azure_api_key,
         api_version=azure_api_version,
         voice="shimmer",
-        temperature=0.8
+        temperature=0.8,
+        input_audio_transcription=(
+            InputAudioTranscription(model=REALTIME_TRANSCRIPTION_MODEL) if realtime_transcription else None
+        )
     )
     
     
-    print("AGENT: Connecting to room...")
+    logger.debug("Connecting to room")
     
     # Connect to the room and wait for participants
     await ctx.connect(auto_subscribe=AutoSubscribe.SUBSCRIBE_ALL)
     
-    print(f"AGENT: Connected to room: {ctx.room.name}")
-    print("AGENT: Waiting for participants...")
+    logger.info("Connected to room, waiting for participants")
     
     # Wait for participants to join
     participant = await ctx.wait_for_participant()
     
-    print(f"AGENT: Participant joined! Starting voice session in room: {ctx.room.name}")
-    print(f"AGENT: Participant name: {participant.name}, identity: {participant.identity}")
+    logger.info("Participant joined, starting voice session", extra={"participant": participant.identity})
     
     # Get participant name for function tools
     participant_name = participant.name or participant.identity or ""
     
-    # Initialize token tracking
-    print("AGENT: Initializing token tracking...")
+    # The business unit whose ticket database this call uses, set by the token server. A call
+    # for a tenant this deployment doesn't serve fails here rather than filing tickets elsewhere
+    tenant_id = tenant_for_call(ctx.room.metadata, participant.attributes)
+    tenant = await asyncio.to_thread(TENANTS.acquire, tenant_id)
+    if tenant_id:
+        logger.info("Call routed to tenant %s", tenant_id)
     
-    # Clean up any stale sessions first
-    cleaned_count = token_tracker.cleanup_stale_sessions()
-    if cleaned_count > 0:
-        print(f"AGENT: Cleaned up {cleaned_count} stale sessions")
+    # Everything below is undone in the finally, including when setting up the call fails
+    prefetch_task = asset_reload_task = budget_guard = incident_fast_path = session = None
+    tracking_session_id = None
+    transcribing_in_job = False
+    try:
+        # Count this call against the worker's advertised capacity
+        if AGENT_WORKER_ID:
+            try:
+                await asyncio.to_thread(heartbeat_store.call_started, AGENT_WORKER_ID, ctx.room.name)
+            except Exception as e:
+                logger.error("Error recording call start: %s", e)
     
-    tracking_session_id = token_tracker.start_session(
-        room_name=ctx.room.name,
-        user_name=participant_name,
-        participant_identity=participant.identity
-    )
+        # Create function context with tools (now with participant name) and start loading
+        # the caller's existing tickets while the realtime session is being set up
+        assistant_fnc = AssistantFnc(participant_name, tenant)
+        prefetch_task = assistant_fnc.start_ticket_prefetch()
+        if asset_inventory.csv_path:
+            # Kept for the length of the call so the task isn't garbage-collected mid-reload
+            asset_reload_task = asyncio.create_task(asyncio.to_thread(asset_inventory.reload_if_changed))
+            asset_reload_task.add_done_callback(_log_asset_reload_error)
     
-    # Register agent service for token tracking
-    token_tracker.register_service(tracking_session_id, "agent", "gpt-4o-realtime")
+        # Initialize token tracking, cleaning up any stale sessions first
+        cleaned_count = token_tracker.cleanup_stale_sessions()
+        if cleaned_count > 0:
+            logger.info("Cleaned up %d stale sessions", cleaned_count)
     
-    print("AGENT: Creating function tools...")
+        tracking_session_id = token_tracker.start_session(
+            room_name=ctx.room.name,
+            user_name=participant_name,
+            participant_identity=participant.identity
+        )
+        profiler.name = tracking_session_id
+        bind_session(session_id=tracking_session_id)
     
-    # Create function context with tools (now with participant name)
-    assistant_fnc = AssistantFnc(participant_name)
-    tools = [
-        assistant_fnc.lookup_ticket,
-        assistant_fnc.search_tickets_by_name,
-        assistant_fnc.get_ticket_details,
-        assistant_fnc.create_ticket
-    ]
+        # Register agent service for token tracking
+        token_tracker.register_service(tracking_session_id, "agent", "gpt-4o-realtime")
     
-    print("AGENT: Creating voice agent...")
+        combined_mode = WORKER_MODE == "combined"
+        stt_in_job = combined_mode and not realtime_transcription
+        transcribing_in_job = combined_mode or realtime_transcription
+        if transcribing_in_job:
+            if realtime_transcription:
+                transcription_model = REALTIME_TRANSCRIPTION_MODEL
+            else:
+                from transcriber import TRANSCRIBER_STT_MODEL as transcription_model
+            token_tracker.register_service(tracking_session_id, "transcriber", transcription_model)
     
-    # Create voice agent
-    assistant = voice.Agent(
-        instructions=INSTRUCTIONS,
-        llm=model,
-        tools=tools
-    )
+        tools = [
+            assistant_fnc.lookup_ticket,
+            assistant_fnc.search_tickets_by_name,
+            assistant_fnc.get_ticket_details,
+            assistant_fnc.verify_computer_name,
+            assistant_fnc.lookup_building,
+            assistant_fnc.create_ticket,
+            assistant_fnc.escalate_ticket,
+            assistant_fnc.add_ticket_note,
+            assistant_fnc.attach_to_incident
+        ]
+    
+        stt_audio = None
+        if stt_in_job:
+            from transcriber import stt_audio_settings
+            stt_audio = stt_audio_settings("Combined mode")
+    
+        # Create voice agent
+        assistant = ServiceDeskAgent(
+            instructions=INSTRUCTIONS,
+            llm=model,
+            tools=tools,
+            stt_audio=stt_audio
+        )
 
-    # Create voice session using AgentSession (STT handled by separate transcriber service)
-    session = voice.AgentSession(
-        llm=model
-    )
+        if stt_in_job:
+            # The STT is fed from the same audio input the realtime model receives, gated like
+            # the transcriber worker's
+            from transcriber import create_transcriber_stt
+        
+            logger.info("Combined worker mode - transcribing in this job")
+            session = voice.AgentSession(
+                llm=model,
+                stt=create_transcriber_stt()
+            )
+        else:
+            # Create voice session using AgentSession (STT handled by separate transcriber service,
+            # or by the realtime model itself)
+            session = voice.AgentSession(
+                llm=model
+            )
     
-    # Add token tracking callback to session
-    @session.on("agent_speech")
-    def on_agent_speech(event):
-        """Track tokens when agent generates speech"""
-        try:
-            # Extract token usage from the event if available
-            # Note: This may need adjustment based on actual LiveKit event structure
-            if hasattr(event, 'usage') and event.usage:
-                input_tokens = getattr(event.usage, 'input_tokens', 0)
-                output_tokens = getattr(event.usage, 'output_tokens', 0)
-                
-                if input_tokens > 0 or output_tokens > 0:
-                    token_tracker.track_tokens(tracking_session_id, "agent", input_tokens, output_tokens)
-                    print(f"AGENT: Tracked tokens - Input: {input_tokens}, Output: {output_tokens}")
-        except Exception as e:
-            print(f"AGENT: Error tracking tokens: {e}")
-    
-    print("AGENT: Voice session created, starting...")
-    
-    # Start the session with the room and agent
-    await session.start(
-        room=ctx.room,
-        agent=assistant
-    )
+        # participant_name is reused for the greeting below, keep the stored caller name stable
+        caller_name = participant_name
+    
+        transcript_relay = TranscriptRelay(TRANSCRIPTION_SOURCE)
+        if transcribing_in_job:
+            from transcriber import track_transcription_tokens
+        
+            logger.info("Publishing user transcripts from source: %s", TRANSCRIPTION_SOURCE)
+            transcript_relay.add_listener(lambda transcript: track_transcription_tokens(tracking_session_id, transcript))
+            transcript_relay.add_listener(
+                lambda transcript: transcript_writer.record(
+                    tracking_session_id, ctx.room.name, caller_name, "user", transcript
+                )
+            )
+            transcript_relay.attach(session)
+        elif INC_FAST_PATH:
+            # The transcriber worker tracks and stores its transcripts; they are only followed here
+            transcript_relay.attach_room(ctx.room)
     
-    print("AGENT: Voice session started successfully!")
+        # Look up spoken incident numbers as soon as they are transcribed
+        incident_fast_path = None
+        if INC_FAST_PATH:
+            incident_fast_path = IncidentFastPath(assistant_fnc, assistant)
+            transcript_relay.add_listener(incident_fast_path.on_transcript)
     
-    # Get participant name for personalized greeting
-    participant_name = participant.name or participant.identity or "there"
+        # Store the agent's side of the conversation for QA (queued, written in batches)
+        @session.on("conversation_item_added")
+        def on_conversation_item_added(event):
+            item = event.item
+            if getattr(item, "role", None) == "assistant" and item.text_content:
+                transcript_writer.record(tracking_session_id, ctx.room.name, caller_name, "agent", item.text_content)
     
-    # Check if we can find existing tickets for this user
-    print(f"AGENT: Checking for existing tickets for user: {participant_name}")
+        # Token budgets: shorter answers and a compacted context at the soft limit, file the
+        # ticket and end the call at the hard limit
+        async def end_call():
+            ctx.shutdown(reason="token budget exhausted")
     
-    # Immediately greet the user with personalized welcome message
-    print("AGENT: Greeting the user...")
-    personalized_greeting = f"Hello {participant_name}! {WELCOME_MESSAGE.strip()}"
-    session.generate_reply(
-        user_input="Please greet the user with a personalized IT help desk welcome message.",
-        instructions=f"Say exactly: {personalized_greeting}"
-    )
+        budget_guard = BudgetGuard(assistant, session, INSTRUCTIONS, assistant_fnc.has_created_ticket, end_call)
+        budget_enabled = token_tracker.budget.limits.enabled
+        if budget_enabled:
+            await asyncio.to_thread(token_tracker.refresh_budget, tracking_session_id)
     
-    # Keep the session running
-    try:
+        # Track the realtime model's token usage per response and check it against the budgets
+        @session.on("metrics_collected")
+        def on_metrics_collected(event):
+            usage = event.metrics
+            if not isinstance(usage, metrics.RealtimeModelMetrics):
+                return
+            try:
+                if usage.input_tokens > 0 or usage.output_tokens > 0:
+                    state = token_tracker.track_tokens(tracking_session_id, "agent", usage.input_tokens, usage.output_tokens)
+                    event_log.debug("tracked-tokens", "Tracked tokens - Input: %d, Output: %d", usage.input_tokens, usage.output_tokens)
+                    if budget_enabled:
+                        budget_guard.update(state)
+            except Exception as e:
+                event_log.log(logging.ERROR, "track-tokens-error", "Error tracking tokens: %s", e)
+    
+        # Start the session with the room and agent
+        await session.start(
+            room=ctx.room,
+            agent=assistant
+        )
+    
+        logger.info("Voice session started")
+    
+        # Get participant name for personalized greeting
+        participant_name = participant.name or participant.identity or "there"
+    
+        # Immediately greet the user with personalized welcome message
+        personalized_greeting = f"Hello {participant_name}! {WELCOME_MESSAGE.strip()}"
+        session.generate_reply(
+            user_input="Please greet the user with a personalized IT help desk welcome message.",
+            instructions=f"Say exactly: {personalized_greeting}"
+        )
+    
+        # Keep the session running
+        last_flush = last_budget_refresh = time.monotonic()
         while True:
             await asyncio.sleep(1)
+            if budget_enabled:
+                # Transcription tokens and other calls' usage only show up in the counters
+                budget_guard.update(token_tracker.budget_state(tracking_session_id))
+                if time.monotonic() - last_budget_refresh >= TOKEN_BUDGET_REFRESH_INTERVAL:
+                    last_budget_refresh = time.monotonic()
+                    await asyncio.to_thread(token_tracker.refresh_budget, tracking_session_id)
+            if AGENT_WORKER_ID and time.monotonic() - last_flush >= TOOL_METRICS_FLUSH_INTERVAL:
+                last_flush = time.monotonic()
+                await asyncio.to_thread(tool_latency.flush, heartbeat_store, AGENT_WORKER_ID)
     except asyncio.CancelledError:
-        print("AGENT: Voice session cancelled")
+        logger.info("Voice session cancelled")
     finally:
-        # End token tracking and get summary
-        print("AGENT: Ending token tracking session...")
-        usage_summary = token_tracker.end_session(tracking_session_id, "agent")
+        if prefetch_task and not prefetch_task.done():
+            prefetch_task.cancel()
+        if budget_guard is not None:
+            await budget_guard.aclose()
+        if incident_fast_path:
+            await incident_fast_path.aclose()
         
-        if usage_summary:
-            print("AGENT: Token Usage Summary:")
-            print(f"  User: {usage_summary.get('user_name', 'Unknown')}")
-            print(f"  Room: {usage_summary.get('room_name', 'Unknown')}")
-            print(f"  Total Tokens: {usage_summary.get('totals', {}).get('total_tokens', 0)}")
+        # End token tracking and get summary
+        if tracking_session_id is not None:
+            usage_summary = token_tracker.end_session(tracking_session_id, None if transcribing_in_job else "agent")
             
-            for service_type, service_data in usage_summary.get('services', {}).items():
-                print(f"  {service_type.title()} Service ({service_data.get('model_name', 'Unknown')}):")
-                print(f"    Input Tokens: {service_data.get('input_tokens', 0)}")
-                print(f"    Output Tokens: {service_data.get('output_tokens', 0)}")
-                print(f"    Total Tokens: {service_data.get('total_tokens', 0)}")
+            if usage_summary:
+                logger.info("Token usage summary - total tokens: %d",
+                            usage_summary.get('totals', {}).get('total_tokens', 0),
+                            extra={"usage": usage_summary.get('services', {})})
         
-        await session.aclose()
-        print("AGENT: Voice session closed")
+        if session is not None:
+            await session.aclose()
+            logger.info("Voice session closed")
+        
+        # Closes the tenant's database once it has no calls and has been idle long enough
+        await asyncio.to_thread(TENANTS.release, tenant)
+        
+        if AGENT_WORKER_ID:
+            try:
+                await asyncio.to_thread(tool_latency.flush, heartbeat_store, AGENT_WORKER_ID)
+                await asyncio.to_thread(heartbeat_store.call_ended, ctx.room.name)
+            except Exception as e:
+                logger.error("Error recording call end: %s", e)
     
 if __name__ == "__main__":
     print("AGENT: Starting LiveKit agent worker...")
     print("AGENT: Worker will dispatch to new rooms automatically")
+    print(f"AGENT: Worker mode: {WORKER_MODE}, transcription source: {TRANSCRIPTION_SOURCE}")
     
     # Configure worker options with more explicit settings
     worker_options = WorkerOptions(
-        entrypoint_fnc=entrypoint
+        entrypoint_fnc=entrypoint,
+        prewarm_fnc=prewarm
     )
+    if WORKER_HTTP_PORT:
+        worker_options.port = int(WORKER_HTTP_PORT)
+    
+    # Advertise this worker's capacity to the token server while it runs
+    AGENT_WORKER_ID = AGENT_WORKER_ID or default_worker_id()
+    os.environ["AGENT_WORKER_ID"] = AGENT_WORKER_ID
+    heartbeat = HeartbeatPublisher(heartbeat_store, AGENT_WORKER_ID, AGENT_MAX_CALLS)
+    heartbeat.start()
+    print(f"AGENT: Worker {AGENT_WORKER_ID} accepts {AGENT_MAX_CALLS} concurrent calls")
     
     try:
         cli.run_app(worker_options)
     except Exception as e:
         print(f"AGENT: Error starting worker: {e}")
         raise
+    finally:
+        heartbeat.stop()
@@ -1,83 +1,142 @@
 from livekit.agents import llm
-import enum
+import asyncio
 import logging
-import re
-from db_ticket import DatabaseTicket
+import os
+from typing import Dict, Optional
+from db_ticket import DatabaseTicket, Ticket, TicketState, format_ticket_number_for_speech
+from asset_inventory import asset_inventory
+from building_directory import building_directory
+from issue_index import issue_index
+from spoken_identifier import normalize_spoken_identifier
+from tenant_db import Tenant, TenantDatabases, parse_tenants
+from ticket_journal import TicketJournal
+from tool_metrics import timed_tool
 
 logger = logging.getLogger("user-data")
-logger.setLevel(logging.INFO)
 
 DB = DatabaseTicket()
 
-# Phonetic alphabet mapping
-PHONETIC_ALPHABET = {
-    'alpha': 'A', 'bravo': 'B', 'charlie': 'C', 'delta': 'D', 'echo': 'E', 
-    'foxtrot': 'F', 'golf': 'G', 'hotel': 'H', 'india': 'I', 'juliet': 'J',
-    'kilo': 'K', 'lima': 'L', 'mike': 'M', 'november': 'N', 'oscar': 'O',
-    'papa': 'P', 'quebec': 'Q', 'romeo': 'R', 'sierra': 'S', 'tango': 'T',
-    'uniform': 'U', 'victor': 'V', 'whiskey': 'W', 'xray': 'X', 'x-ray': 'X',
-    'yankee': 'Y', 'zulu': 'Z'
-}
+# New tickets are acknowledged from the durable journal and replayed into DB in the background,
+# unless TICKET_JOURNAL is "off"
+JOURNAL = (TicketJournal(os.getenv("TICKET_JOURNAL_PATH", "ticket_journal.log"), DB)
+           if os.getenv("TICKET_JOURNAL", "on").strip().lower() != "off" else None)
 
-def convert_phonetic_to_letters(text: str) -> str:
-    """Convert phonetic alphabet words to their corresponding letters"""
-    if not text:
-        return text
-    
-    # Split by common separators (dash, space, etc.)
-    parts = re.split(r'[-\s]+', text.lower())
-    result_parts = []
-    
-    for part in parts:
-        # Check if this part is a phonetic alphabet word
-        if part in PHONETIC_ALPHABET:
-            result_parts.append(PHONETIC_ALPHABET[part])
-        else:
-            # Keep non-phonetic parts as-is (like numbers)
-            result_parts.append(part.upper())
-    
-    return ''.join(result_parts)
+# Longest create_ticket waits for the duplicate index to catch up with other workers' tickets,
+# in seconds. A busy database (a journal replay holding it) leaves the sync running in the
+# background and the check uses the tickets indexed so far
+DUPLICATE_SYNC_BUDGET_S = 0.2
 
-def format_ticket_number_for_speech(ticket_number: str) -> str:
-    """Format ticket number for clear speech pronunciation, especially zeros"""
-    if not ticket_number:
-        return ticket_number
-    
-    # Replace zeros with "zero" to ensure clear pronunciation
-    # Split into letters and numbers for better pronunciation
-    formatted = ""
-    for char in ticket_number:
-        if char == '0':
-            formatted += "zero "
-        elif char.isdigit():
-            formatted += char + " "
-        else:
-            formatted += char
-    
-    return formatted.strip()
+# Business units with their own ticket databases under TENANT_DB_DIR; calls without a tenant use DB
+TENANTS = TenantDatabases(
+    os.getenv("TENANT_DB_DIR", "tenants"),
+    max_open=int(os.getenv("TENANT_MAX_OPEN", "16")),
+    idle_s=float(os.getenv("TENANT_IDLE_SECONDS", "300")),
+    allowed=parse_tenants(os.getenv("TENANTS")),
+    journal=JOURNAL is not None,
+    default=lambda: Tenant("", DB, JOURNAL, issue_index),
+)
 
-class TicketDetails(enum.Enum):
-    Inc = "inc"
-    First = "first"
-    Last = "last"
-    Comp_Name = "comp_name"
-    Bldg = "bldg"
-    Issue = "issue"
-    
+def convert_phonetic_to_letters(text: str) -> str:
+    """Convert spoken phonetic alphabet words, digits and repeats to asset tag characters"""
+    return normalize_spoken_identifier(text)
+
+def _log_sync_error(sync: asyncio.Future):
+    if not sync.cancelled() and sync.exception() is not None:
+        logger.error("Error syncing the duplicate index: %s", str(sync.exception()))
 
 class AssistantFnc:
-    def __init__(self, participant_name: str = ""):
+    def __init__(self, participant_name: str = "", tenant: Optional[Tenant] = None):
         self._participant_name = participant_name
+        # The tenant whose tickets this call works with; the module's DB when not given
+        self._tenant = tenant
         self._parsed_name = self._parse_participant_name(participant_name)
         
-        self._ticket_details = {
-            TicketDetails.Inc: "",
-            TicketDetails.First: self._parsed_name.get("first", ""),
-            TicketDetails.Last: self._parsed_name.get("last", ""),
-            TicketDetails.Comp_Name: "",
-            TicketDetails.Bldg: "",
-            TicketDetails.Issue: ""
-        }
+        # Current ticket; until one is looked up or created it only holds the caller's name
+        self._ticket = Ticket(
+            inc="",
+            first=self._parsed_name.get("first", ""),
+            last=self._parsed_name.get("last", ""),
+            comp_name="",
+            bldg="",
+            issue=""
+        )
+        
+        # Recent tickets for this participant, keyed by INC, filled by the background prefetch
+        self._prefetched_tickets: Dict[str, Ticket] = {}
+        self._prefetch_task: Optional[asyncio.Task] = None
+        
+        # Tickets looked up ahead of the model by the incident fast path, keyed by INC
+        self._looked_up_tickets: Dict[str, Ticket] = {}
+        
+        # Computer name that was not in the asset inventory; a repeat of it is taken as confirmed
+        self._unverified_comp_name = ""
+        # Building name last answered with a fuzzy match to confirm
+        self._unverified_bldg = ""
+        
+        # INC of the ticket filed during this call, if any
+        self._created_inc = ""
+        
+        # Recent ticket offered as the same issue, and the caller's report to attach to it
+        self._duplicate_inc = ""
+        self._duplicate_report: Optional[Ticket] = None
+    
+    @property
+    def _db(self) -> DatabaseTicket:
+        return self._tenant.db if self._tenant is not None else DB
+    
+    @property
+    def _journal(self) -> Optional[TicketJournal]:
+        return self._tenant.journal if self._tenant is not None else JOURNAL
+    
+    @property
+    def _issue_index(self):
+        return self._tenant.issue_index if self._tenant is not None else issue_index
+    
+    def start_ticket_prefetch(self, limit: int = 5) -> Optional[asyncio.Task]:
+        """Start loading the participant's recent tickets in the background"""
+        if self._prefetch_task is None and self._parsed_name.get("first"):
+            self._prefetch_task = asyncio.create_task(self._prefetch_tickets(limit))
+        return self._prefetch_task
+    
+    async def _prefetch_tickets(self, limit: int):
+        first = self._parsed_name.get("first", "")
+        last = self._parsed_name.get("last", "")
+        try:
+            tickets = await asyncio.to_thread(self._db.get_tickets_by_name, first, last, limit)
+        except Exception as e:
+            logger.error("Error prefetching tickets for %s %s: %s", first, last, str(e))
+            return
+        
+        for ticket in tickets:
+            self._prefetched_tickets.setdefault(ticket.inc, ticket)
+        logger.info("prefetched %d tickets for %s %s", len(tickets), first, last)
+    
+    async def _wait_for_prefetch(self):
+        """Let an in-flight prefetch finish so its results can be used instead of a new query"""
+        if self._prefetch_task is not None and not self._prefetch_task.done():
+            await asyncio.shield(self._prefetch_task)
+    
+    async def prefetch_ticket(self, inc: str) -> Optional[Ticket]:
+        """Look up a ticket ahead of the model; a found ticket becomes the current ticket"""
+        inc = inc.strip().upper()
+        await self._wait_for_prefetch()
+        ticket = self._prefetched_tickets.get(inc) or self._looked_up_tickets.get(inc)
+        if ticket is None:
+            ticket = await asyncio.to_thread(self._db.get_ticket_by_inc, inc)
+            if ticket is None:
+                return None
+            self._looked_up_tickets[inc] = ticket
+        
+        self._set_ticket_details(ticket)
+        return ticket
+    
+    def _is_participant(self, first_name: str, last_name: str) -> bool:
+        if first_name.strip().lower() != self._parsed_name.get("first", "").lower():
+            return False
+        return not last_name or last_name.strip().lower() == self._parsed_name.get("last", "").lower()
+    
+    def _set_ticket_details(self, ticket: Ticket):
+        self._ticket = ticket
     
     def _parse_participant_name(self, name: str) -> dict:
         """Parse participant name into first and last name"""
@@ -94,54 +153,113 @@ class AssistantFnc:
             return {"first": "", "last": ""}
     
     def get_ticket_str(self):
-        ticket_str = ""
-        for key, value in self._ticket_details.items():
-            # Format incident number for clear speech pronunciation
-            if key == TicketDetails.Inc and value:
-                formatted_value = format_ticket_number_for_speech(value)
-                ticket_str += f"{key.value}: {formatted_value}\n"
-            else:
-                ticket_str += f"{key.value}: {value}\n"
-            
-        return ticket_str
+        return self._ticket.tool_text
     
     @llm.function_tool(description="lookup a ticket by its incident number")
+    @timed_tool
     async def lookup_ticket(self, inc: str):
         logger.info("lookup ticket - inc: %s", inc)
         
-        result = DB.get_ticket_by_inc(inc)
+        await self._wait_for_prefetch()
+        key = inc.strip().upper()
+        result = self._prefetched_tickets.get(key) or self._looked_up_tickets.get(key)
         if result is None:
-            return "Ticket not found"
+            # Another call in this worker may have just created it through the journal
+            await self._wait_for_journal(key)
+            result = await asyncio.to_thread(self._db.get_ticket_by_inc, key)
+            if result is None:
+                return "Ticket not found"
+            self._looked_up_tickets[key] = result
         
-        self._ticket_details = {
-            TicketDetails.Inc: result.inc,
-            TicketDetails.First: result.first,
-            TicketDetails.Last: result.last,
-            TicketDetails.Comp_Name: result.comp_name,
-            TicketDetails.Bldg: result.bldg,
-            TicketDetails.Issue: result.issue
-        }
+        self._set_ticket_details(result)
         
-        return f"The ticket details are: {self.get_ticket_str()}"
+        try:
+            state = await asyncio.to_thread(self._db.get_ticket_state, result.inc)
+        except Exception as e:
+            logger.error("Error reading ticket state for %s: %s", result.inc, str(e))
+            state = None
+        return f"The ticket details are: {self.get_ticket_str()}{state.tool_text if state else ''}"
     
     @llm.function_tool(description="search for tickets by user's first and last name")
+    @timed_tool
     async def search_tickets_by_name(self, first_name: str, last_name: str = ""):
         logger.info("search tickets by name - first: %s, last: %s", first_name, last_name)
         
         try:
-            # Try to find tickets by name (this would need to be implemented in the database)
-            # For now, we'll return a message indicating we searched
-            return f"Searched for tickets for {first_name} {last_name}. If you have an existing incident number, please provide it. Otherwise, I'll help you create a new ticket."
+            # The participant's own tickets were prefetched when they joined
+            if self._is_participant(first_name, last_name):
+                await self._wait_for_prefetch()
+                tickets = list(self._prefetched_tickets.values())
+            else:
+                tickets = await asyncio.to_thread(self._db.get_tickets_by_name, first_name, last_name)
+            
+            if not tickets:
+                return f"No existing tickets found for {first_name} {last_name}. I'll help you create a new ticket."
+            
+            ticket_lines = "\n".join(
+                f"{ticket.spoken_inc}: {ticket.issue}" for ticket in tickets
+            )
+            return f"Found {len(tickets)} existing tickets for {first_name} {last_name}:\n{ticket_lines}"
         except Exception as e:
             logger.error("Error searching tickets by name: %s", str(e))
             return "Unable to search for existing tickets at this time. I'll help you create a new ticket."
     
     @llm.function_tool(description="get the details of the current ticket")
+    @timed_tool
     async def get_ticket_details(self):
         logger.info("get ticket details")
         return f"The ticket details are: {self.get_ticket_str()}"
     
+    async def _resolve_comp_name(self, comp_name: str):
+        """Return (inventory tag, None) for a known computer, or (None, suggestions) for an unknown one"""
+        if not asset_inventory.enabled:
+            return comp_name, None
+        
+        asset = await asyncio.to_thread(asset_inventory.get, comp_name)
+        if asset is not None:
+            return asset.tag, None
+        
+        matches = await asyncio.to_thread(asset_inventory.find_closest, comp_name)
+        return None, [match.tag for match in matches]
+    
+    @llm.function_tool(description="check a computer name against the asset inventory and suggest the closest valid names")
+    @timed_tool
+    async def verify_computer_name(self, comp_name: str):
+        converted_comp_name = convert_phonetic_to_letters(comp_name)
+        logger.info("verify computer name - comp_name: %s (converted from: %s)", converted_comp_name, comp_name)
+        
+        if not asset_inventory.enabled:
+            return f"No asset inventory is available. Use {converted_comp_name} as given."
+        
+        tag, suggestions = await self._resolve_comp_name(converted_comp_name)
+        if tag is not None:
+            return f"{tag} is a valid computer name."
+        if not suggestions:
+            return f"{converted_comp_name} is not in the asset inventory and there is no close match. Ask the user to spell it again."
+        return (f"{converted_comp_name} is not in the asset inventory. The closest valid names are: "
+                f"{', '.join(suggestions)}. Confirm the right one with the user.")
+    
+    @llm.function_tool(description="look up a building by its spoken name, alias or code")
+    @timed_tool
+    async def lookup_building(self, bldg: str):
+        logger.info("lookup building - bldg: %s", bldg)
+        
+        if not building_directory.enabled:
+            return f"No building directory is available. Use {bldg} as given."
+        
+        match, candidates = await asyncio.to_thread(building_directory.lookup, bldg)
+        if match is not None and match.method == "fuzzy":
+            return (f"{bldg} is not in the building directory; the closest building is {match.name}, "
+                    f"building code {match.code}. Ask the user if that is the one.")
+        if match is not None:
+            return f"{bldg} is {match.name}, building code {match.code}."
+        if candidates:
+            options = ", ".join(f"{c.name} ({c.code})" for c in candidates)
+            return f"{bldg} could be one of: {options}. Ask the user which one."
+        return f"No building matches {bldg}. Ask the user for the building name again."
+    
     @llm.function_tool(description="create a new ticket with user information and issue description")
+    @timed_tool
     async def create_ticket(
         self, 
         first: str,
@@ -159,39 +277,177 @@ class AssistantFnc:
             not last or last.lower() in ["user's last name", "last name", "surname"]):
             actual_first = self._parsed_name.get("first", first)
             actual_last = self._parsed_name.get("last", last)
-            logger.info("Using participant name instead of placeholder - original: %s %s, using: %s %s", 
-                       first, last, actual_first, actual_last)
+            logger.debug("Using participant name instead of placeholder - original: %s %s, using: %s %s",
+                         first, last, actual_first, actual_last)
         
         # Convert phonetic alphabet in computer name to letters
         converted_comp_name = convert_phonetic_to_letters(comp_name)
-        logger.info("create ticket - first: %s, last: %s, comp_name: %s (converted from: %s), bldg: %s, issue: %s", 
-                   actual_first, actual_last, converted_comp_name, comp_name, bldg, issue)
+        # The caller's details and issue text only go to the debug log
+        logger.debug("create ticket - first: %s, last: %s, comp_name: %s (converted from: %s), bldg: %s, issue: %s",
+                     actual_first, actual_last, converted_comp_name, comp_name, bldg, issue)
+        
+        # Check the name against the asset inventory; an unknown name is only accepted once the user confirms it
+        try:
+            tag, suggestions = await self._resolve_comp_name(converted_comp_name)
+        except Exception as e:
+            logger.error("Error checking asset inventory: %s", str(e))
+            tag, suggestions = converted_comp_name, None
+        
+        if tag is not None:
+            converted_comp_name = tag
+        elif suggestions and self._unverified_comp_name != converted_comp_name:
+            self._unverified_comp_name = converted_comp_name
+            logger.info("computer name %s not in inventory, suggesting %s", converted_comp_name, suggestions)
+            return (f"The ticket was not created yet: {converted_comp_name} is not in the asset inventory. "
+                    f"The closest valid computer names are: {', '.join(suggestions)}. Confirm the computer name "
+                    f"with the user, then call create_ticket again with the confirmed name.")
+        
+        # Store the canonical building code when the spoken name resolves to one building. A
+        # spelling correction is only offered: the user confirms it, or the name is kept as given
+        building = await asyncio.to_thread(building_directory.resolve, bldg) if building_directory.enabled else None
+        if building is not None and building.method == "fuzzy":
+            if self._unverified_bldg != bldg:
+                self._unverified_bldg = bldg
+                logger.info("building %s not in directory, suggesting %s", bldg, building.code)
+                return (f"The ticket was not created yet: {bldg} is not in the building directory. The closest "
+                        f"building is {building.name} (building code {building.code}). Confirm the building with "
+                        f"the user, then call create_ticket again with the confirmed building.")
+        elif building is not None:
+            logger.info("building %s resolved to %s (%s match)", bldg, building.code, building.method)
+            bldg = building.code
+        
+        # During an outage many callers report the same issue; offer the recent ticket once
+        duplicate = await self._find_duplicate(bldg, issue)
+        if duplicate is not None and self._duplicate_inc != duplicate.inc:
+            self._duplicate_inc = duplicate.inc
+            self._duplicate_report = Ticket("", actual_first, actual_last, converted_comp_name, bldg, issue)
+            logger.info("issue matches %s (similarity %.2f, %.0f s old)", duplicate.inc, duplicate.similarity, duplicate.age_s)
+            return (f"The ticket was not created yet: ticket {format_ticket_number_for_speech(duplicate.inc)} was opened "
+                    f"{max(1, round(duplicate.age_s / 60))} minutes ago for the same building with a similar issue: "
+                    f"\"{duplicate.issue}\". Ask the user if this is the same problem. If it is, call attach_to_incident "
+                    f"with that incident number; if not, call create_ticket again with the same details.")
         
         try:
-            # Pass empty string for inc since it will be auto-generated
-            result = DB.create_ticket("", actual_first, actual_last, converted_comp_name, bldg, issue)
+            if self._journal is not None:
+                # Returns once the ticket is journaled with its INC, without waiting on the database
+                result = await self._journal.create_ticket(actual_first, actual_last, converted_comp_name, bldg, issue)
+            else:
+                # Pass empty string for inc since it will be auto-generated
+                result = await asyncio.to_thread(self._db.create_ticket, "", actual_first, actual_last,
+                                                 converted_comp_name, bldg, issue)
             if result is None:
                 logger.error("Database returned None when creating ticket")
                 return "Failed to create ticket"
             
-            logger.info("Ticket created successfully with INC: %s", result.inc)
+            logger.info("Ticket created successfully with INC: %s, bldg: %s", result.inc, result.bldg)
             
-            self._ticket_details = {
-                TicketDetails.Inc: result.inc,
-                TicketDetails.First: result.first,
-                TicketDetails.Last: result.last,
-                TicketDetails.Comp_Name: result.comp_name,
-                TicketDetails.Bldg: result.bldg,
-                TicketDetails.Issue: result.issue
-            }
+            self._set_ticket_details(result)
+            self._created_inc = result.inc
+            if self._issue_index.enabled:
+                self._issue_index.add(result.inc, result.bldg, result.issue)
+            if self._is_participant(result.first, result.last):
+                self._prefetched_tickets[result.inc] = result
+            # The caller may ask about it before the journal is replayed into the database
+            self._looked_up_tickets[result.inc] = result
             
-            # Format ticket number for clear speech pronunciation
-            formatted_inc = format_ticket_number_for_speech(result.inc)
-            return f"Ticket created successfully! Your incident number is {formatted_inc}. The ticket has been submitted and you will receive updates on the status."
+            # spoken_inc is formatted for clear speech pronunciation
+            return f"Ticket created successfully! Your incident number is {result.spoken_inc}. The ticket has been submitted and you will receive updates on the status."
             
         except Exception as e:
             logger.error("Error creating ticket: %s", str(e))
             return f"Failed to create ticket due to error: {str(e)}"
     
+    async def _wait_for_journal(self, inc: str):
+        """Make sure a ticket filed through the journal has reached the database before reading or
+        changing it there"""
+        if self._journal is not None and self._journal.is_pending(inc):
+            await asyncio.to_thread(self._journal.replay)
+    
+    async def _find_duplicate(self, bldg: str, issue: str):
+        if not self._issue_index.enabled:
+            return None
+        try:
+            # Picks up tickets other workers filed since the last check
+            sync = asyncio.ensure_future(asyncio.to_thread(self._issue_index.sync, self._db))
+            try:
+                await asyncio.wait_for(asyncio.shield(sync), DUPLICATE_SYNC_BUDGET_S)
+            except asyncio.TimeoutError:
+                sync.add_done_callback(_log_sync_error)
+                logger.info("Ticket database busy, checking for duplicates among the tickets indexed so far")
+            return self._issue_index.find(bldg, issue)
+        except Exception as e:
+            logger.error("Error checking for duplicate tickets: %s", str(e))
+            return None
+    
+    @llm.function_tool(description="attach the user's report to an existing incident for the same issue instead of "
+                                   "creating a new ticket, after the user confirmed it is the same problem")
+    @timed_tool
+    async def attach_to_incident(self, inc: str):
+        report = self._duplicate_report or self._ticket
+        inc = convert_phonetic_to_letters(inc).strip().upper()
+        details = f"Also reported by {report.first} {report.last}".strip()
+        if report.comp_name:
+            details += f" on {report.comp_name}"
+        if report.issue:
+            details += f": {report.issue}"
+        try:
+            await self._wait_for_journal(inc)
+            state = await asyncio.to_thread(self._db.add_note, inc, details)
+            ticket = await asyncio.to_thread(self._db.get_ticket_by_inc, inc) if state is not None else None
+        except Exception as e:
+            logger.error("Error attaching to incident: %s", str(e))
+            return f"Failed to attach the report due to error: {str(e)}"
+        if ticket is None:
+            return f"Ticket {inc} was not found. Create a new ticket with create_ticket instead."
+        
+        logger.info("attached report to %s", inc)
+        self._set_ticket_details(ticket)
+        # The caller's issue is on file, as if a ticket had been created for it
+        self._created_inc = inc
+        self._duplicate_report = None
+        return (f"The report was added to ticket {ticket.spoken_inc}; the user will receive the updates for that "
+                f"incident and doesn't need a new ticket.")
+    
+    async def _update_current_ticket(self, inc: str, action: str, change) -> Optional[TicketState]:
+        """Apply change(inc) to the given ticket, or to the current one when inc is empty"""
+        inc = (convert_phonetic_to_letters(inc) if inc else self._ticket.inc).strip().upper()
+        if not inc:
+            return None
+        await self._wait_for_journal(inc)
+        state = await asyncio.to_thread(change, inc)
+        if state is not None:
+            logger.info("%s ticket %s - status: %s, level: %d", action, inc, state.status, state.level)
+        return state
+    
+    @llm.function_tool(description="escalate a ticket to the next support level (for example a Level 2 Technician), "
+                                   "with the reason; uses the current ticket unless an incident number is given")
+    @timed_tool
+    async def escalate_ticket(self, reason: str, inc: str = ""):
+        try:
+            state = await self._update_current_ticket(inc, "escalated", lambda inc: self._db.escalate(inc, reason))
+        except Exception as e:
+            logger.error("Error escalating ticket: %s", str(e))
+            return f"Failed to escalate the ticket due to error: {str(e)}"
+        if state is None:
+            return "There is no ticket to escalate yet. Look up the ticket or create it first."
+        return (f"Ticket {format_ticket_number_for_speech(state.inc)} was escalated to a Level {state.level} "
+                f"Technician, who will follow up with the user.")
+    
+    @llm.function_tool(description="add a note to a ticket, such as troubleshooting steps tried or new details from "
+                                   "the user; uses the current ticket unless an incident number is given")
+    @timed_tool
+    async def add_ticket_note(self, note: str, inc: str = ""):
+        try:
+            state = await self._update_current_ticket(inc, "noted", lambda inc: self._db.add_note(inc, note))
+        except Exception as e:
+            logger.error("Error adding ticket note: %s", str(e))
+            return f"Failed to add the note due to error: {str(e)}"
+        if state is None:
+            return "There is no ticket to add the note to yet. Look up the ticket or create it first."
+        return f"The note was added to ticket {format_ticket_number_for_speech(state.inc)}."
+    
     def has_ticket(self):
-        return self._ticket_details[TicketDetails.Inc] != ""
+        return self._ticket.inc != ""
+    
+    def has_created_ticket(self):
+        return self._created_inc != ""
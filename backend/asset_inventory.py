@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Asset Inventory
+Loads the computer/asset inventory from a CSV export and resolves misheard computer names
+to the closest valid hostnames through an in-memory trigram index. The index follows
+changes to the CSV file incrementally instead of being rebuilt
+"""
+
+import csv
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+
+logger = logging.getLogger("asset-inventory")
+
+# Columns tried, in order, when no tag column is configured
+TAG_COLUMNS = ("hostname", "computer_name", "comp_name", "asset_tag", "name")
+
+_NON_ALNUM_RE = re.compile(r"[^A-Z0-9]")
+
+def normalize_tag(tag: str) -> str:
+    """Comparison key for a tag: upper-case letters and digits only"""
+    return _NON_ALNUM_RE.sub("", (tag or "").upper())
+
+def trigrams(key: str) -> List[str]:
+    padded = f"^{key}$"
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+def edit_distance(a: str, b: str, max_distance: Optional[int] = None) -> int:
+    """Levenshtein distance (Myers/Hyyro bit-parallel), stopping early once it exceeds max_distance"""
+    if a == b:
+        return 0
+    if len(a) > len(b):
+        a, b = b, a
+    if not a:
+        return len(b)
+
+    # One bit per character of the shorter string; each character of b is a handful of int ops
+    mask = (1 << len(a)) - 1
+    high = 1 << (len(a) - 1)
+    peq: Dict[str, int] = {}
+    for i, char in enumerate(a):
+        peq[char] = peq.get(char, 0) | (1 << i)
+
+    pv, mv, score = mask, 0, len(a)
+    remaining = len(b)
+    for char in b:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = (mv | ~(xh | pv)) & mask
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv
+        remaining -= 1
+        if max_distance is not None and score - remaining > max_distance:
+            return max_distance + 1
+    return score
+
+@dataclass
+class Asset:
+    tag: str
+    attributes: Dict[str, str] = field(default_factory=dict)
+
+@dataclass
+class AssetMatch:
+    tag: str
+    distance: int
+    asset: Asset
+
+class AssetInventory:
+    def __init__(self, csv_path: Optional[str] = None, tag_column: Optional[str] = None,
+                 check_interval: float = 5.0):
+        self.csv_path = csv_path
+        self.tag_column = tag_column
+        self.check_interval = check_interval
+
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+        self._assets: List[Optional[Asset]] = []  # index id -> asset, None once removed
+        self._keys: List[str] = []
+        self._ids_by_key: Dict[str, int] = {}
+        self._postings: Dict[str, List[int]] = {}
+        self._posting_arrays: Dict[str, np.ndarray] = {}
+        self._removed = 0
+
+        self._file_signature = None
+        self._next_check = 0.0
+
+    def __len__(self):
+        return len(self._ids_by_key)
+
+    @property
+    def enabled(self) -> bool:
+        """Whether there is an inventory to check names against"""
+        return bool(self.csv_path) or bool(self._ids_by_key)
+
+    # Index maintenance
+
+    def add_asset(self, asset: Asset):
+        key = normalize_tag(asset.tag)
+        if not key:
+            return
+        with self._lock:
+            existing = self._ids_by_key.get(key)
+            if existing is not None:
+                self._assets[existing] = asset
+                return
+
+            asset_id = len(self._assets)
+            self._assets.append(asset)
+            self._keys.append(key)
+            self._ids_by_key[key] = asset_id
+            for gram in set(trigrams(key)):
+                self._postings.setdefault(gram, []).append(asset_id)
+                self._posting_arrays.pop(gram, None)
+
+    def remove_tag(self, tag: str):
+        with self._lock:
+            asset_id = self._ids_by_key.pop(normalize_tag(tag), None)
+            if asset_id is None:
+                return
+            # Postings keep the id; removed assets are skipped at query time until compaction
+            self._assets[asset_id] = None
+            self._removed += 1
+
+    def _compact(self):
+        """Rebuild the index without removed assets; done once they take up more than a quarter
+        of its slots"""
+        assets = [asset for asset in self._assets if asset is not None]
+        self._assets, self._keys, self._ids_by_key = [], [], {}
+        self._postings, self._posting_arrays, self._removed = {}, {}, 0
+        for asset in assets:
+            self.add_asset(asset)
+
+    # CSV loading
+
+    def _read_csv(self) -> Dict[str, Asset]:
+        assets = {}
+        with open(self.csv_path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            header = [name.strip() for name in next(reader, [])]
+            columns = {name.lower(): index for index, name in enumerate(header)}
+            wanted = (self.tag_column,) if self.tag_column else TAG_COLUMNS
+            tag_index = next((columns[c.lower()] for c in wanted if c and c.lower() in columns), None)
+            if tag_index is None:
+                raise ValueError(f"{self.csv_path}: no tag column found (tried {', '.join(wanted)})")
+
+            other_columns = [(index, name) for index, name in enumerate(header) if index != tag_index]
+            for row in reader:
+                if len(row) <= tag_index:
+                    continue
+                tag = row[tag_index].strip()
+                key = normalize_tag(tag)
+                if key:
+                    attributes = {name: row[index] for index, name in other_columns if index < len(row)}
+                    assets[key] = Asset(tag=tag.upper(), attributes=attributes)
+        return assets
+
+    def reload_if_changed(self, force: bool = False) -> bool:
+        """Apply CSV changes (added, removed and updated rows) to the index"""
+        if not self.csv_path:
+            return False
+
+        # Callers arriving during a load wait for it rather than querying a half-built index
+        with self._reload_lock:
+            return self._reload(force)
+
+    def _reload(self, force: bool) -> bool:
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return False
+        self._next_check = now + self.check_interval
+
+        try:
+            stat = os.stat(self.csv_path)
+        except OSError as e:
+            logger.warning(f"Asset inventory not readable: {e}")
+            return False
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._file_signature and not force:
+            return False
+
+        started = time.perf_counter()
+        try:
+            assets = self._read_csv()
+        except Exception as e:
+            logger.error(f"Error loading asset inventory: {e}")
+            return False
+
+        with self._lock:
+            removed = [key for key in self._ids_by_key if key not in assets]
+            for key in removed:
+                self.remove_tag(key)
+
+            added = 0
+            for key, asset in assets.items():
+                asset_id = self._ids_by_key.get(key)
+                if asset_id is None:
+                    added += 1
+                    self.add_asset(asset)
+                elif self._assets[asset_id] != asset:
+                    self._assets[asset_id] = asset
+
+            # Removed assets keep their slots in _assets until compaction
+            if self._removed * 4 > len(self._assets):
+                self._compact()
+            self._file_signature = signature
+
+        logger.info(
+            f"Asset inventory loaded: {len(self)} assets (+{added}, -{len(removed)}) "
+            f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+        return True
+
+    # Queries
+
+    def get(self, tag: str) -> Optional[Asset]:
+        """Exact lookup, ignoring case and separators"""
+        self.reload_if_changed()
+        key = normalize_tag(tag)
+        # Compaction swaps both maps; read them together
+        with self._lock:
+            asset_id = self._ids_by_key.get(key)
+            return None if asset_id is None else self._assets[asset_id]
+
+    def _posting_array(self, gram: str) -> Optional[np.ndarray]:
+        array = self._posting_arrays.get(gram)
+        if array is None:
+            posting = self._postings.get(gram)
+            if posting is None:
+                return None
+            array = np.fromiter(posting, dtype=np.int32, count=len(posting))
+            self._posting_arrays[gram] = array
+        return array
+
+    def find_closest(self, name: str, limit: int = 3, max_distance: Optional[int] = None,
+                     candidates: int = 64) -> List[AssetMatch]:
+        """Closest valid tags to a (possibly misheard) name, nearest first"""
+        self.reload_if_changed()
+        key = normalize_tag(name)
+        if not key:
+            return []
+        if max_distance is None:
+            max_distance = max(1, len(key) // 3)
+
+        with self._lock:
+            arrays = [a for a in (self._posting_array(g) for g in set(trigrams(key))) if a is not None]
+            if not arrays:
+                return []
+
+            # Count shared trigrams per asset. Each edit changes at most 3 trigrams, so anything
+            # within max_distance shares at least len(key) - 3 * max_distance of them
+            shared = np.bincount(np.concatenate(arrays), minlength=len(self._assets))
+            ids = np.flatnonzero(shared >= max(1, len(key) - 3 * max_distance))
+            if ids.shape[0] > candidates:
+                ids = ids[np.argpartition(shared[ids], -candidates)[-candidates:]]
+
+            matches = []
+            for asset_id in ids.tolist():
+                asset = self._assets[asset_id]
+                if asset is None or abs(len(self._keys[asset_id]) - len(key)) > max_distance:
+                    continue
+                distance = edit_distance(key, self._keys[asset_id], max_distance)
+                if distance <= max_distance:
+                    matches.append(AssetMatch(tag=asset.tag, distance=distance, asset=asset))
+
+        matches.sort(key=lambda m: (m.distance, m.tag))
+        return matches[:limit]
+
+    def load_assets(self, assets: Iterable[Asset]):
+        """Index assets directly (used when no CSV file is configured)"""
+        for asset in assets:
+            self.add_asset(asset)
+
+# Global instance; the CSV is read on first use, not at import
+asset_inventory = AssetInventory(os.getenv("ASSET_INVENTORY_CSV"), os.getenv("ASSET_INVENTORY_TAG_COLUMN"))
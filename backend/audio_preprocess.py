@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Audio Preprocessing
+Vectorized downmix-to-mono and polyphase resampling of room audio before it reaches the STT.
+All working buffers are allocated once per input format and reused for every frame
+"""
+
+import logging
+from math import gcd
+from typing import AsyncIterable, AsyncIterator, Dict, Tuple
+import numpy as np
+
+logger = logging.getLogger("audio-preprocess")
+
+class _ResamplePlan:
+    """Gather indices and filter weights for one (frame size, start phase) combination"""
+
+    def __init__(self, indices: np.ndarray, weights: np.ndarray, next_phase: int):
+        self.indices = indices
+        self.weights = weights
+        self.next_phase = next_phase
+        self.gathered = np.empty(weights.shape, dtype=np.float32)
+
+class AudioPreprocessor:
+    """Streaming downmix + resample of int16 frames to mono at a target sample rate"""
+
+    def __init__(self, target_rate: int = 16000, zero_crossings: int = 8, kaiser_beta: float = 8.0):
+        self.target_rate = target_rate
+        self.zero_crossings = zero_crossings
+        self.kaiser_beta = kaiser_beta
+        self._format = None
+
+    def _configure(self, sample_rate: int, num_channels: int):
+        """(Re)build filter state for a new input format"""
+        self._format = (sample_rate, num_channels)
+        divisor = gcd(self.target_rate, sample_rate)
+        self._up = self.target_rate // divisor
+        self._down = sample_rate // divisor
+        self._resampling = sample_rate != self.target_rate
+
+        # Windowed-sinc low-pass at the lower of the two Nyquist rates, in input samples
+        self._cutoff = min(1.0, self._up / self._down) * 0.95
+        half_width = int(np.ceil(self.zero_crossings / self._cutoff))
+        self._taps = 2 * half_width + 1 if self._resampling else 1
+        self._delay = half_width if self._resampling else 0
+
+        self._history = np.zeros(self._taps - 1, dtype=np.float32)
+        self._phase = 0
+        self._plans: Dict[Tuple[int, int], _ResamplePlan] = {}
+        self._work = np.empty(0, dtype=np.float32)
+        self._channels = np.empty((0, num_channels), dtype=np.float32)
+        self._mono = np.empty(0, dtype=np.float32)
+        self._output = np.empty(0, dtype=np.float32)
+        self._output_int16 = np.empty(0, dtype=np.int16)
+
+    @property
+    def delay_s(self) -> float:
+        """Group delay added by the resampling filter, in seconds"""
+        if self._format is None:
+            return 0.0
+        return self._delay / self._format[0]
+
+    def _ensure_capacity(self, samples_per_channel: int, max_out: int):
+        if self._mono.shape[0] < samples_per_channel:
+            self._channels = np.empty((samples_per_channel, self._format[1]), dtype=np.float32)
+            self._mono = np.empty(samples_per_channel, dtype=np.float32)
+            self._work = np.empty(self._taps - 1 + samples_per_channel, dtype=np.float32)
+        if self._output.shape[0] < max_out:
+            self._output = np.empty(max_out, dtype=np.float32)
+            self._output_int16 = np.empty(max_out, dtype=np.int16)
+
+    def _plan(self, samples_per_channel: int, phase: int) -> _ResamplePlan:
+        """Output positions are k * down / up input samples; phase is the first one in 1/up units"""
+        key = (samples_per_channel, phase)
+        plan = self._plans.get(key)
+        if plan is not None:
+            return plan
+
+        up, down = self._up, self._down
+        n_out = max(0, -(-(samples_per_channel * up - phase) // down))
+        positions = phase + down * np.arange(n_out, dtype=np.int64)
+        whole = positions // up
+        fraction = (positions % up) / up
+
+        # Causal filter centred `delay` samples back: taps reach from x[whole] to x[whole - taps + 1]
+        offsets = np.arange(self._taps)
+        indices = (self._taps - 1 + whole)[:, None] - offsets[None, :]
+        x = fraction[:, None] + offsets[None, :] - self._delay
+        window = np.i0(self.kaiser_beta * np.sqrt(np.clip(1 - (x / (self._delay + 1)) ** 2, 0, 1)))
+        weights = self._cutoff * np.sinc(self._cutoff * x) * window / np.i0(self.kaiser_beta)
+        weights /= weights.sum(axis=1, keepdims=True)
+
+        plan = _ResamplePlan(indices, weights.astype(np.float32), int(phase + n_out * down - samples_per_channel * up))
+        self._plans[key] = plan
+        return plan
+
+    def process(self, samples: np.ndarray, sample_rate: int, num_channels: int) -> np.ndarray:
+        """Convert one interleaved int16 frame; returns a view into a reused int16 buffer"""
+        if self._format != (sample_rate, num_channels):
+            self._configure(sample_rate, num_channels)
+
+        samples_per_channel = samples.shape[0] // num_channels
+        max_out = samples_per_channel * self._up // self._down + 2
+        self._ensure_capacity(samples_per_channel, max_out)
+        mono = self._mono[:samples_per_channel]
+
+        if num_channels > 1:
+            # Cast into the float channel buffer first; casting inside the ufuncs would buffer
+            channels = self._channels[:samples_per_channel]
+            channels[:] = samples[:samples_per_channel * num_channels].reshape(samples_per_channel, num_channels)
+            np.copyto(mono, channels[:, 0])
+            for channel in range(1, num_channels):
+                mono += channels[:, channel]
+            mono *= 1.0 / num_channels
+        elif self._resampling:
+            mono[:] = samples
+        else:
+            return samples
+
+        if not self._resampling:
+            output = self._output[:samples_per_channel]
+            output[:] = mono
+        else:
+            history_len = self._taps - 1
+            work = self._work[:history_len + samples_per_channel]
+            work[:history_len] = self._history
+            work[history_len:] = mono
+
+            plan = self._plan(samples_per_channel, self._phase)
+            np.take(work, plan.indices, out=plan.gathered, mode="clip")  # "raise" buffers the output
+            plan.gathered *= plan.weights
+            output = self._output[:plan.weights.shape[0]]
+            np.sum(plan.gathered, axis=1, out=output)
+
+            self._history[:] = work[samples_per_channel:]
+            self._phase = plan.next_phase
+
+        np.rint(output, out=output)
+        np.clip(output, -32768, 32767, out=output)
+        output_int16 = self._output_int16[:output.shape[0]]
+        output_int16[:] = output
+        return output_int16
+
+    async def preprocess(self, audio: AsyncIterable) -> AsyncIterator:
+        """Convert a stream of rtc.AudioFrame to mono frames at the target rate"""
+        from livekit import rtc
+
+        async for frame in audio:
+            if frame.num_channels == 1 and frame.sample_rate == self.target_rate:
+                yield frame
+                continue
+
+            samples = np.frombuffer(frame.data, dtype=np.int16)
+            output = self.process(samples, frame.sample_rate, frame.num_channels)
+            if output.shape[0] == 0:
+                continue
+
+            # The frame outlives this iteration, so it gets its own copy of the reused buffer
+            yield rtc.AudioFrame(
+                data=output.tobytes(),
+                sample_rate=self.target_rate,
+                num_channels=1,
+                samples_per_channel=output.shape[0],
+            )
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Asset Inventory Benchmark
+Builds a synthetic inventory CSV, then measures the initial load, fuzzy lookups of misheard
+tags, and an incremental reload after a small edit to the file
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import string
+import tempfile
+import time
+from asset_inventory import AssetInventory
+
+PREFIXES = ["GDK", "HQL", "WKS", "LAB", "LPT", "DSK", "MTG", "KSK"]
+
+def make_tags(count: int, rng: random.Random):
+    tags = set()
+    while len(tags) < count:
+        prefix = rng.choice(PREFIXES) + rng.choice(string.ascii_uppercase)
+        tags.add(f"{prefix}{rng.randrange(100000):05d}")
+    return sorted(tags)
+
+def write_csv(path: str, tags):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["hostname", "building", "owner"])
+        for index, tag in enumerate(tags):
+            writer.writerow([tag, f"B{index % 40:02d}", f"user{index % 5000}"])
+
+def mishear(tag: str, rng: random.Random) -> str:
+    """One substitution, deletion or transposition, the usual STT mistakes in a tag"""
+    chars = list(tag)
+    position = rng.randrange(1, len(chars) - 1)
+    mistake = rng.choice(("substitute", "delete", "transpose"))
+    if mistake == "substitute":
+        chars[position] = rng.choice(string.digits if chars[position].isdigit() else string.ascii_uppercase)
+    elif mistake == "delete":
+        del chars[position]
+    else:
+        chars[position], chars[position + 1] = chars[position + 1], chars[position]
+    return "".join(chars)
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the asset inventory index")
+    parser.add_argument("--assets", type=int, default=100000, help="Number of assets (default: 100000)")
+    parser.add_argument("--queries", type=int, default=1000, help="Number of fuzzy lookups (default: 1000)")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed (default: 7)")
+    parser.add_argument("--json", action="store_true", help="Output as JSON")
+
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    tags = make_tags(args.assets, rng)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "assets.csv")
+        write_csv(path, tags)
+        inventory = AssetInventory(path, check_interval=0)
+
+        started = time.perf_counter()
+        inventory.reload_if_changed()
+        load_ms = (time.perf_counter() - started) * 1000
+
+        latencies = []
+        hits = 0
+        ambiguous = 0
+        for tag in rng.sample(tags, args.queries):
+            heard = mishear(tag, rng)
+            started = time.perf_counter()
+            matches = inventory.find_closest(heard)
+            latencies.append((time.perf_counter() - started) * 1000)
+            hits += any(match.tag == tag for match in matches)
+            # More than three tags at the best distance: the caller has to be asked either way
+            ambiguous += len(inventory.find_closest(heard, limit=4, max_distance=matches[0].distance if matches else 0)) > 3
+
+        # Replace 1% of the rows and reload
+        changed = tags[len(tags) // 100:] + make_tags(len(tags) // 100, random.Random(args.seed + 1))
+        write_csv(path, changed)
+        os.utime(path, ns=(1, 1))
+        started = time.perf_counter()
+        inventory.reload_if_changed()
+        reload_ms = (time.perf_counter() - started) * 1000
+
+    results = {
+        "assets": args.assets,
+        "queries": args.queries,
+        "load_ms": round(load_ms, 1),
+        "lookup_p50_ms": round(percentile(latencies, 0.50), 3),
+        "lookup_p99_ms": round(percentile(latencies, 0.99), 3),
+        "lookup_max_ms": round(max(latencies), 3),
+        "recall_top3": round(hits / args.queries, 3),
+        "ambiguous": round(ambiguous / args.queries, 3),
+        "incremental_reload_ms": round(reload_ms, 1),
+        "assets_after_reload": len(inventory),
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("\n" + "=" * 60)
+    print(f"ASSET INVENTORY BENCHMARK ({args.assets} assets, {args.queries} misheard lookups)")
+    print("=" * 60)
+    print(f"Initial load:        {results['load_ms']} ms")
+    print(f"Lookup p50:          {results['lookup_p50_ms']} ms")
+    print(f"Lookup p99:          {results['lookup_p99_ms']} ms")
+    print(f"Lookup max:          {results['lookup_max_ms']} ms")
+    print(f"Top-3 recall:        {results['recall_top3'] * 100:.1f}%")
+    print(f"Ambiguous (>3 tied): {results['ambiguous'] * 100:.1f}%")
+    print(f"Incremental reload:  {results['incremental_reload_ms']} ms (1% of rows replaced)")
+
+if __name__ == "__main__":
+    main()
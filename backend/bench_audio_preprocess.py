@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Audio Preprocessing Benchmark
+Measures the per-frame cost of downmixing/resampling common room audio formats for the STT
+"""
+
+import argparse
+import json
+import time
+import numpy as np
+from audio_preprocess import AudioPreprocessor
+
+ROOM_FORMATS = [(48000, 2), (48000, 1), (44100, 1), (24000, 1), (16000, 2), (8000, 1)]
+
+def bench_format(sample_rate: int, num_channels: int, target_rate: int, frame_ms: int, frames: int):
+    preprocessor = AudioPreprocessor(target_rate)
+    samples_per_channel = sample_rate * frame_ms // 1000
+    frame = np.random.default_rng(0).normal(0, 2000, samples_per_channel * num_channels).astype(np.int16)
+
+    for _ in range(50):
+        preprocessor.process(frame, sample_rate, num_channels)
+
+    timings = np.empty(frames)
+    output_samples = 0
+    for i in range(frames):
+        began = time.perf_counter()
+        output = preprocessor.process(frame, sample_rate, num_channels)
+        timings[i] = time.perf_counter() - began
+        output_samples += output.shape[0]
+
+    timings_us = timings * 1e6
+    input_bytes = frames * samples_per_channel * num_channels * 2
+    return {
+        "format": f"{sample_rate}Hz x{num_channels}",
+        "us_per_frame_mean": round(float(timings_us.mean()), 2),
+        "us_per_frame_p99": round(float(np.percentile(timings_us, 99)), 2),
+        "realtime_cpu_percent": round(100 * float(timings_us.mean()) / (frame_ms * 1000), 3),
+        "upload_bytes_percent": round(100 * output_samples * 2 / input_bytes, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the STT audio preprocessing stage")
+    parser.add_argument("--target-rate", type=int, default=16000, help="Output sample rate (default: 16000)")
+    parser.add_argument("--frame-ms", type=int, default=10, help="Frame size in milliseconds (default: 10)")
+    parser.add_argument("--frames", type=int, default=5000, help="Frames per format (default: 5000)")
+    parser.add_argument("--json", action="store_true", help="Output as JSON")
+
+    args = parser.parse_args()
+    results = [
+        bench_format(sample_rate, num_channels, args.target_rate, args.frame_ms, args.frames)
+        for sample_rate, num_channels in ROOM_FORMATS
+    ]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("\n" + "=" * 72)
+    print(f"AUDIO PREPROCESSING BENCHMARK ({args.frame_ms}ms frames -> {args.target_rate} Hz mono)")
+    print("=" * 72)
+    print(f"{'Format':<14}{'Mean us':>10}{'p99 us':>10}{'CPU % RT':>12}{'Upload bytes %':>18}")
+    for result in results:
+        print(f"{result['format']:<14}{result['us_per_frame_mean']:>10}{result['us_per_frame_p99']:>10}"
+              f"{result['realtime_cpu_percent']:>12}{result['upload_bytes_percent']:>18}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Help Desk Call Load Test
+Simulates concurrent calls offline. Each call gets a fake room and a fake realtime model that
+plays a scripted conversation (transcripts, tool calls, replies) against the real AssistantFnc
+tools, DatabaseTicket, TokenTracker and transcript writer, in a scratch directory. Reports
+throughput, tool latency percentiles, SQLite statement and lock-wait times, and memory per session
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).parent
+
+FIRST_NAMES = ["Jane", "Sam", "Alex", "Maria", "Chen", "Priya", "Tom", "Aisha", "Luis", "Emma"]
+LAST_NAMES = ["Doe", "Smith", "Garcia", "Wong", "Patel", "Brown", "Okafor", "Silva", "Muller", "Kim"]
+SPOKEN_COMPUTERS = [
+    "delta echo sierra kilo one two three",
+    "lima alpha papa four five six",
+    "whiskey sierra zero zero seven",
+    "tango echo charlie hotel double two",
+]
+SPOKEN_BUILDINGS = ["the main building", "building twelve", "the annex", "engineering", "the warehouse"]
+ISSUES = [
+    "My computer freezes every few minutes when I open Outlook",
+    "I can't connect to the VPN from home",
+    "The printer on the third floor shows an offline error",
+    "My laptop won't turn on after the update",
+]
+SPOKEN_DIGITS = ["zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine"]
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+class SQLiteStats:
+    """Times every statement and commit on connections opened through sqlite3.connect.
+    SQLite's busy handler sleeps inside the statement while another connection holds the
+    lock, so statements slower than the threshold are counted as lock waits"""
+
+    def __init__(self, lock_wait_threshold_s: float):
+        self.threshold_s = lock_wait_threshold_s
+        self.durations: List[float] = []
+        self.locked_errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, duration_s: float, error: Optional[BaseException] = None):
+        with self._lock:
+            self.durations.append(duration_s)
+            if isinstance(error, sqlite3.OperationalError) and "locked" in str(error):
+                self.locked_errors += 1
+
+    def instrument(self):
+        stats = self
+
+        def timed(method):
+            def wrapper(self, *args, **kwargs):
+                started = time.perf_counter()
+                error = None
+                try:
+                    return method(self, *args, **kwargs)
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    stats.record(time.perf_counter() - started, error)
+            return wrapper
+
+        class TimedCursor(sqlite3.Cursor):
+            execute = timed(sqlite3.Cursor.execute)
+            executemany = timed(sqlite3.Cursor.executemany)
+
+        class TimedConnection(sqlite3.Connection):
+            def cursor(self, factory=TimedCursor):
+                return super().cursor(factory)
+            execute = timed(sqlite3.Connection.execute)
+            executemany = timed(sqlite3.Connection.executemany)
+            commit = timed(sqlite3.Connection.commit)
+
+        connect = sqlite3.connect
+        sqlite3.connect = lambda *args, **kwargs: connect(*args, factory=TimedConnection, **kwargs)
+
+@dataclass
+class FakeRoom:
+    name: str
+    participant_name: str
+    participant_identity: str
+
+def spoken_inc(inc: str) -> str:
+    return "I N C " + " ".join(SPOKEN_DIGITS[int(d)] for d in inc[3:])
+
+class FakeRealtimeModel:
+    """Plays a scripted call: each step is what the realtime model would emit next, a user
+    transcript, a tool call or a spoken reply, after a simulated model latency"""
+
+    def __init__(self, script: List[tuple], think_s: float, rng: random.Random):
+        self.script = script
+        self.think_s = think_s
+        self.rng = rng
+
+    async def events(self):
+        for step in self.script:
+            if self.think_s:
+                await asyncio.sleep(self.think_s * self.rng.uniform(0.5, 1.5))
+            yield step
+
+def build_script(kind: str, first: str, last: str, rng: random.Random, known_incs: List[str]) -> List[tuple]:
+    if kind == "lookup" and known_incs:
+        inc = rng.choice(known_incs)
+        return [
+            ("user", f"Hi, I'm calling about my ticket, the incident number is {spoken_inc(inc)}"),
+            ("tool", "lookup_ticket", {"inc": inc}),
+            ("agent", "I found your ticket. It is still open and assigned to the help desk."),
+            ("tool", "get_ticket_details", {}),
+            ("agent", "Is there anything else I can help you with?"),
+        ]
+    if kind == "status":
+        return [
+            ("user", "I want to know what happened to my tickets"),
+            ("tool", "search_tickets_by_name", {"first_name": first, "last_name": last}),
+            ("agent", "I found your recent tickets. Which one are you calling about?"),
+            ("tool", "get_ticket_details", {}),
+        ]
+    computer, building, issue = rng.choice(SPOKEN_COMPUTERS), rng.choice(SPOKEN_BUILDINGS), rng.choice(ISSUES)
+    return [
+        ("user", f"Hi, this is {first} {last}. {issue}"),
+        ("tool", "search_tickets_by_name", {"first_name": first, "last_name": last}),
+        ("agent", "I'm sorry to hear that. What is the name of your computer?"),
+        ("user", f"It's {computer}"),
+        ("tool", "verify_computer_name", {"comp_name": computer}),
+        ("agent", "Thanks. Which building are you in?"),
+        ("user", f"I'm in {building}"),
+        ("tool", "lookup_building", {"bldg": building}),
+        ("tool", "create_ticket", {"first": first, "last": last, "comp_name": computer, "bldg": building,
+                                   "issue": issue}),
+        ("agent", "Your ticket has been created. You will receive updates on the status."),
+    ]
+
+async def run_call(call_id: int, args, rng: random.Random, known_incs: List[str], results: Dict):
+    # Imported here so the scratch directory and environment are in place first
+    from api import AssistantFnc
+    from db_transcript import transcript_writer
+    from token_tracker import token_tracker
+
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    room = FakeRoom(f"support-room-load-{os.getpid()}-{call_id}", f"{first} {last}", f"{first.lower()}-{call_id}")
+    kind = rng.choices(["new_ticket", "lookup", "status"], weights=args.mix)[0]
+    model = FakeRealtimeModel(build_script(kind, first, last, rng, known_incs), args.think_ms / 1000, rng)
+
+    started = time.perf_counter()
+    session_id = token_tracker.start_session(room.name, room.participant_name, room.participant_identity)
+    token_tracker.register_service(session_id, "agent", "gpt-4o-realtime")
+    token_tracker.register_service(session_id, "transcriber", "gpt-4o-transcribe")
+    assistant_fnc = AssistantFnc(room.participant_name)
+    assistant_fnc.start_ticket_prefetch()
+
+    try:
+        async for step in model.events():
+            if step[0] == "user":
+                transcript_writer.record(session_id, room.name, room.participant_name, "user", step[1])
+                token_tracker.track_tokens(session_id, "transcriber", len(step[1]) // 4, len(step[1]) // 4)
+            elif step[0] == "agent":
+                transcript_writer.record(session_id, room.name, room.participant_name, "agent", step[1])
+                token_tracker.track_tokens(session_id, "agent", 600 + rng.randint(0, 400), len(step[1]) // 3)
+            else:
+                await getattr(assistant_fnc, step[1])(**step[2])
+                results["tool_calls"] += 1
+        results["completed"] += 1
+    except Exception as e:
+        results["errors"].append(f"{kind}: {type(e).__name__}: {e}")
+    finally:
+        token_tracker.end_session(session_id)
+        results["call_durations"].append(time.perf_counter() - started)
+
+async def run_worker(worker_index: int, calls: int, args, known_incs: List[str]) -> Dict:
+    import psutil
+    from db_transcript import transcript_writer
+    from tool_metrics import tool_latency
+
+    rng = random.Random(args.seed * 1000 + worker_index)
+    results = {"completed": 0, "tool_calls": 0, "errors": [], "call_durations": []}
+    process = psutil.Process()
+    baseline_rss = process.memory_info().rss
+    peak_rss = baseline_rss
+    if args.trace_memory:
+        tracemalloc.start()
+
+    async def sample_memory():
+        nonlocal peak_rss
+        while True:
+            peak_rss = max(peak_rss, process.memory_info().rss)
+            await asyncio.sleep(0.05)
+
+    sampler = asyncio.create_task(sample_memory())
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def limited(call_id):
+        async with semaphore:
+            await run_call(call_id, args, rng, known_incs, results)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(limited(i) for i in range(calls)))
+    elapsed = time.perf_counter() - started
+    sampler.cancel()
+    transcript_writer.flush()
+
+    traced_peak = 0
+    if args.trace_memory:
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    results.update({
+        "elapsed_s": elapsed,
+        "sessions": min(calls, args.concurrency),
+        "rss_growth_bytes": peak_rss - baseline_rss,
+        "traced_peak_bytes": traced_peak,
+        "tool_samples": [(tool, duration) for tool, duration, _ in tool_latency.drain()],
+    })
+    return results
+
+def worker_main(worker_index: int, calls: int, args, known_incs: List[str], stats_threshold_s: float):
+    """Entry point of one simulated worker process: its calls run concurrently in one event loop"""
+    db_stats = SQLiteStats(stats_threshold_s)
+    db_stats.instrument()
+    # The ticket database prints on every insert; keep the report readable
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        results = asyncio.run(run_worker(worker_index, calls, args, known_incs))
+    results["db_durations"] = db_stats.durations
+    results["db_locked_errors"] = db_stats.locked_errors
+    return results
+
+def seed_tickets(count: int, rng: random.Random) -> List[str]:
+    """Existing tickets for lookups and name searches, written in one transaction"""
+    from api import DB
+    DB.ensure_initialized()
+    incs, number = [], 100000
+    rows = []
+    for _ in range(count):
+        number += rng.randint(1, 50)
+        inc = f"INC{number:06d}"
+        incs.append(inc)
+        rows.append((inc, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), "DESK123", "HQ", rng.choice(ISSUES)))
+    conn = sqlite3.connect(DB.db_path)
+    try:
+        conn.executemany("INSERT INTO tickets (inc, first, last, comp_name, bldg, issue) VALUES (?, ?, ?, ?, ?, ?)", rows)
+        conn.commit()
+    finally:
+        conn.close()
+    return incs
+
+def aggregate(worker_results: List[Dict], wall_s: float, args) -> Dict:
+    # Throughput covers the call phase only, not process start-up and imports
+    elapsed = max(r["elapsed_s"] for r in worker_results)
+    durations = [d for r in worker_results for d in r["call_durations"]]
+    db_durations = [d for r in worker_results for d in r["db_durations"]]
+    threshold_s = args.lock_wait_ms / 1000
+    waits = [d for d in db_durations if d >= threshold_s]
+    completed = sum(r["completed"] for r in worker_results)
+    tool_calls = sum(r["tool_calls"] for r in worker_results)
+    sessions = sum(r["sessions"] for r in worker_results)
+
+    by_tool: Dict[str, List[float]] = {}
+    for r in worker_results:
+        for tool, duration in r["tool_samples"]:
+            by_tool.setdefault(tool, []).append(duration)
+
+    errors = [e for r in worker_results for e in r["errors"]]
+    return {
+        "calls": args.calls,
+        "processes": args.processes,
+        "concurrency": args.concurrency * args.processes,
+        "think_ms": args.think_ms,
+        "completed": completed,
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "elapsed_s": round(elapsed, 3),
+        "wall_s": round(wall_s, 3),
+        "calls_per_sec": round(completed / elapsed, 1),
+        "tool_calls_per_sec": round(tool_calls / elapsed, 1),
+        "call_p50_ms": round(percentile(durations, 0.50) * 1000, 1),
+        "call_p99_ms": round(percentile(durations, 0.99) * 1000, 1),
+        "tools": {
+            tool: {
+                "count": len(samples),
+                "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+                "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+                "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+            }
+            for tool, samples in sorted(by_tool.items())
+        },
+        "sqlite": {
+            "statements": len(db_durations),
+            "statement_p50_ms": round(percentile(db_durations, 0.50) * 1000, 3),
+            "statement_p99_ms": round(percentile(db_durations, 0.99) * 1000, 3),
+            "lock_waits": len(waits),
+            "lock_wait_total_s": round(sum(waits), 3),
+            "locked_errors": sum(r["db_locked_errors"] for r in worker_results),
+        },
+        "memory": {
+            "rss_per_session_kb": round(sum(r["rss_growth_bytes"] for r in worker_results) / max(1, sessions) / 1024, 1),
+            "traced_peak_per_session_kb": round(
+                sum(r["traced_peak_bytes"] for r in worker_results) / max(1, sessions) / 1024, 1)
+            if args.trace_memory else None,
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent help desk calls offline")
+    parser.add_argument("--calls", type=int, default=500, help="Calls to simulate (default: 500)")
+    parser.add_argument("--concurrency", type=int, default=50,
+                        help="Concurrent calls per process (default: 50)")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Worker processes sharing the databases, like job processes on one host (default: 1)")
+    parser.add_argument("--think-ms", type=float, default=0,
+                        help="Mean simulated model latency before each step (default: 0, as fast as possible)")
+    parser.add_argument("--mix", type=float, nargs=3, default=[6, 3, 1], metavar=("NEW", "LOOKUP", "STATUS"),
+                        help="Relative weights of new-ticket, lookup and status calls (default: 6 3 1)")
+    parser.add_argument("--seed-tickets", type=int, default=2000, help="Existing tickets (default: 2000)")
+    parser.add_argument("--lock-wait-ms", type=float, default=5.0,
+                        help="Statements slower than this count as lock waits (default: 5)")
+    parser.add_argument("--trace-memory", action="store_true", help="Also measure Python allocations (slower)")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+    parser.add_argument("--json", action="store_true", help="Output as JSON")
+    args = parser.parse_args()
+
+    scratch = tempfile.TemporaryDirectory(prefix="servicedesk-load-")
+    # Databases are opened relative to the working directory, so everything lands in the scratch dir
+    os.environ["BUILDING_DIRECTORY"] = str(BACKEND_DIR / "buildings.example.csv")
+    os.environ.pop("ASSET_INVENTORY_CSV", None)
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.chdir(scratch.name)
+
+    try:
+        known_incs = seed_tickets(args.seed_tickets, random.Random(args.seed))
+        shares = [args.calls // args.processes + (1 if i < args.calls % args.processes else 0)
+                  for i in range(args.processes)]
+        threshold_s = args.lock_wait_ms / 1000
+
+        wall_started = time.perf_counter()
+        if args.processes == 1:
+            worker_results = [worker_main(0, shares[0], args, known_incs, threshold_s)]
+        else:
+            with multiprocessing.get_context("spawn").Pool(args.processes) as pool:
+                worker_results = pool.starmap(
+                    worker_main, [(i, shares[i], args, known_incs, threshold_s) for i in range(args.processes)])
+        report = aggregate(worker_results, time.perf_counter() - wall_started, args)
+    finally:
+        os.chdir(BACKEND_DIR)
+        scratch.cleanup()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print("\n" + "=" * 60)
+    print(f"HELP DESK CALL LOAD TEST ({report['calls']} calls, {report['processes']} process(es), "
+          f"{report['concurrency']} concurrent, think {report['think_ms']:g} ms)")
+    print("=" * 60)
+    print(f"Completed: {report['completed']}  Errors: {report['errors']}  Elapsed: {report['elapsed_s']} s")
+    for error in report["error_samples"]:
+        print(f"  error: {error}")
+    print(f"Throughput: {report['calls_per_sec']} calls/s, {report['tool_calls_per_sec']} tool calls/s")
+    print(f"Call duration: p50 {report['call_p50_ms']} ms, p99 {report['call_p99_ms']} ms")
+    print(f"\n{'Tool':<24} {'calls':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for tool, stats in report["tools"].items():
+        print(f"{tool:<24} {stats['count']:>7} {stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9}")
+    sqlite_stats = report["sqlite"]
+    print(f"\nSQLite: {sqlite_stats['statements']} statements, p50 {sqlite_stats['statement_p50_ms']} ms, "
+          f"p99 {sqlite_stats['statement_p99_ms']} ms")
+    print(f"Lock waits (>= {args.lock_wait_ms:g} ms): {sqlite_stats['lock_waits']}, "
+          f"{sqlite_stats['lock_wait_total_s']} s total, {sqlite_stats['locked_errors']} 'database is locked' errors")
+    memory = report["memory"]
+    print(f"Memory per session: {memory['rss_per_session_kb']} KB RSS"
+          + (f", {memory['traced_peak_per_session_kb']} KB Python allocations" if args.trace_memory else ""))
+
+if __name__ == "__main__":
+    main()
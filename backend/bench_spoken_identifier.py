@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Spoken Identifier Benchmark
+Compares the legacy regex-split phonetic conversion with the trie-based normalizer,
+cold (cache cleared) and memoized
+"""
+
+import argparse
+import json
+import re
+import timeit
+from spoken_identifier import PHONETIC_ALPHABET, normalize_spoken_identifier
+
+SAMPLE_INPUTS = [
+    "Golf-Delta-Kilo-7575",
+    "golf delta kilo seven five seven five",
+    "Mike-Yankee-Papa-Charlie-123",
+    "alfa juliett oh niner two",
+    "G D K double seven 5",
+    "golfdeltakilo7575",
+    "laptop 42",
+]
+
+def legacy_convert_phonetic_to_letters(text: str) -> str:
+    """The original api.convert_phonetic_to_letters, kept here as the baseline"""
+    if not text:
+        return text
+    parts = re.split(r'[-\s]+', text.lower())
+    return ''.join(PHONETIC_ALPHABET.get(part, part.upper()) for part in parts)
+
+def bench(fn, number: int, setup=None) -> float:
+    """Mean microseconds per call over the sample inputs"""
+    def run():
+        if setup:
+            setup()
+        for text in SAMPLE_INPUTS:
+            fn(text)
+    seconds = min(timeit.repeat(run, number=number, repeat=5))
+    return seconds / (number * len(SAMPLE_INPUTS)) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark spoken identifier normalization")
+    parser.add_argument("--number", type=int, default=2000, help="Iterations per repeat (default: 2000)")
+    parser.add_argument("--json", action="store_true", help="Output as JSON")
+
+    args = parser.parse_args()
+
+    results = {
+        "legacy_us": round(bench(legacy_convert_phonetic_to_letters, args.number), 3),
+        "trie_cold_us": round(bench(normalize_spoken_identifier.__wrapped__, args.number), 3),
+        "trie_memoized_us": round(bench(normalize_spoken_identifier, args.number), 3),
+        "outputs": {text: {
+            "legacy": legacy_convert_phonetic_to_letters(text),
+            "trie": normalize_spoken_identifier(text),
+        } for text in SAMPLE_INPUTS},
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("\n" + "=" * 60)
+    print("SPOKEN IDENTIFIER BENCHMARK (mean per input)")
+    print("=" * 60)
+    print(f"Legacy regex split:     {results['legacy_us']} us")
+    print(f"Trie normalizer (cold): {results['trie_cold_us']} us")
+    print(f"Trie normalizer (memo): {results['trie_memoized_us']} us")
+    print("\nOUTPUTS:")
+    for text, outputs in results["outputs"].items():
+        print(f"  {text!r:<42} legacy: {outputs['legacy']:<22} trie: {outputs['trie']}")
+
+if __name__ == "__main__":
+    main()
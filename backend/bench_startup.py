@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark
+Measures cold import time of the worker and CLI entry modules with `python -X importtime`,
+lists the slowest imports, and checks that importing them creates no database files.
+Results can be saved and compared against a previous run to track worker cold-start time
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+MODULES = ["agent", "transcriber", "api", "token_tracker", "view_token_usage", "view_transcripts", "check_db"]
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def parse_importtime(stderr: str):
+    """(module, self_us, cumulative_us) for each line of -X importtime output"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append((name.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+def measure(module: str, runs: int, top: int):
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    wall_ms, import_ms = [], []
+    slowest = {}
+    created = set()
+
+    for _ in range(runs):
+        # A fresh working directory shows any file the import creates (e.g. sqlite schemas)
+        with tempfile.TemporaryDirectory() as cwd:
+            started = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                cwd=cwd, env=env, capture_output=True, text=True
+            )
+            wall_ms.append((time.perf_counter() - started) * 1000)
+            created.update(os.listdir(cwd))
+
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+        entries = parse_importtime(result.stderr)
+        import_ms.append(next(c for name, _, c in reversed(entries) if name == module) / 1000)
+        for name, self_us, _ in entries:
+            slowest[name] = max(slowest.get(name, 0), self_us)
+
+    return {
+        "wall_ms": round(statistics.median(wall_ms), 1),
+        "import_ms": round(statistics.median(import_ms), 1),
+        "files_created": sorted(created),
+        "slowest_imports": [
+            {"module": name, "self_ms": round(us / 1000, 1)}
+            for name, us in sorted(slowest.items(), key=lambda item: -item[1])[:top]
+        ],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark worker and CLI cold-start import time")
+    parser.add_argument("modules", nargs="*", default=MODULES, help=f"Modules to import (default: {' '.join(MODULES)})")
+    parser.add_argument("--runs", type=int, default=3, help="Cold starts per module, median reported (default: 3)")
+    parser.add_argument("--top", type=int, default=5, help="Slowest imports listed per module (default: 5)")
+    parser.add_argument("--save", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Compare against results saved earlier with --save")
+    parser.add_argument("--json", action="store_true", help="Output as JSON")
+
+    args = parser.parse_args()
+    results = {module: measure(module, args.runs, args.top) for module in args.modules}
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("\n" + "=" * 60)
+    print(f"STARTUP BENCHMARK (median of {args.runs} cold starts)")
+    print("=" * 60)
+    for module, result in results.items():
+        line = f"{module:<18} import {result['import_ms']:>8.1f} ms   process {result['wall_ms']:>8.1f} ms"
+        if module in baseline:
+            line += f"   ({result['import_ms'] - baseline[module]['import_ms']:+.1f} ms vs baseline)"
+        print(line)
+        if result["files_created"]:
+            print(f"  ⚠️ files created on import: {', '.join(result['files_created'])}")
+        for entry in result["slowest_imports"]:
+            print(f"    {entry['self_ms']:>7.1f} ms  {entry['module']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Ticket Rendering Benchmark
+Compares building tool responses the old way (Ticket copied into an enum-keyed dict, string
+rebuilt with += and the INC re-formatted on every call) with the cached Ticket renderings
+"""
+
+import argparse
+import enum
+import json
+import sqlite3
+import timeit
+import tracemalloc
+from db_ticket import Ticket, TICKET_COLUMNS
+
+ROW = ("INC190244", "Jane", "Doe", "GDK7575", "HQ", "Computer freezes after login")
+
+class TicketDetails(enum.Enum):
+    Inc = "inc"
+    First = "first"
+    Last = "last"
+    Comp_Name = "comp_name"
+    Bldg = "bldg"
+    Issue = "issue"
+
+def legacy_format_ticket_number_for_speech(ticket_number: str) -> str:
+    formatted = ""
+    for char in ticket_number:
+        if char == '0':
+            formatted += "zero "
+        elif char.isdigit():
+            formatted += char + " "
+        else:
+            formatted += char
+    return formatted.strip()
+
+def legacy_ticket_details(ticket: Ticket) -> dict:
+    return {
+        TicketDetails.Inc: ticket.inc,
+        TicketDetails.First: ticket.first,
+        TicketDetails.Last: ticket.last,
+        TicketDetails.Comp_Name: ticket.comp_name,
+        TicketDetails.Bldg: ticket.bldg,
+        TicketDetails.Issue: ticket.issue
+    }
+
+def legacy_get_ticket_str(details: dict) -> str:
+    ticket_str = ""
+    for key, value in details.items():
+        if key == TicketDetails.Inc and value:
+            ticket_str += f"{key.value}: {legacy_format_ticket_number_for_speech(value)}\n"
+        else:
+            ticket_str += f"{key.value}: {value}\n"
+    return ticket_str
+
+def bench(fn, number: int) -> float:
+    """Mean microseconds per call"""
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ticket tool-response construction")
+    parser.add_argument("--number", type=int, default=20000, help="Iterations per repeat (default: 20000)")
+    parser.add_argument("--rows", type=int, default=1000, help="Rows for the row-mapping benchmark (default: 1000)")
+    parser.add_argument("--json", action="store_true", help="Output as JSON")
+
+    args = parser.parse_args()
+    ticket = Ticket(*ROW)
+    details = legacy_ticket_details(ticket)
+    assert legacy_get_ticket_str(details) == ticket.tool_text
+
+    # Row mapping: the old per-row keyword construction from a plain cursor vs the row factory
+    conn = sqlite3.connect(":memory:")
+    conn.execute(f"CREATE TABLE tickets ({TICKET_COLUMNS})")
+    conn.executemany("INSERT INTO tickets VALUES (?, ?, ?, ?, ?, ?)",
+                     [(f"INC{n:06d}",) + ROW[1:] for n in range(args.rows)])
+
+    def legacy_rows():
+        cursor = conn.execute(f"SELECT {TICKET_COLUMNS} FROM tickets")
+        return [Ticket(inc=r[0], first=r[1], last=r[2], comp_name=r[3], bldg=r[4], issue=r[5])
+                for r in cursor.fetchall()]
+
+    def factory_rows():
+        cursor = conn.cursor()
+        cursor.row_factory = Ticket.from_row
+        return cursor.execute(f"SELECT {TICKET_COLUMNS} FROM tickets").fetchall()
+
+    tracemalloc.start()
+    tickets = factory_rows()
+    ticket_bytes = tracemalloc.get_traced_memory()[0] / len(tickets)
+    tracemalloc.stop()
+
+    results = {
+        "legacy_details_copy_us": round(bench(lambda: legacy_ticket_details(ticket), args.number), 3),
+        "legacy_ticket_str_us": round(bench(lambda: legacy_get_ticket_str(details), args.number), 3),
+        "cached_tool_text_us": round(bench(lambda: ticket.tool_text, args.number), 3),
+        "first_tool_text_us": round(bench(lambda: Ticket(*ROW).tool_text, args.number), 3),
+        "legacy_rows_us_per_row": round(bench(legacy_rows, 50) / args.rows, 3),
+        "row_factory_us_per_row": round(bench(factory_rows, 50) / args.rows, 3),
+        "bytes_per_ticket": round(ticket_bytes),
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("\n" + "=" * 60)
+    print("TICKET RENDERING BENCHMARK (mean per call)")
+    print("=" * 60)
+    print(f"Legacy dict copy:             {results['legacy_details_copy_us']} us")
+    print(f"Legacy get_ticket_str:        {results['legacy_ticket_str_us']} us")
+    print(f"Ticket.tool_text (cached):    {results['cached_tool_text_us']} us")
+    print(f"New Ticket + first tool_text: {results['first_tool_text_us']} us")
+    print(f"Legacy row mapping:           {results['legacy_rows_us_per_row']} us/row")
+    print(f"Row factory mapping:          {results['row_factory_us_per_row']} us/row")
+    print(f"Memory per Ticket (+strings): {results['bytes_per_ticket']} bytes")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Token Server Load Test
+Runs the token server in its own process on an ephemeral port (no LiveKit connection needed)
+and drives /getToken with concurrent clients, reporting requests/sec and latency percentiles
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import time
+import aiohttp
+from aiohttp import web
+from token_server import TokenServer, TokenSigner
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+async def run_load(url: str, requests: int, concurrency: int):
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def client(session: aiohttp.ClientSession, client_id: int):
+        nonlocal errors
+        for request_id in remaining:
+            started = time.perf_counter()
+            async with session.get(url, params={"name": f"User {client_id}-{request_id}"}) as response:
+                await response.read()
+                if response.status != 200:
+                    errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(client(session, i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "requests_per_sec": round(requests / elapsed),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+    }
+
+def serve(port_queue):
+    """Server process: run the token server until terminated"""
+    logging.getLogger("token_server").setLevel(logging.WARNING)
+
+    async def run():
+        server = TokenServer(TokenSigner("bench-key", "bench-secret-" + "x" * 32))
+        runner = web.AppRunner(server.create_app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0, backlog=1024)
+        await site.start()
+        port_queue.put(site._server.sockets[0].getsockname()[1])
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+async def main_async(args, url):
+    await run_load(url, min(args.requests, 200), 8)  # warm up
+    return [await run_load(url, args.requests, concurrency) for concurrency in args.concurrency]
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the token server locally")
+    parser.add_argument("--requests", type=int, default=5000, help="Requests per run (default: 5000)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64, 256],
+                        help="Concurrent clients per run (default: 1 16 64 256)")
+    parser.add_argument("--json", action="store_true", help="Output as JSON")
+
+    args = parser.parse_args()
+    port_queue = multiprocessing.Queue()
+    server_process = multiprocessing.Process(target=serve, args=(port_queue,), daemon=True)
+    server_process.start()
+    try:
+        url = f"http://127.0.0.1:{port_queue.get(timeout=30)}/getToken"
+        results = asyncio.run(main_async(args, url))
+    finally:
+        server_process.terminate()
+        server_process.join()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("\n" + "=" * 60)
+    print(f"TOKEN SERVER LOAD TEST ({args.requests} requests per run)")
+    print("=" * 60)
+    print(f"{'Concurrency':>12} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'errors':>8}")
+    for result in results:
+        print(f"{result['concurrency']:>12} {result['requests_per_sec']:>10} {result['p50_ms']:>10} "
+              f"{result['p99_ms']:>10} {result['errors']:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+VAD Gate Benchmark
+Runs the local VAD gate over WAV recordings (or a synthetic call when none are given) and
+reports how much audio would be sent to the STT and the CPU cost per frame
+"""
+
+import argparse
+import json
+import time
+import wave
+import numpy as np
+from vad_gate import VADConfig, VADGate
+
+def load_wav(path: str):
+    """Load a 16-bit PCM WAV file as (mono int16 samples, sample rate)"""
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+        channels = wav.getnchannels()
+        sample_rate = wav.getframerate()
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+
+    if channels > 1:
+        samples = samples[::channels]
+    return samples, sample_rate
+
+def synthesize_call(sample_rate: int = 16000, seconds: float = 30.0, seed: int = 7):
+    """Build a call-like signal: background noise with voiced bursts separated by pauses"""
+    rng = np.random.default_rng(seed)
+    total = int(sample_rate * seconds)
+    signal = rng.normal(0, 30, total)  # roughly -60 dBFS room noise
+
+    position = int(sample_rate * 1.0)
+    while position < total:
+        burst = int(sample_rate * rng.uniform(0.6, 2.5))
+        end = min(position + burst, total)
+        t = np.arange(end - position) / sample_rate
+        pitch = rng.uniform(100, 220)
+        voiced = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+        syllables = 0.5 * (1 - np.cos(2 * np.pi * rng.uniform(3, 5) * t))
+        signal[position:end] += 4000 * voiced * syllables
+        position = end + int(sample_rate * rng.uniform(0.8, 4.0))
+
+    return np.clip(signal, -32768, 32767).astype(np.int16), sample_rate
+
+def run_benchmark(name: str, samples: np.ndarray, sample_rate: int, frame_ms: int, config: VADConfig):
+    frame_size = sample_rate * frame_ms // 1000
+    duration_s = frame_size / sample_rate
+    gate = VADGate(config)
+    timings = []
+
+    for start in range(0, samples.shape[0] - frame_size + 1, frame_size):
+        frame = samples[start:start + frame_size]
+        began = time.perf_counter()
+        gate.process(frame, frame, duration_s)
+        timings.append(time.perf_counter() - began)
+
+    timings_us = np.array(timings) * 1e6
+    return {
+        "name": name,
+        "audio_seconds": round(gate.seconds_in, 2),
+        "sent_seconds": round(gate.seconds_out, 2),
+        "sent_percent": round(100 * gate.seconds_out / max(gate.seconds_in, 1e-9), 1),
+        "bytes_saved": int((gate.frames_in - gate.frames_out) * frame_size * 2),
+        "segments": gate.segments,
+        "frames": gate.frames_in,
+        "us_per_frame_mean": round(float(timings_us.mean()), 2),
+        "us_per_frame_p99": round(float(np.percentile(timings_us, 99)), 2),
+        "realtime_cpu_percent": round(100 * float(timings_us.mean()) / (frame_ms * 1000), 4),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local VAD gate")
+    parser.add_argument("wav_files", nargs="*", help="16-bit PCM WAV recordings (default: synthetic call)")
+    parser.add_argument("--frame-ms", type=int, default=10, help="Frame size in milliseconds (default: 10)")
+    parser.add_argument("--json", action="store_true", help="Output as JSON")
+
+    args = parser.parse_args()
+    config = VADConfig.from_env()
+
+    results = []
+    if args.wav_files:
+        for path in args.wav_files:
+            samples, sample_rate = load_wav(path)
+            results.append(run_benchmark(path, samples, sample_rate, args.frame_ms, config))
+    else:
+        samples, sample_rate = synthesize_call()
+        results.append(run_benchmark("synthetic-call", samples, sample_rate, args.frame_ms, config))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("\n" + "=" * 60)
+    print("VAD GATE BENCHMARK")
+    print("=" * 60)
+    for result in results:
+        print(f"\n{result['name']}")
+        print(f"  Audio: {result['audio_seconds']}s, sent to STT: {result['sent_seconds']}s "
+              f"({result['sent_percent']}%) in {result['segments']} segments")
+        print(f"  Upload saved: {result['bytes_saved']:,} bytes of 16-bit PCM")
+        print(f"  CPU per {args.frame_ms}ms frame: mean {result['us_per_frame_mean']}us, "
+              f"p99 {result['us_per_frame_p99']}us ({result['realtime_cpu_percent']}% of realtime)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Budget Guard
+What a call does when its token budget runs low. At the soft limit the agent is told to answer
+briefly and its conversation context is compacted, because the realtime model bills the whole
+context again for every response. At the hard limit it is told to file the ticket and say
+goodbye, and the call is ended once that is done or a grace period passes
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional
+from livekit.agents import llm, voice
+from prompts import BUDGET_HARD_INSTRUCTIONS, BUDGET_SOFT_INSTRUCTIONS, BUDGET_WRAP_UP_MESSAGE
+from token_budget import BudgetState
+
+logger = logging.getLogger("budget-guard")
+
+def _item_text(item) -> str:
+    if item.type == "message":
+        return f"{item.role}: {item.text_content or ''}"
+    if item.type == "function_call":
+        return f"called {item.name}({item.arguments})"
+    if item.type == "function_call_output":
+        return f"{item.name} returned: {item.output}"
+    return ""
+
+def compact_chat_ctx(chat_ctx: llm.ChatContext, keep_last: int = 6, max_item_chars: int = 200,
+                     max_summary_chars: int = 1500) -> llm.ChatContext:
+    """Keep the system messages and the last keep_last items; everything older is replaced by
+    one system message holding a shortened transcript of it. No model call is made"""
+    system = [item for item in chat_ctx.items if item.type == "message" and item.role in ("system", "developer")]
+    rest = [item for item in chat_ctx.items if not (item.type == "message" and item.role in ("system", "developer"))]
+    if len(rest) <= keep_last:
+        return chat_ctx.copy()
+
+    recent = rest[-keep_last:] if keep_last else []
+    # A tool result can't be kept without the call that produced it
+    while recent and recent[0].type == "function_call_output":
+        recent.pop(0)
+    older = rest[:len(rest) - len(recent)]
+
+    lines: List[str] = []
+    used = 0
+    for item in reversed(older):
+        text = " ".join(_item_text(item).split())[:max_item_chars]
+        if not text:
+            continue
+        if used + len(text) > max_summary_chars:
+            break
+        lines.append(text)
+        used += len(text)
+    lines.reverse()
+    summary = llm.ChatMessage(role="system", content=[
+        "Summary of the earlier part of this call (older turns were removed to save tokens):\n" + "\n".join(lines)
+    ])
+    return llm.ChatContext(system + [summary] + recent)
+
+class BudgetGuard:
+    """Acts once on each budget level a call reaches; feed it every state the tracker returns"""
+
+    def __init__(self, agent: voice.Agent, session: voice.AgentSession, instructions: str,
+                 ticket_filed: Callable[[], bool], end_call: Callable[[], Awaitable[None]],
+                 keep_last: int = 6, wrap_up_grace_s: float = 60.0):
+        self.agent = agent
+        self.session = session
+        self.instructions = instructions
+        self.ticket_filed = ticket_filed
+        self.end_call = end_call
+        self.keep_last = keep_last
+        self.wrap_up_grace_s = wrap_up_grace_s
+        self.state = BudgetState.OK
+        self._compacted = False
+        self._task: Optional[asyncio.Task] = None
+
+    def update(self, state: BudgetState):
+        if state <= self.state:
+            return
+        previous, self.state = self.state, state
+        logger.warning("Token budget %s reached (was %s)", state.name.lower(), previous.name.lower())
+        previous_task = self._task
+        self._task = asyncio.create_task(self._apply(state, previous_task))
+
+    async def _apply(self, state: BudgetState, previous_task: Optional[asyncio.Task]):
+        if previous_task is not None:
+            await asyncio.gather(previous_task, return_exceptions=True)
+        try:
+            if state == BudgetState.SOFT:
+                await self.agent.update_instructions(self.instructions + BUDGET_SOFT_INSTRUCTIONS)
+                await self._compact()
+            elif state == BudgetState.HARD:
+                await self.agent.update_instructions(self.instructions + BUDGET_HARD_INSTRUCTIONS)
+                await self._compact()
+                await self._wrap_up()
+        except Exception as e:
+            logger.error(f"Error applying token budget {state.name.lower()}: {e}")
+            if state == BudgetState.HARD:
+                await self.end_call()
+
+    async def _compact(self):
+        if self._compacted:
+            return
+        self._compacted = True
+        before = len(self.agent.chat_ctx.items)
+        await self.agent.update_chat_ctx(compact_chat_ctx(self.agent.chat_ctx, self.keep_last))
+        logger.info("Compacted the conversation context from %d to %d items", before, len(self.agent.chat_ctx.items))
+
+    async def _wrap_up(self):
+        handle = self.session.generate_reply(instructions=BUDGET_WRAP_UP_MESSAGE)
+        deadline = time.monotonic() + self.wrap_up_grace_s
+        try:
+            await asyncio.wait_for(handle.wait_for_playout(), self.wrap_up_grace_s)
+        except asyncio.TimeoutError:
+            pass
+        # The ticket is filed by a tool call, whose spoken confirmation follows the first reply
+        while not self.ticket_filed() and time.monotonic() < deadline:
+            await asyncio.sleep(1)
+        current = self.session.current_speech
+        if current is not None:
+            try:
+                await asyncio.wait_for(current.wait_for_playout(), max(1.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                pass
+        logger.info("Ending the call at the hard token budget (ticket filed: %s)", self.ticket_filed())
+        await self.end_call()
+
+    async def aclose(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Building Directory
+Resolves spoken or free-text building names ("the north tower", "building twelve", "HQ annex")
+to canonical building codes through exact, alias, prefix and fuzzy matching over a compact
+in-memory index loaded from a local CSV file
+"""
+
+import csv
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from asset_inventory import edit_distance
+from spoken_identifier import SPOKEN_DIGITS
+
+logger = logging.getLogger("building-directory")
+
+# Words callers put around building names that don't identify the building
+FILLER_WORDS = {"the", "building", "bldg", "bld", "in", "at", "over", "on"}
+
+TEENS = {
+    'ten': 10, 'eleven': 11, 'twelve': 12, 'thirteen': 13, 'fourteen': 14, 'fifteen': 15,
+    'sixteen': 16, 'seventeen': 17, 'eighteen': 18, 'nineteen': 19
+}
+TENS = {
+    'twenty': 20, 'thirty': 30, 'forty': 40, 'fifty': 50, 'sixty': 60, 'seventy': 70,
+    'eighty': 80, 'ninety': 90
+}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Shorter names are too close to other buildings' names to correct spelling mistakes in
+FUZZY_MIN_LENGTH = 4
+
+def normalize_building(text: str) -> str:
+    """Comparison key: lower-case words without fillers, spoken numbers as digits, no spaces"""
+    words = [w for w in _WORD_RE.findall((text or "").lower()) if w not in FILLER_WORDS]
+    parts = []
+    i = 0
+    while i < len(words):
+        word = words[i]
+        if word in TENS:
+            unit = SPOKEN_DIGITS.get(words[i + 1]) if i + 1 < len(words) else None
+            if unit and unit != '0':
+                parts.append(str(TENS[word] + int(unit)))
+                i += 2
+                continue
+            parts.append(str(TENS[word]))
+        elif word in TEENS:
+            parts.append(str(TEENS[word]))
+        else:
+            parts.append(SPOKEN_DIGITS.get(word, word))
+        i += 1
+    return "".join(parts)
+
+@dataclass
+class Building:
+    code: str
+    name: str
+    aliases: List[str] = field(default_factory=list)
+
+@dataclass
+class BuildingMatch:
+    code: str
+    name: str
+    method: str        # 'exact', 'prefix' or 'fuzzy'; fuzzy matches need the caller's confirmation
+    distance: int = 0
+
+class _BuildingIndex:
+    """Immutable index over one version of the directory file"""
+
+    def __init__(self, buildings: List[Building]):
+        self.buildings = buildings
+        self.exact: Dict[str, int] = {}
+        for building_id, building in enumerate(buildings):
+            for text in [building.code, building.name] + building.aliases:
+                key = normalize_building(text)
+                if key:
+                    self.exact.setdefault(key, building_id)
+
+        # Sorted keys for prefix search by bisection, with the building each belongs to
+        entries = sorted(self.exact.items())
+        self.keys = [key for key, _ in entries]
+        self.ids = [building_id for _, building_id in entries]
+
+    def _match(self, building_id: int, method: str, distance: int = 0) -> BuildingMatch:
+        building = self.buildings[building_id]
+        return BuildingMatch(code=building.code, name=building.name, method=method, distance=distance)
+
+    def prefix_ids(self, key: str) -> List[int]:
+        ids = []
+        position = bisect_left(self.keys, key)
+        while position < len(self.keys) and self.keys[position].startswith(key):
+            if self.ids[position] not in ids:
+                ids.append(self.ids[position])
+            position += 1
+        return ids
+
+    def fuzzy_distances(self, key: str, max_distance: int) -> List[Tuple[int, int]]:
+        """(distance, building id) for every building within max_distance, nearest first"""
+        best: Dict[int, int] = {}
+        for candidate, building_id in zip(self.keys, self.ids):
+            if abs(len(candidate) - len(key)) > max_distance:
+                continue
+            distance = edit_distance(key, candidate, max_distance)
+            if distance <= max_distance and distance < best.get(building_id, max_distance + 1):
+                best[building_id] = distance
+        return sorted((distance, building_id) for building_id, distance in best.items())
+
+    def resolve(self, text: str) -> Tuple[Optional[BuildingMatch], List[BuildingMatch]]:
+        key = normalize_building(text)
+        if not key:
+            return None, []
+
+        building_id = self.exact.get(key)
+        if building_id is not None:
+            return self._match(building_id, "exact"), []
+
+        # Building numbers only match exactly: "2" is not "12", and "1" is not the start of "14"
+        if len(key) >= 2 and not key[-1].isdigit():
+            ids = self.prefix_ids(key)
+            if len(ids) == 1:
+                return self._match(ids[0], "prefix"), []
+            if ids:
+                return None, [self._match(i, "prefix") for i in ids]
+
+        if len(key) < FUZZY_MIN_LENGTH or any(c.isdigit() for c in key):
+            return None, []
+        found = self.fuzzy_distances(key, max(1, len(key) // 4))
+        candidates = [self._match(i, "fuzzy", d) for d, i in found]
+        if len(found) == 1 or (len(found) > 1 and found[0][0] < found[1][0]):
+            return candidates[0], []
+        return None, candidates
+
+class BuildingDirectory:
+    def __init__(self, path: Optional[str] = None, check_interval: float = 5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._index = _BuildingIndex([])
+        self._lock = threading.Lock()
+        self._file_signature = None
+        self._next_check = 0.0
+
+    def __len__(self):
+        return len(self._index.buildings)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path) or bool(self._index.buildings)
+
+    def load_buildings(self, buildings: List[Building]):
+        """Replace the directory contents (used when no file is configured)"""
+        self._index = _BuildingIndex(list(buildings))
+
+    def _read_file(self) -> List[Building]:
+        """CSV with code, name and optional aliases columns; aliases are separated by ';'"""
+        buildings = []
+        with open(self.path, newline="", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                row = {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+                if not row.get("code"):
+                    continue
+                aliases = [alias.strip() for alias in row.get("aliases", "").split(";") if alias.strip()]
+                buildings.append(Building(code=row["code"], name=row.get("name", ""), aliases=aliases))
+        return buildings
+
+    def reload_if_changed(self, force: bool = False) -> bool:
+        """Rebuild the index when the directory file changes; the old index serves until then"""
+        if not self.path:
+            return False
+
+        with self._lock:
+            now = time.monotonic()
+            if not force and now < self._next_check:
+                return False
+            self._next_check = now + self.check_interval
+
+            try:
+                stat = os.stat(self.path)
+                signature = (stat.st_mtime_ns, stat.st_size)
+                if signature == self._file_signature and not force:
+                    return False
+                self._index = _BuildingIndex(self._read_file())
+                self._file_signature = signature
+            except Exception as e:
+                logger.error(f"Error loading building directory: {e}")
+                return False
+
+        logger.info(f"Building directory loaded: {len(self)} buildings")
+        return True
+
+    def resolve(self, text: str) -> Optional[BuildingMatch]:
+        """The building a spoken/free-text name refers to, or None if unknown or ambiguous"""
+        self.reload_if_changed()
+        match, _ = self._index.resolve(text)
+        return match
+
+    def lookup(self, text: str, limit: int = 3) -> Tuple[Optional[BuildingMatch], List[BuildingMatch]]:
+        """The matching building, or the candidates to choose from when there isn't exactly one"""
+        self.reload_if_changed()
+        match, candidates = self._index.resolve(text)
+        return match, candidates[:limit]
+
+# Global instance; the file is read on first use, not at import
+building_directory = BuildingDirectory(os.getenv("BUILDING_DIRECTORY"))
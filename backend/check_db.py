@@ -12,7 +12,7 @@ def main():
     # Check current working directory
     print(f"Current working directory: {os.getcwd()}")
     
-    # Initialize database
+    # Database location (the schema is only created when tickets are first read or written)
     db = DatabaseTicket()
     print(f"Database path: {db.db_path}")
     print(f"Full database path: {os.path.abspath(db.db_path)}")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Worker Resource Comparison
+Samples memory and CPU of the running agent/transcriber workers (including their job
+processes) and reports the cost per concurrent call, to compare split and combined modes
+"""
+
+import argparse
+import json
+import sys
+import time
+import psutil
+
+WORKER_SCRIPTS = ("agent.py", "transcriber.py")
+
+def find_worker_processes():
+    """Find worker processes and their job subprocesses, grouped by worker script"""
+    workers = {}
+    for proc in psutil.process_iter(["pid", "cmdline"]):
+        cmdline = proc.info.get("cmdline") or []
+        script = next((s for s in WORKER_SCRIPTS if any(arg.endswith(s) for arg in cmdline)), None)
+        if not script:
+            continue
+
+        try:
+            procs = [proc] + proc.children(recursive=True)
+        except psutil.NoSuchProcess:
+            continue
+        workers.setdefault(script, {})
+        for p in procs:
+            workers[script][p.pid] = p
+
+    # Forked job processes can match on their own cmdline too, keying by pid counts them once
+    return {script: list(procs.values()) for script, procs in workers.items()}
+
+def process_memory(proc) -> int:
+    """Unique set size when available (excludes shared libraries), else RSS"""
+    try:
+        return proc.memory_full_info().uss
+    except (psutil.AccessDenied, AttributeError):
+        return proc.memory_info().rss
+
+def sample_workers(interval: float):
+    """Measure memory and CPU percent for each worker script over one interval"""
+    workers = find_worker_processes()
+
+    for procs in workers.values():
+        for proc in procs:
+            try:
+                proc.cpu_percent(None)
+            except psutil.NoSuchProcess:
+                pass
+
+    time.sleep(interval)
+
+    results = {}
+    for script, procs in workers.items():
+        memory = 0
+        cpu = 0.0
+        alive = 0
+        for proc in procs:
+            try:
+                cpu += proc.cpu_percent(None)
+                memory += process_memory(proc)
+                alive += 1
+            except psutil.NoSuchProcess:
+                continue
+        results[script] = {"processes": alive, "memory_mb": memory / (1024 * 1024), "cpu_percent": cpu}
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare worker memory/CPU per concurrent call")
+    parser.add_argument("--calls", type=int, required=True, help="Number of concurrent calls currently active")
+    parser.add_argument("--samples", type=int, default=10, help="Number of samples to average (default: 10)")
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds per sample (default: 1.0)")
+    parser.add_argument("--json", action="store_true", help="Output as JSON")
+
+    args = parser.parse_args()
+
+    totals = {}
+    for _ in range(args.samples):
+        for script, stats in sample_workers(args.interval).items():
+            entry = totals.setdefault(script, {"processes": 0, "memory_mb": 0.0, "cpu_percent": 0.0})
+            for key, value in stats.items():
+                entry[key] += value
+
+    if not totals:
+        print("No running agent.py or transcriber.py workers found")
+        return 1
+
+    report = {"calls": args.calls, "workers": {}, "per_call": {"memory_mb": 0.0, "cpu_percent": 0.0}}
+    for script, entry in totals.items():
+        averaged = {key: value / args.samples for key, value in entry.items()}
+        report["workers"][script] = averaged
+        report["per_call"]["memory_mb"] += averaged["memory_mb"] / max(args.calls, 1)
+        report["per_call"]["cpu_percent"] += averaged["cpu_percent"] / max(args.calls, 1)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    print(f"\nWorker resources with {args.calls} concurrent calls ({args.samples} x {args.interval}s samples)")
+    print("-" * 60)
+    for script, stats in report["workers"].items():
+        print(f"{script:<16} processes: {stats['processes']:.0f}  "
+              f"memory: {stats['memory_mb']:.1f} MB  cpu: {stats['cpu_percent']:.1f}%")
+    print("-" * 60)
+    print(f"Per call: memory {report['per_call']['memory_mb']:.1f} MB, cpu {report['per_call']['cpu_percent']:.1f}%")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,33 +1,168 @@
+import logging
 import sqlite3
-from typing import Optional
+import threading
+import time
 from dataclasses import dataclass
+from typing import List, Optional, Tuple
 from contextlib import contextmanager
 import random
 
-@dataclass
+logger = logging.getLogger("ticket-db")
+
+# Speech form of each INC character: zeros spelled out so they aren't read as "oh"
+_SPOKEN_INC_TABLE = str.maketrans({"0": "zero ", **{str(d): f"{d} " for d in range(1, 10)}})
+
+def format_ticket_number_for_speech(ticket_number: str) -> str:
+    """Format ticket number for clear speech pronunciation, especially zeros"""
+    if not ticket_number:
+        return ticket_number
+    return ticket_number.translate(_SPOKEN_INC_TABLE).strip()
+
 class Ticket:
+    """Immutable ticket record shared by the DB layer and the agent tools.
+    Renderings are computed on first use and cached on the record"""
+
+    FIELDS = ("inc", "first", "last", "comp_name", "bldg", "issue")
+    __slots__ = FIELDS + ("_spoken_inc", "_tool_text")
+
+    def __init__(self, inc: str, first: str, last: str, comp_name: str, bldg: str, issue: str):
+        set_field = object.__setattr__
+        set_field(self, "inc", inc)
+        set_field(self, "first", first)
+        set_field(self, "last", last)
+        set_field(self, "comp_name", comp_name)
+        set_field(self, "bldg", bldg)
+        set_field(self, "issue", issue)
+        set_field(self, "_spoken_inc", None)
+        set_field(self, "_tool_text", None)
+
+    @classmethod
+    def from_row(cls, cursor, row):
+        """sqlite3 row factory: builds the record straight from a row of TICKET_COLUMNS"""
+        return cls(*row)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Ticket is immutable, cannot set {name}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Ticket is immutable, cannot delete {name}")
+
+    def _values(self):
+        return (self.inc, self.first, self.last, self.comp_name, self.bldg, self.issue)
+
+    def __eq__(self, other):
+        if not isinstance(other, Ticket):
+            return NotImplemented
+        return self._values() == other._values()
+
+    def __hash__(self):
+        return hash(self._values())
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={value!r}" for name, value in zip(self.FIELDS, self._values()))
+        return f"Ticket({fields})"
+
+    def replace(self, **changes) -> "Ticket":
+        """A copy of the ticket with some fields changed"""
+        values = dict(zip(self.FIELDS, self._values()))
+        values.update(changes)
+        return Ticket(**values)
+
+    @property
+    def spoken_inc(self) -> str:
+        """Incident number formatted for speech"""
+        if self._spoken_inc is None:
+            object.__setattr__(self, "_spoken_inc", format_ticket_number_for_speech(self.inc))
+        return self._spoken_inc
+
+    @property
+    def tool_text(self) -> str:
+        """One "field: value" line per field, as returned to the model by the tools"""
+        if self._tool_text is None:
+            values = (self.spoken_inc if self.inc else "",) + self._values()[1:]
+            text = "".join(f"{name}: {value}\n" for name, value in zip(self.FIELDS, values))
+            object.__setattr__(self, "_tool_text", text)
+        return self._tool_text
+
+# Column order the Ticket row factory expects
+TICKET_COLUMNS = ", ".join(Ticket.FIELDS)
+
+TICKET_STATUSES = ("open", "in_progress", "escalated", "resolved", "closed")
+# Support levels a ticket can be escalated through; new tickets start at level 1
+MAX_ESCALATION_LEVEL = 3
+
+# Stored in PRAGMA user_version once the schema is created; raise it when the schema changes
+SCHEMA_VERSION = 1
+
+@dataclass(frozen=True)
+class TicketState:
+    """Current status of a ticket, materialized from its event log"""
+    inc: str
+    status: str = "open"
+    level: int = 1
+    notes: int = 0
+    updated_at: float = 0.0
+
+    @property
+    def tool_text(self) -> str:
+        return f"status: {self.status}\nsupport_level: {self.level}\nnotes: {self.notes}\n"
+
+@dataclass(frozen=True)
+class TicketEvent:
+    id: int
     inc: str
-    first: str
-    last: str
-    comp_name: str
-    bldg: str
-    issue: str
+    kind: str      # created, status, escalated or note
+    value: str
+    actor: str
+    created_at: float
 
 class DatabaseTicket:
-    def __init__(self, db_path: str = "auto_db.sqlite"):
+    def __init__(self, db_path: str = "auto_db.sqlite", keep_open: bool = False):
         self.db_path = db_path
-        self._init_db()
+        # The schema is created on first use, so importing api.py doesn't touch the disk
+        self._initialized = False
+        self._init_lock = threading.Lock()
+        # With keep_open, one connection is reused by every operation, one at a time, until close()
+        self.keep_open = keep_open
+        self._conn: Optional[sqlite3.Connection] = None
+        self._conn_lock = threading.RLock()
+
+    def ensure_initialized(self):
+        """Create the schema if this is the first use"""
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self._init_db()
+                    self._initialized = True
 
     @contextmanager
     def _get_connection(self):
+        self.ensure_initialized()
+        if self.keep_open:
+            with self._conn_lock:
+                if self._conn is None:
+                    self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                yield self._conn
+            return
         conn = sqlite3.connect(self.db_path)
         try:
             yield conn
         finally:
             conn.close()
 
+    def close(self):
+        """Close the connection kept open with keep_open; the next operation opens a new one"""
+        with self._conn_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
     def _init_db(self):
-        with self._get_connection() as conn:
+        conn = sqlite3.connect(self.db_path)
+        try:
+            # A database file gets its schema once, not once per process that opens it
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+                return
             cursor = conn.cursor()
             
             # Create tickets table
@@ -41,7 +176,55 @@ class DatabaseTicket:
                     issue TEXT NOT NULL
                 )
             """)
+            
+            # Index for looking up a caller's tickets by name
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_tickets_name
+                ON tickets(first COLLATE NOCASE, last COLLATE NOCASE)
+            """)
+            
+            # Index for routing tickets by building code
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_tickets_bldg
+                ON tickets(bldg)
+            """)
+            
+            # Append-only history of every change to a ticket
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ticket_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    inc TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    actor TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_ticket_events_inc
+                ON ticket_events(inc, id)
+            """)
+            # Index for reading the tickets created in a recent time window
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_ticket_events_kind
+                ON ticket_events(kind, created_at)
+            """)
+            
+            # Current state of each ticket, rewritten in the same transaction as each event
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ticket_state (
+                    inc TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    level INTEGER NOT NULL,
+                    notes INTEGER NOT NULL,
+                    last_event_id INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
             conn.commit()
+        finally:
+            conn.close()
 
     def _generate_incident_number(self) -> str:
         """Generate a unique incident number in format INC######"""
@@ -81,15 +264,11 @@ class DatabaseTicket:
             return f"INC{new_number:06d}"
 
     def create_ticket(self, inc: str, first: str, last: str, comp_name: str, bldg: str, issue: str) -> Ticket:
-        print(f"DB: Creating ticket with data: first={first}, last={last}, comp_name={comp_name}, bldg={bldg}, issue={issue}")
-        print(f"DB: Database path: {self.db_path}")
-        
         with self._get_connection() as conn:
             cursor = conn.cursor()
             
             # Generate a unique incident number (ignore the provided inc parameter)
             generated_inc = self._generate_incident_number()
-            print(f"DB: Generated incident number: {generated_inc}")
             
             # Ensure uniqueness (in case of collision)
             while True:
@@ -98,40 +277,179 @@ class DatabaseTicket:
                     break
                 # If collision, generate a new one
                 generated_inc = self._generate_incident_number()
-                print(f"DB: Collision detected, new incident number: {generated_inc}")
+                logger.debug("Collision detected, new incident number: %s", generated_inc)
             
             try:
                 cursor.execute(
                     "INSERT INTO tickets (inc, first, last, comp_name, bldg, issue) VALUES (?, ?, ?, ?, ?, ?)",
                     (generated_inc, first, last, comp_name, bldg, issue)
                 )
+                self._append_event(conn, TicketState(generated_inc), "created", "open", "agent")
                 conn.commit()
-                print(f"DB: Ticket inserted successfully with INC: {generated_inc}")
-                
-                # Verify the insert worked
-                cursor.execute("SELECT COUNT(*) FROM tickets WHERE inc = ?", (generated_inc,))
-                count = cursor.fetchone()[0]
-                print(f"DB: Verification - Found {count} tickets with INC: {generated_inc}")
+                logger.debug("Ticket inserted with INC: %s into %s", generated_inc, self.db_path)
                 
                 return Ticket(inc=generated_inc, first=first, last=last, comp_name=comp_name, bldg=bldg, issue=issue)
                 
             except Exception as e:
-                print(f"DB: Error inserting ticket: {e}")
+                logger.error("Error inserting ticket %s: %s", generated_inc, e)
+                raise
+
+    def apply_journaled_tickets(self, records: List[Tuple[Ticket, float]]) -> Tuple[int, List[Ticket]]:
+        """Insert tickets from the ticket journal, with their INCs and creation times, in one
+        transaction. Tickets already present are skipped, so applying records again is harmless.
+        Returns how many were inserted and the journaled tickets whose INC belongs to a different
+        ticket"""
+        inserted = 0
+        conflicts = []
+        with self._get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for ticket, created_at in records:
+                    cursor = conn.execute(
+                        "INSERT OR IGNORE INTO tickets (inc, first, last, comp_name, bldg, issue) VALUES (?, ?, ?, ?, ?, ?)",
+                        (ticket.inc, ticket.first, ticket.last, ticket.comp_name, ticket.bldg, ticket.issue)
+                    )
+                    if cursor.rowcount == 1:
+                        self._append_event(conn, TicketState(ticket.inc), "created", "open", "agent", created_at)
+                        inserted += 1
+                        continue
+                    cursor = conn.cursor()
+                    cursor.row_factory = Ticket.from_row
+                    existing = cursor.execute(f"SELECT {TICKET_COLUMNS} FROM tickets WHERE inc = ?", (ticket.inc,)).fetchone()
+                    if existing != ticket:
+                        conflicts.append(ticket)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return inserted, conflicts
+
+    def max_incident_number(self) -> int:
+        """Numeric part of the highest INC###### in the database, 0 when there is none"""
+        with self._get_connection() as conn:
+            row = conn.execute(
+                "SELECT inc FROM tickets WHERE inc LIKE 'INC%' AND LENGTH(inc) = 9 ORDER BY inc DESC LIMIT 1"
+            ).fetchone()
+        return int(row[0][3:]) if row and row[0][3:].isdigit() else 0
+
+    @staticmethod
+    def _append_event(conn, state: TicketState, kind: str, value: str, actor: str,
+                      now: Optional[float] = None) -> TicketState:
+        """Append an event and write the ticket's new state; the caller commits both together"""
+        now = time.time() if now is None else now
+        cursor = conn.execute(
+            "INSERT INTO ticket_events (inc, kind, value, actor, created_at) VALUES (?, ?, ?, ?, ?)",
+            (state.inc, kind, value, actor, now)
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO ticket_state (inc, status, level, notes, last_event_id, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (state.inc, state.status, state.level, state.notes, cursor.lastrowid, now)
+        )
+        return TicketState(state.inc, state.status, state.level, state.notes, now)
+
+    @staticmethod
+    def _read_state(conn, inc: str) -> Optional[TicketState]:
+        row = conn.execute("SELECT inc, status, level, notes, updated_at FROM ticket_state WHERE inc = ?",
+                           (inc,)).fetchone()
+        if row is not None:
+            return TicketState(*row)
+        # Tickets created before the event log have no state row yet
+        if conn.execute("SELECT 1 FROM tickets WHERE inc = ?", (inc,)).fetchone():
+            return TicketState(inc)
+        return None
+
+    def _change(self, inc: str, kind: str, value: str, actor: str, apply) -> Optional[TicketState]:
+        """Append one event and update the state row in a single write transaction;
+        None when the ticket doesn't exist"""
+        with self._get_connection() as conn:
+            # Taking the write lock first keeps the read-modify-write of the state row atomic
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                state = self._read_state(conn, inc)
+                if state is None:
+                    conn.rollback()
+                    return None
+                state = self._append_event(conn, apply(state), kind, value, actor)
+                conn.commit()
+            except Exception:
+                conn.rollback()
                 raise
+        logger.debug("Ticket %s: %s %s", inc, kind, value)
+        return state
+
+    def set_status(self, inc: str, status: str, actor: str = "agent") -> Optional[TicketState]:
+        if status not in TICKET_STATUSES:
+            raise ValueError(f"Unknown ticket status: {status}")
+        return self._change(inc, "status", status, actor,
+                            lambda state: TicketState(state.inc, status, state.level, state.notes))
+
+    def escalate(self, inc: str, reason: str, actor: str = "agent") -> Optional[TicketState]:
+        """Move the ticket up one support level (up to MAX_ESCALATION_LEVEL) and mark it escalated"""
+        return self._change(inc, "escalated", reason, actor,
+                            lambda state: TicketState(state.inc, "escalated",
+                                                      min(state.level + 1, MAX_ESCALATION_LEVEL), state.notes))
+
+    def add_note(self, inc: str, note: str, actor: str = "agent") -> Optional[TicketState]:
+        return self._change(inc, "note", note, actor,
+                            lambda state: TicketState(state.inc, state.status, state.level, state.notes + 1))
+
+    def get_ticket_state(self, inc: str) -> Optional[TicketState]:
+        """Current state of a ticket: a single-row lookup, no replay of its events"""
+        with self._get_connection() as conn:
+            return self._read_state(conn, inc)
+
+    def get_ticket_events(self, inc: str) -> List[TicketEvent]:
+        """The ticket's history, oldest first"""
+        with self._get_connection() as conn:
+            rows = conn.execute(
+                "SELECT id, inc, kind, value, actor, created_at FROM ticket_events WHERE inc = ? ORDER BY id",
+                (inc,)
+            ).fetchall()
+        return [TicketEvent(*row) for row in rows]
+
+    def get_tickets_created_since(self, after_event_id: int, since: float) -> List[Tuple[int, float, Ticket]]:
+        """(event id, created_at, ticket) for tickets whose "created" event is newer than both
+        after_event_id and the since timestamp, oldest first"""
+        with self._get_connection() as conn:
+            rows = conn.execute(
+                f"SELECT e.id, e.created_at, {', '.join('t.' + name for name in Ticket.FIELDS)} "
+                "FROM ticket_events e JOIN tickets t ON t.inc = e.inc "
+                "WHERE e.kind = 'created' AND e.created_at >= ? AND e.id > ? ORDER BY e.id",
+                (since, after_event_id)
+            ).fetchall()
+        return [(row[0], row[1], Ticket(*row[2:])) for row in rows]
+
+    def ping(self):
+        """Run a cheap indexed read, for readiness checks"""
+        with self._get_connection() as conn:
+            conn.execute("SELECT inc FROM tickets ORDER BY inc DESC LIMIT 1").fetchall()
 
     def get_ticket_by_inc(self, inc: str) -> Optional[Ticket]:
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM tickets WHERE inc = ?", (inc,))
-            row = cursor.fetchone()
-            if not row:
-                return None
+            cursor.row_factory = Ticket.from_row
+            cursor.execute(f"SELECT {TICKET_COLUMNS} FROM tickets WHERE inc = ?", (inc,))
+            return cursor.fetchone()
+
+    def get_tickets_by_name(self, first: str, last: str = "", limit: int = 5) -> List[Ticket]:
+        """Get the most recent tickets for a user, matched case-insensitively by name"""
+        if not first:
+            return []
+        
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = Ticket.from_row
+            if last:
+                cursor.execute(
+                    f"SELECT {TICKET_COLUMNS} FROM tickets WHERE first = ? COLLATE NOCASE AND last = ? COLLATE NOCASE "
+                    "ORDER BY inc DESC LIMIT ?",
+                    (first, last, limit)
+                )
+            else:
+                cursor.execute(
+                    f"SELECT {TICKET_COLUMNS} FROM tickets WHERE first = ? COLLATE NOCASE ORDER BY inc DESC LIMIT ?",
+                    (first, limit)
+                )
             
-            return Ticket(
-                inc=row[0],
-                first=row[1],
-                last=row[2],
-                comp_name=row[3],
-                bldg=row[4],
-                issue=row[5]
-            )
+            return cursor.fetchall()
@@ -6,8 +6,9 @@ Handles tracking of Azure OpenAI token usage for both transcriber and agent serv
 
 import sqlite3
 import logging
+import threading
 from datetime import datetime
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 from dataclasses import dataclass
 
 logger = logging.getLogger("token-usage-db")
@@ -17,7 +18,7 @@ class TokenUsageRecord:
     session_id: str
     user_name: str
     service_type: str  # 'transcriber' or 'agent'
-    model_name: str    # 'whisper' or 'gpt-4o-realtime'
+    model_name: str    # 'gpt-4o-transcribe' or 'gpt-4o-realtime'
     input_tokens: int
     output_tokens: int
     total_tokens: int
@@ -29,7 +30,21 @@ class TokenUsageRecord:
 class TokenUsageDatabase:
     def __init__(self, db_path: str = "token_usage.sqlite"):
         self.db_path = db_path
-        self.init_database()
+        # The schema is created on first use, so importing this module doesn't touch the disk
+        self._initialized = False
+        self._init_lock = threading.Lock()
+    
+    def ensure_initialized(self):
+        """Create the schema if this is the first use"""
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self.init_database()
+                    self._initialized = True
+    
+    def _connect(self):
+        self.ensure_initialized()
+        return sqlite3.connect(self.db_path)
     
     def init_database(self):
         """Initialize the token usage database with required tables"""
@@ -75,6 +90,12 @@ class TokenUsageDatabase:
                     ON token_usage(created_at)
                 """)
                 
+                # Daily budget totals are summed from the sessions started since midnight
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_session_start
+                    ON token_usage(session_start)
+                """)
+                
                 conn.commit()
                 logger.info("Token usage database initialized successfully")
                 
@@ -82,10 +103,15 @@ class TokenUsageDatabase:
             logger.error(f"Error initializing token usage database: {e}")
             raise
     
+    def ping(self):
+        """Run a cheap indexed read, for readiness checks"""
+        with self._connect() as conn:
+            conn.execute("SELECT id FROM token_usage ORDER BY id DESC LIMIT 1").fetchall()
+
     def start_session(self, session_id: str, user_name: str, service_type: str, model_name: str) -> int:
         """Start a new token tracking session"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute("""
@@ -109,7 +135,7 @@ class TokenUsageDatabase:
         try:
             total_tokens = input_tokens + output_tokens
             
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 
                 # Update existing record by adding to current totals
@@ -134,7 +160,7 @@ class TokenUsageDatabase:
     def end_session(self, session_id: str, service_type: str = None):
         """End token tracking session(s)"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 
                 if service_type:
@@ -162,7 +188,7 @@ class TokenUsageDatabase:
     def get_session_usage(self, session_id: str) -> List[TokenUsageRecord]:
         """Get token usage for a specific session"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute("""
@@ -196,10 +222,22 @@ class TokenUsageDatabase:
             logger.error(f"Error getting session usage: {e}")
             return []
     
+    def get_daily_usage(self, user_name: str, since: datetime) -> Tuple[int, int]:
+        """Tokens used by one user and by everyone in sessions started since the given time"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT COALESCE(SUM(CASE WHEN user_name = ? THEN total_tokens END), 0),
+                       COALESCE(SUM(total_tokens), 0)
+                FROM token_usage
+                WHERE session_start >= ?
+            """, (user_name, since))
+            return cursor.fetchone()
+    
     def get_usage_summary(self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> Dict:
         """Get usage summary with optional date filtering"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 
                 where_clause = ""
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Transcript Database Module
+Stores call transcripts (one row per turn) with a full-text index for supervisor QA, and a
+background writer that batches inserts off the realtime STT/agent callback path
+"""
+
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+
+logger = logging.getLogger("transcript-db")
+
+@dataclass
+class TranscriptTurn:
+    session_id: str
+    room_name: str
+    user_name: str
+    speaker: str       # 'user' or 'agent'
+    text: str
+    created_at: datetime
+    id: Optional[int] = None
+
+class TranscriptDatabase:
+    def __init__(self, db_path: str = "transcripts.sqlite"):
+        self.db_path = db_path
+        # The schema is created on first use, so importing this module doesn't touch the disk
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        # WAL lets the agent and transcriber workers write while supervisors query
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def ensure_initialized(self):
+        """Create the schema if this is the first use"""
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self.init_database()
+                    self._initialized = True
+
+    def _connect(self):
+        self.ensure_initialized()
+        return self._open()
+
+    def init_database(self):
+        """Initialize the transcript tables, full-text index and sync triggers"""
+        try:
+            with self._open() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS transcripts (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        session_id TEXT NOT NULL,
+                        room_name TEXT,
+                        user_name TEXT,
+                        speaker TEXT NOT NULL,
+                        text TEXT NOT NULL,
+                        created_at TIMESTAMP NOT NULL
+                    )
+                """)
+
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_transcripts_session
+                    ON transcripts(session_id, created_at)
+                """)
+
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_transcripts_room
+                    ON transcripts(room_name, created_at)
+                """)
+
+                # External-content FTS index over the turn text, kept in sync by triggers
+                cursor.execute("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS transcripts_fts
+                    USING fts5(text, content='transcripts', content_rowid='id')
+                """)
+
+                cursor.execute("""
+                    CREATE TRIGGER IF NOT EXISTS transcripts_fts_insert AFTER INSERT ON transcripts BEGIN
+                        INSERT INTO transcripts_fts(rowid, text) VALUES (new.id, new.text);
+                    END
+                """)
+
+                cursor.execute("""
+                    CREATE TRIGGER IF NOT EXISTS transcripts_fts_delete AFTER DELETE ON transcripts BEGIN
+                        INSERT INTO transcripts_fts(transcripts_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                    END
+                """)
+
+                conn.commit()
+                logger.info("Transcript database initialized successfully")
+
+        except Exception as e:
+            logger.error(f"Error initializing transcript database: {e}")
+            raise
+
+    def insert_turns(self, turns: List[TranscriptTurn]):
+        """Insert a batch of turns in a single transaction"""
+        if not turns:
+            return
+
+        with self._connect() as conn:
+            conn.executemany("""
+                INSERT INTO transcripts (session_id, room_name, user_name, speaker, text, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [
+                (t.session_id, t.room_name, t.user_name, t.speaker, t.text, t.created_at.isoformat())
+                for t in turns
+            ])
+            conn.commit()
+
+    def _rows_to_turns(self, rows) -> List[TranscriptTurn]:
+        return [
+            TranscriptTurn(
+                id=row[0],
+                session_id=row[1],
+                room_name=row[2],
+                user_name=row[3],
+                speaker=row[4],
+                text=row[5],
+                created_at=datetime.fromisoformat(row[6])
+            )
+            for row in rows
+        ]
+
+    def get_call_transcript(self, call_id: str) -> List[TranscriptTurn]:
+        """Get all turns of a call, by tracking session ID or room name, in spoken order"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT id, session_id, room_name, user_name, speaker, text, created_at
+                    FROM transcripts
+                    WHERE session_id = ? OR room_name = ?
+                    ORDER BY created_at, id
+                """, (call_id, call_id))
+                return self._rows_to_turns(cursor.fetchall())
+
+        except Exception as e:
+            logger.error(f"Error getting call transcript: {e}")
+            return []
+
+    def search(self, query: str, user_name: Optional[str] = None, start_date: Optional[datetime] = None,
+               limit: int = 50) -> List[TranscriptTurn]:
+        """Full-text search across calls (FTS5 query syntax), best matches first"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+
+                where_clause = ""
+                params = [query]
+
+                if user_name:
+                    where_clause += " AND t.user_name = ?"
+                    params.append(user_name)
+
+                if start_date:
+                    where_clause += " AND t.created_at >= ?"
+                    params.append(start_date.isoformat())
+
+                params.append(limit)
+                cursor.execute(f"""
+                    SELECT t.id, t.session_id, t.room_name, t.user_name, t.speaker, t.text, t.created_at
+                    FROM transcripts_fts
+                    JOIN transcripts t ON t.id = transcripts_fts.rowid
+                    WHERE transcripts_fts MATCH ? {where_clause}
+                    ORDER BY transcripts_fts.rank
+                    LIMIT ?
+                """, params)
+                return self._rows_to_turns(cursor.fetchall())
+
+        except Exception as e:
+            logger.error(f"Error searching transcripts: {e}")
+            return []
+
+class TranscriptWriter:
+    """Queues turns from realtime callbacks and inserts them in batches on a background thread"""
+
+    def __init__(self, db: TranscriptDatabase, batch_size: int = 50, flush_interval: float = 1.0,
+                 max_queue: int = 10000):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.dropped_turns = 0
+        self.written_turns = 0
+        self.batches_written = 0
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="transcript-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def record(self, session_id: str, room_name: str, user_name: str, speaker: str, text: str):
+        """Queue one turn for writing; never blocks the caller"""
+        if not text:
+            return
+        self._ensure_started()
+
+        turn = TranscriptTurn(
+            session_id=session_id or "",
+            room_name=room_name or "",
+            user_name=user_name or "",
+            speaker=speaker,
+            text=text,
+            created_at=datetime.now()
+        )
+        try:
+            self._queue.put_nowait(turn)
+        except queue.Full:
+            self.dropped_turns += 1
+            logger.warning(f"Transcript queue full, dropped turn for session {session_id}")
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until every turn queued so far has been written"""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """Write out queued turns and stop the writer thread"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _write(self, batch: List[TranscriptTurn]):
+        if not batch:
+            return
+        try:
+            self.db.insert_turns(batch)
+            self.written_turns += len(batch)
+            self.batches_written += 1
+        except Exception as e:
+            self.dropped_turns += len(batch)
+            logger.error(f"Error writing {len(batch)} transcript turns: {e}")
+        batch.clear()
+
+    def _run(self):
+        batch: List[TranscriptTurn] = []
+        deadline = None
+
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._write(batch)
+                deadline = None
+                continue
+
+            if item is None:
+                self._write(batch)
+                return
+
+            if isinstance(item, threading.Event):
+                self._write(batch)
+                deadline = None
+                item.set()
+                continue
+
+            batch.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                deadline = None
+
+# Global instances
+transcript_db = TranscriptDatabase()
+transcript_writer = TranscriptWriter(transcript_db)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Incident Number Fast Path
+Spots spoken incident numbers ("I N C one nine oh two double four") in user transcripts,
+looks the ticket up right away and puts the result into the agent's chat context, so the
+model doesn't need a lookup_ticket round trip before it can answer
+"""
+
+import asyncio
+import logging
+import re
+from typing import Optional, Set
+from spoken_identifier import SPOKEN_DIGITS, REPEATERS, normalize_spoken_identifier
+
+logger = logging.getLogger("inc-fastpath")
+
+INC_PREFIX = "INC"
+INC_DIGITS = 6
+
+_DIGIT_WORDS = "|".join(sorted(list(SPOKEN_DIGITS) + list(REPEATERS), key=len, reverse=True))
+
+# An anchor ("INC", "I N C", "incident number", "ticket") followed by a run of spoken or written digits
+_INCIDENT_RE = re.compile(
+    rf"\b(?:i[\s.-]*n[\s.-]*c|incident|ticket)"
+    rf"(?:[\s,]+(?:number|no|num|is|was|it's|its))*[\s.,#:-]*"
+    rf"((?:(?:\d|\b(?:{_DIGIT_WORDS})\b)[\s,.-]*)+)",
+    re.IGNORECASE
+)
+
+def parse_incident_number(text: str) -> Optional[str]:
+    """The first well-formed incident number (INC + 6 digits) spoken in text, or None"""
+    if not text:
+        return None
+    for match in _INCIDENT_RE.finditer(text):
+        digits = normalize_spoken_identifier(match.group(1).lower())
+        if len(digits) == INC_DIGITS and digits.isdigit():
+            return f"{INC_PREFIX}{digits}"
+    return None
+
+class IncidentFastPath:
+    """Transcript listener that resolves spoken incident numbers ahead of the model"""
+
+    def __init__(self, assistant_fnc, agent):
+        self.assistant_fnc = assistant_fnc
+        self.agent = agent
+        self._handled: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.lookups = 0
+
+    def on_transcript(self, transcript: str):
+        inc = parse_incident_number(transcript)
+        if inc is None or inc in self._handled:
+            return
+        self._handled.add(inc)
+
+        task = asyncio.create_task(self._lookup_and_inject(inc))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _lookup_and_inject(self, inc: str):
+        try:
+            ticket = await self.assistant_fnc.prefetch_ticket(inc)
+            self.lookups += 1
+
+            if ticket is not None:
+                note = (f"The user's ticket {inc} has already been looked up, there is no need to call "
+                        f"lookup_ticket for it. The ticket details are:\n{self.assistant_fnc.get_ticket_str()}")
+            else:
+                note = f"Ticket {inc}, mentioned by the user, was looked up and does not exist."
+
+            chat_ctx = self.agent.chat_ctx.copy()
+            chat_ctx.add_message(role="system", content=note)
+            await self.agent.update_chat_ctx(chat_ctx)
+            logger.info(f"Fast path lookup for {inc}: {'found' if ticket else 'not found'}")
+        except Exception as e:
+            logger.error(f"Error in incident fast path for {inc}: {e}")
+
+    async def aclose(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
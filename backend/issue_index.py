@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Issue Index
+Finds tickets opened recently in the same building for nearly the same issue, so a caller
+reporting an outage that is already known can be attached to the existing incident instead of
+filing another ticket. Issue texts are kept as MinHash signatures in an in-memory LSH index per
+building covering a sliding time window; the window is kept in step with tickets filed by
+other workers through the ticket event log
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Set
+import numpy as np
+from building_directory import normalize_building
+
+logger = logging.getLogger("issue-index")
+
+# Words that don't tell one issue from another
+STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "it", "its", "my", "our", "we", "i",
+    "me", "on", "in", "at", "of", "to", "and", "or", "for", "with", "this", "that", "there", "has",
+    "have", "had", "not", "no", "can", "cannot", "cant", "isnt", "doesnt", "dont", "wont", "all",
+    "just", "again", "since", "when", "from", "keeps", "still", "anymore", "any", "some",
+}
+
+SHINGLE_SIZE = 3
+
+# Universal hashing modulo a Mersenne prime below 2^31, so a * x fits in 64 bits
+_PRIME = (1 << 31) - 1
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+def shingles(issue: str) -> Set[str]:
+    """Character 3-grams of the issue's significant words, so "printers" still matches "printer"
+    and word order matters little"""
+    words = [w for w in _WORD_RE.findall((issue or "").lower().replace("'", "")) if w not in STOP_WORDS]
+    text = " ".join(words)
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+@dataclass(frozen=True)
+class IssueMatch:
+    inc: str
+    bldg: str
+    issue: str
+    similarity: float  # estimated Jaccard similarity of the two issues' shingles
+    age_s: float
+
+@dataclass(eq=False)
+class _Entry:
+    inc: str
+    bldg: str
+    issue: str
+    signature: np.ndarray
+    created_at: float
+    band_keys: List[bytes]
+
+@dataclass
+class _BuildingWindow:
+    entries: Deque[_Entry] = field(default_factory=deque)  # oldest first
+    bands: List[Dict[bytes, List[_Entry]]] = field(default_factory=list)
+
+class IssueIndex:
+    """Tickets filed in the last window_s seconds, grouped by building. find() hashes the issue
+    once and compares it only with tickets sharing an LSH band with it, so a lookup stays
+    well under a millisecond even with hundreds of tickets open for one building"""
+
+    def __init__(self, window_s: float = 7200.0, threshold: float = 0.5, num_perm: int = 128,
+                 bands: int = 64, enabled: bool = True, clock=time.time, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.window_s = window_s
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.enabled = enabled
+        self.clock = clock
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+        self._windows: Dict[str, _BuildingWindow] = {}
+        self._incs: Dict[str, _Entry] = {}
+        self._last_event_id = 0
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._incs)
+
+    def signature(self, issue: str) -> Optional[np.ndarray]:
+        grams = shingles(issue)
+        if not grams:
+            return None
+        x = np.fromiter((zlib.crc32(g.encode()) % _PRIME for g in grams), dtype=np.uint64, count=len(grams))
+        return ((np.outer(x, self._a) + self._b) % _PRIME).min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _expire(self, now: float):
+        cutoff = now - self.window_s
+        for key in list(self._windows):
+            window = self._windows[key]
+            while window.entries and window.entries[0].created_at < cutoff:
+                entry = window.entries.popleft()
+                self._incs.pop(entry.inc, None)
+                for band, band_key in zip(window.bands, entry.band_keys):
+                    bucket = band[band_key]
+                    bucket.remove(entry)
+                    if not bucket:
+                        del band[band_key]
+            if not window.entries:
+                del self._windows[key]
+
+    def add(self, inc: str, bldg: str, issue: str, created_at: Optional[float] = None):
+        """Index a ticket; tickets without a building or issue text, or already indexed, are skipped"""
+        key = normalize_building(bldg)
+        signature = self.signature(issue)
+        if not key or signature is None:
+            return
+        created_at = self.clock() if created_at is None else created_at
+        with self._lock:
+            if inc in self._incs or created_at < self.clock() - self.window_s:
+                return
+            window = self._windows.get(key)
+            if window is None:
+                window = self._windows[key] = _BuildingWindow(bands=[{} for _ in range(self.bands)])
+            entry = _Entry(inc, bldg, issue, signature, created_at, self._band_keys(signature))
+            # Tickets arrive in time order, apart from the sync racing a local add
+            if window.entries and window.entries[-1].created_at > created_at:
+                entries = sorted([*window.entries, entry], key=lambda e: e.created_at)
+                window.entries = deque(entries)
+            else:
+                window.entries.append(entry)
+            for band, band_key in zip(window.bands, entry.band_keys):
+                band.setdefault(band_key, []).append(entry)
+            self._incs[inc] = entry
+
+    def find(self, bldg: str, issue: str) -> Optional[IssueMatch]:
+        """The most similar ticket filed for this building within the window, if it is at least
+        threshold similar"""
+        key = normalize_building(bldg)
+        signature = self.signature(issue)
+        if not key or signature is None:
+            return None
+        now = self.clock()
+        with self._lock:
+            self._expire(now)
+            window = self._windows.get(key)
+            if window is None:
+                return None
+            candidates = {}
+            for band, band_key in zip(window.bands, self._band_keys(signature)):
+                for entry in band.get(band_key, ()):
+                    candidates[entry.inc] = entry
+            if not candidates:
+                return None
+            entries = list(candidates.values())
+            agreeing = np.count_nonzero(np.stack([entry.signature for entry in entries]) == signature, axis=1)
+        # Ties go to the newest ticket
+        best_agreeing, _, best = max(zip(agreeing.tolist(), (entry.created_at for entry in entries), entries),
+                                     key=lambda item: item[:2])
+        best_similarity = best_agreeing / self.num_perm
+        if best_similarity < self.threshold:
+            return None
+        return IssueMatch(best.inc, best.bldg, best.issue, best_similarity, now - best.created_at)
+
+    def sync(self, db):
+        """Index tickets filed since the last sync, by any worker, from the ticket event log.
+        Blocking; run it off the event loop"""
+        if not self.enabled:
+            return
+        # A sync still waiting on a busy database covers this one
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            rows = db.get_tickets_created_since(self._last_event_id, self.clock() - self.window_s)
+            for event_id, created_at, ticket in rows:
+                self.add(ticket.inc, ticket.bldg, ticket.issue, created_at)
+                self._last_event_id = max(self._last_event_id, event_id)
+        finally:
+            self._sync_lock.release()
+        if rows:
+            logger.debug("Indexed %d recent tickets, %d in the window", len(rows), len(self))
+
+def issue_index_from_env() -> IssueIndex:
+    return IssueIndex(
+        window_s=float(os.getenv("DUPLICATE_WINDOW_MINUTES", "120")) * 60,
+        threshold=float(os.getenv("DUPLICATE_SIMILARITY", "0.5")),
+        enabled=os.getenv("DUPLICATE_DETECTION", "on").strip().lower() != "off",
+    )
+
+# Global instance for the default tenant, shared by the calls of one worker process
+issue_index = issue_index_from_env()
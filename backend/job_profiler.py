@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Job Profiler
+On-demand profiling of single agent/transcriber jobs. A job is profiled when its room matches
+PROFILE_ROOMS, when it falls in the PROFILE_SAMPLE_RATE fraction of jobs, or when its process
+gets SIGUSR1 (which toggles profiling while the call runs). Profiles are written to PROFILE_DIR,
+named by session ID, as collapsed stacks (sampling) or pstats files (cProfile). A job that is
+not profiled starts no thread and installs no hooks
+"""
+
+import asyncio
+import cProfile
+import fnmatch
+import logging
+import os
+import random
+import re
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+logger = logging.getLogger("job-profiler")
+
+PROFILE_MODE_SAMPLE = "sample"
+PROFILE_MODE_CPROFILE = "cprofile"
+
+_UNSAFE_FILENAME_RE = re.compile(r"[^A-Za-z0-9._-]+")
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class StackSampler:
+    """Samples one thread's Python stack every interval_s from a background thread and counts
+    identical stacks. Stacks are kept as tuples of code objects and only turned into text when
+    written, so a sample costs a frame walk and a dict update"""
+
+    def __init__(self, thread_id: int, interval_s: float = 0.005, max_depth: int = 128):
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="job-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None or self.thread_id == me:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed format: "root;caller;callee count" per line"""
+        lines = [";".join(_frame_label(code) for code in stack) + f" {count}"
+                 for stack, count in self.stacks.most_common()]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+class JobProfiler:
+    """Profiles the thread that runs the job's event loop; start/stop may be called repeatedly,
+    and every stretch of profiling is added to the same profile"""
+
+    def __init__(self, name: str, mode: str = PROFILE_MODE_SAMPLE, out_dir: str = "profiles",
+                 interval_s: float = 0.005):
+        self.name = name
+        self.mode = mode
+        self.out_dir = out_dir
+        self.interval_s = interval_s
+        self.thread_id = threading.get_ident()
+        self.started_at: Optional[float] = None
+        self.profiled_s = 0.0
+        self._sampler: Optional[StackSampler] = None
+        self._cprofile: Optional[cProfile.Profile] = None
+
+    @property
+    def active(self) -> bool:
+        return self.started_at is not None
+
+    @property
+    def has_data(self) -> bool:
+        return self._sampler is not None or self._cprofile is not None
+
+    def start(self):
+        if self.active:
+            return
+        if self.mode == PROFILE_MODE_CPROFILE:
+            # cProfile only sees the thread that enables it, which is the event loop's
+            self._cprofile = self._cprofile or cProfile.Profile()
+            self._cprofile.enable()
+        else:
+            if self._sampler is None:
+                self._sampler = StackSampler(self.thread_id, self.interval_s)
+            self._sampler.start()
+        self.started_at = time.perf_counter()
+        logger.info(f"Profiling {self.name} ({self.mode})")
+
+    def pause(self):
+        if not self.active:
+            return
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        self.profiled_s += time.perf_counter() - self.started_at
+        self.started_at = None
+
+    def toggle(self):
+        if self.active:
+            self.pause()
+            logger.info(f"Profiling of {self.name} paused, written to {self.write()}")
+        else:
+            self.start()
+
+    def path(self) -> str:
+        extension = "pstats" if self.mode == PROFILE_MODE_CPROFILE else "collapsed"
+        return os.path.join(self.out_dir, f"{_UNSAFE_FILENAME_RE.sub('_', self.name)}.{extension}")
+
+    def write(self) -> Optional[str]:
+        """Write everything profiled so far; returns the file path, or None without data"""
+        if not self.has_data:
+            return None
+        os.makedirs(self.out_dir, exist_ok=True)
+        path = self.path()
+        if self._cprofile is not None:
+            self._cprofile.dump_stats(path)
+        else:
+            with open(path, "w") as f:
+                f.write(self._sampler.collapsed())
+        return path
+
+    def stop(self) -> Optional[str]:
+        self.pause()
+        path = self.write()
+        if path:
+            logger.info(f"Profile of {self.name} ({self.profiled_s:.1f}s profiled) written to {path}")
+        return path
+
+    async def aclose(self):
+        """Job shutdown callback"""
+        self.stop()
+
+def should_profile(room_name: str, rooms: str = "", sample_rate: float = 0.0, rng=random.random) -> bool:
+    """Whether a new job is profiled from the start: its room matches one of the comma-separated
+    names/glob patterns in rooms, or it is picked with probability sample_rate"""
+    for pattern in rooms.split(","):
+        pattern = pattern.strip()
+        if pattern and fnmatch.fnmatchcase(room_name, pattern):
+            return True
+    return sample_rate > 0 and rng() < sample_rate
+
+def profiler_for_job(room_name: str) -> JobProfiler:
+    """Create the job's profiler, started if the environment selects this room, and let
+    SIGUSR1 to the job process toggle it. Call from the job's entrypoint"""
+    profiler = JobProfiler(
+        name=f"{room_name}_{os.getpid()}",
+        mode=os.getenv("PROFILE_MODE", PROFILE_MODE_SAMPLE).strip().lower(),
+        out_dir=os.getenv("PROFILE_DIR", "profiles"),
+        interval_s=float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000,
+    )
+    if should_profile(room_name, os.getenv("PROFILE_ROOMS", ""), float(os.getenv("PROFILE_SAMPLE_RATE", "0"))):
+        profiler.start()
+
+    if hasattr(signal, "SIGUSR1"):
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, profiler.toggle)
+        except (NotImplementedError, RuntimeError, ValueError) as e:
+            # Not the main thread (e.g. jobs run as threads) or no loop; env selection still works
+            logger.debug(f"SIGUSR1 profiling toggle unavailable: {e}")
+    return profiler
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Event Loop Monitor
+Measures how late the job's event loop runs a periodic wake-up (the delay every audio frame
+callback sees too) into a lag histogram, and catches stalls: a watchdog thread grabs the
+loop thread's stack while the loop is still blocked, so the log shows the sync SQLite call,
+print storm or GC pause that caused it. Histograms are written to the heartbeat store per
+worker, where the token server exports them and admission control reads them
+"""
+
+import asyncio
+import gc
+import inspect
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Optional
+from worker_heartbeat import LagHistogram, WorkerHeartbeatStore
+
+logger = logging.getLogger("loop-monitor")
+
+@dataclass
+class StallReport:
+    lag_s: float
+    coroutine: str   # innermost coroutine on the stack when the stall was caught
+    stack: str
+    in_gc: bool      # the garbage collector was running when the stack was taken
+
+def _innermost_coroutine(frame) -> str:
+    while frame is not None:
+        if frame.f_code.co_flags & inspect.CO_COROUTINE:
+            code = frame.f_code
+            return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+        frame = frame.f_back
+    return ""
+
+class LoopLagMonitor:
+    """Runs on the job's event loop from start() until aclose(). Every interval_s the loop
+    should wake up; how late it does is the lag. A wake-up late by stall_threshold_s or more
+    is a stall and is logged with the stack the watchdog caught during it"""
+
+    def __init__(self, interval_s: float = 0.1, stall_threshold_s: float = 0.2,
+                 store: Optional[WorkerHeartbeatStore] = None, worker_id: str = "",
+                 flush_interval_s: float = 10.0, max_stalls: int = 20, stack_limit: int = 30):
+        self.interval_s = interval_s
+        self.stall_threshold_s = stall_threshold_s
+        self.store = store
+        self.worker_id = worker_id
+        self.flush_interval_s = flush_interval_s
+        self.stack_limit = stack_limit
+        self.histogram = LagHistogram()  # since the last flush
+        self.stalls: Deque[StallReport] = deque(maxlen=max_stalls)
+        self.gc_pause_s = 0.0
+
+        self._tick = 0
+        self._wake_at = 0.0
+        self._caught: Optional[tuple] = None  # (tick, coroutine, stack, in_gc) from the watchdog
+        self._gc_started: Optional[float] = None
+        self._thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        """Start monitoring the running loop; call from a coroutine on it"""
+        self._thread_id = threading.get_ident()
+        self._wake_at = time.perf_counter() + self.interval_s
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+        gc.callbacks.append(self._on_gc)
+
+    def _on_gc(self, phase, info):
+        if phase == "start":
+            self._gc_started = time.perf_counter()
+        elif self._gc_started is not None:
+            self.gc_pause_s += time.perf_counter() - self._gc_started
+            self._gc_started = None
+
+    def _watch(self):
+        # Polls a few times per threshold; only reads a timestamp unless the loop is stuck
+        poll_s = max(0.01, self.stall_threshold_s / 4)
+        while not self._stop.wait(poll_s):
+            tick = self._tick
+            if time.perf_counter() - self._wake_at < self.stall_threshold_s:
+                continue
+            if self._caught is not None and self._caught[0] == tick:
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame, limit=self.stack_limit))
+            self._caught = (tick, _innermost_coroutine(frame), stack, self._gc_started is not None)
+            del frame
+
+    async def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            self._wake_at = time.perf_counter() + self.interval_s
+            await asyncio.sleep(self.interval_s)
+            lag_s = max(0.0, time.perf_counter() - self._wake_at)
+            self.histogram.observe(lag_s)
+            if lag_s >= self.stall_threshold_s:
+                self._report_stall(lag_s)
+            self._tick += 1
+
+            if self.store is not None and time.monotonic() - last_flush >= self.flush_interval_s:
+                last_flush = time.monotonic()
+                await asyncio.to_thread(self.flush)
+
+    def _report_stall(self, lag_s: float):
+        caught, self._caught = self._caught, None
+        if caught is not None and caught[0] == self._tick:
+            _, coroutine, stack, in_gc = caught
+        else:
+            # Over before the watchdog looked
+            coroutine, stack, in_gc = "", "", False
+        self.histogram.stalls += 1
+        self.stalls.append(StallReport(lag_s, coroutine, stack, in_gc))
+        logger.warning("Event loop stalled for %.0f ms in %s", lag_s * 1000, coroutine or "unknown code",
+                       extra={"stall_ms": round(lag_s * 1000, 1), "coroutine": coroutine,
+                              "stack": stack, "in_gc": in_gc})
+
+    def take(self) -> LagHistogram:
+        """The histogram since the previous take, starting a new one"""
+        histogram, self.histogram = self.histogram, LagHistogram()
+        return histogram
+
+    def flush(self):
+        """Write the lag since the previous flush to the heartbeat store"""
+        histogram = self.take()
+        if self.store is None or histogram.count == 0:
+            return
+        try:
+            self.store.record_loop_lag(self.worker_id, histogram)
+        except Exception as e:
+            logger.error(f"Error recording event-loop lag: {e}")
+
+    async def aclose(self):
+        """Stop monitoring and flush what is left; also usable as the job's shutdown callback"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._stop.set()
+        self._watchdog.join()
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+        logger.info("Event loop monitor stopped: %d stalls, %.0f ms in garbage collection",
+                    len(self.stalls), self.gc_pause_s * 1000)
+        if self.store is not None:
+            await asyncio.to_thread(self.flush)
+
+def monitor_for_job(store: Optional[WorkerHeartbeatStore], worker_id: str) -> Optional[LoopLagMonitor]:
+    """Start the loop monitor for this job unless LOOP_MONITOR is "off". Lag is reported
+    under worker_id when a store is given. Call from the job's entrypoint"""
+    if os.getenv("LOOP_MONITOR", "on").strip().lower() == "off":
+        return None
+    monitor = LoopLagMonitor(
+        interval_s=float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "100")) / 1000,
+        stall_threshold_s=float(os.getenv("LOOP_STALL_MS", "200")) / 1000,
+        store=store if worker_id else None,
+        worker_id=worker_id,
+    )
+    monitor.start()
+    return monitor
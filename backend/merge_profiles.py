@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Merge Job Profiles
+Combines the per-session profiles written by job_profiler.py across jobs: collapsed stacks are
+summed into one collapsed file (for flamegraph.pl or speedscope), pstats files into one pstats
+file, and the hottest functions are printed
+"""
+
+import argparse
+import glob
+import json
+import pstats
+import sys
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+def read_collapsed(paths: Iterable[str]) -> Counter:
+    stacks: Counter = Counter()
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                stack, _, count = line.rstrip("\n").rpartition(" ")
+                if stack and count.isdigit():
+                    stacks[stack] += int(count)
+    return stacks
+
+def top_functions(stacks: Counter, limit: int) -> List[Tuple[str, int, int]]:
+    """(function, self samples, total samples) for the functions with the most self samples"""
+    self_counts: Dict[str, int] = Counter()
+    total_counts: Dict[str, int] = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        self_counts[frames[-1]] += count
+        for frame in set(frames):
+            total_counts[frame] += count
+    ranked = sorted(self_counts.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return [(frame, self_count, total_counts[frame]) for frame, self_count in ranked]
+
+def expand(patterns: List[str]) -> List[str]:
+    paths = []
+    for pattern in patterns:
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge job profiles (.collapsed or .pstats) across sessions")
+    parser.add_argument("profiles", nargs="+", help="Profile files or glob patterns, e.g. 'profiles/*.collapsed'")
+    parser.add_argument("-o", "--output", help="Write the merged profile here")
+    parser.add_argument("--top", type=int, default=20, help="Functions to list (default: 20)")
+    parser.add_argument("--json", action="store_true", help="Output as JSON")
+    args = parser.parse_args()
+
+    paths = expand(args.profiles)
+    kinds = {"pstats" if path.endswith(".pstats") else "collapsed" for path in paths}
+    if len(kinds) > 1:
+        print("ERROR: Merge either .collapsed or .pstats files, not both")
+        return 1
+
+    if kinds == {"pstats"}:
+        stats = pstats.Stats(*paths)
+        if args.output:
+            stats.dump_stats(args.output)
+        if not args.json:
+            print(f"Merged {len(paths)} pstats files")
+            stats.sort_stats("cumulative").print_stats(args.top)
+            return 0
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:args.top]
+        print(json.dumps([{"function": f"{func[2]} ({func[0]}:{func[1]})", "calls": calls,
+                           "self_s": round(self_s, 6), "cumulative_s": round(cum_s, 6)}
+                          for func, (_, calls, self_s, cum_s, _) in rows], indent=2))
+        return 0
+
+    stacks = read_collapsed(paths)
+    if args.output:
+        with open(args.output, "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    total = sum(stacks.values())
+    top = top_functions(stacks, args.top)
+    if args.json:
+        print(json.dumps({"profiles": len(paths), "samples": total,
+                          "functions": [{"function": frame, "self": self_count, "total": total_count}
+                                        for frame, self_count, total_count in top]}, indent=2))
+        return 0
+
+    print("\n" + "=" * 60)
+    print(f"MERGED PROFILE ({len(paths)} profiles, {total} samples)")
+    print("=" * 60)
+    print(f"{'self %':>7} {'total %':>8}  function")
+    for frame, self_count, total_count in top:
+        print(f"{100 * self_count / max(1, total):>6.1f}% {100 * total_count / max(1, total):>7.1f}%  {frame}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -18,11 +18,17 @@ INSTRUCTIONS = """
     Alpha=A, Bravo=B, Charlie=C, Delta=D, Echo=E, Foxtrot=F, Golf=G, Hotel=H, India=I, Juliet=J, 
     Kilo=K, Lima=L, Mike=M, November=N, Oscar=O, Papa=P, Quebec=Q, Romeo=R, Sierra=S, Tango=T, 
     Uniform=U, Victor=V, Whiskey=W, X-ray=X, Yankee=Y, Zulu=Z
+    If a computer name sounds uncertain, check it with verify_computer_name. If create_ticket reports that the
+    computer name is not in the asset inventory, read the suggested names to the user and confirm the right one.
+    Use lookup_building to confirm the building when the user's answer is unclear or could match several buildings.
+    If create_ticket reports a recent ticket for the same issue in the same building, ask the user if it is the same
+    problem; if so, attach them to it with attach_to_incident and read them that incident number instead.
 
     If the employee mentions their computer is freezing, ask:
     "Have you been able to restart your device?"
     If no, advise them to restart and follow up.
-    If yes, and the issue still persists, escalate the ticket to a Level 2 Technician.
+    If yes, and the issue still persists, escalate the ticket to a Level 2 Technician with escalate_ticket.
+    Record troubleshooting steps the employee already tried, and new details about an existing ticket, with add_ticket_note.
     If the employee needs a password reset, say:
     "I'll reset your password now. Please try using Redwood123 (with a capital "R") in a couple of minutes."
 
@@ -40,3 +46,20 @@ LOOKUP_TICKET_MESSAGE = lambda msg: f"""If the user has provided an INC attempt
                                     If they don't have an INC or the INC does not exist in the database 
                                     create the entry in the database using your tools. If the user doesn't have an inc, ask them for the
                                     details required to create a new ticket. Here is the users message: {msg}"""
+
+# Appended to INSTRUCTIONS when a call reaches its soft token budget
+BUDGET_SOFT_INSTRUCTIONS = """
+    IMPORTANT: Keep every answer to one or two short sentences. Ask only for the details still missing
+    from the ticket and don't repeat information the user already gave.
+"""
+
+# Appended to INSTRUCTIONS when a call reaches its hard token budget
+BUDGET_HARD_INSTRUCTIONS = """
+    IMPORTANT: This call has to end now. If you have the details for a new ticket, call create_ticket with
+    them right away; use what you have for any detail that is still missing. Then read the incident number
+    to the user, tell them a technician will follow up, and say goodbye. Don't start on anything new.
+"""
+
+BUDGET_WRAP_UP_MESSAGE = """Wrap up the call now: file the ticket with create_ticket if it hasn't been created yet,
+give the user the incident number, and say goodbye. If there is nothing to file, apologize that the help desk
+has to end the call and ask the user to call back later."""
@@ -1,80 +1,237 @@
 #!/usr/bin/env python3
 """
-Script to run both the transcriber and agent services for the Service Desk Agent
+Service Supervisor
+Runs the Service Desk backend on one host without a terminal per process: N agent workers,
+N transcriber workers and the token server. Crashed children are restarted with exponential
+backoff, and SIGTERM/Ctrl+C drains the workers' calls before exiting
 """
-import subprocess
-import sys
+import argparse
+import asyncio
 import os
+import signal
+import socket
+import sys
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from dotenv import load_dotenv
 
-def run_service(script_name, service_name):
-    """Run a service script"""
-    script_path = Path(__file__).parent / script_name
-    
-    print(f"Starting {service_name}...")
-    print(f"Command: python {script_path} start")
-    
-    try:
-        # Run the service
-        result = subprocess.run([
-            sys.executable, str(script_path), "start"
-        ], cwd=Path(__file__).parent)
-        
-        return result.returncode
-    except KeyboardInterrupt:
-        print(f"\n{service_name} interrupted by user")
+load_dotenv()
+
+BACKEND_DIR = Path(__file__).parent
+
+# Each LiveKit worker serves its health check on its own port; the supervisor numbers them
+# from these bases (agents 8081, 8082, ...; transcribers 8181, 8182, ...)
+AGENT_HTTP_PORT_BASE = 8081
+TRANSCRIBER_HTTP_PORT_BASE = 8181
+
+REQUIRED_VARS = [
+    "AZURE_OPENAI_API_KEY",
+    "AZURE_OPENAI_ENDPOINT",
+    "AZURE_OPENAI_DEPLOYMENT_NAME",
+    "LIVEKIT_URL",
+    "LIVEKIT_API_KEY",
+    "LIVEKIT_API_SECRET"
+]
+
+@dataclass
+class ServiceSpec:
+    name: str
+    args: List[str]
+    env: Dict[str, str] = field(default_factory=dict)
+    # Stopped first on shutdown, so no new calls arrive while the workers drain
+    front: bool = False
+    # Called after the child exited unexpectedly, before it is restarted
+    on_crash: Optional[Callable[[], None]] = None
+
+def default_worker_counts(cpu_count: Optional[int] = None, worker_mode: str = "split"):
+    """Agent and transcriber worker counts for this host. Every call runs in its own job
+    process, so one worker per two cores keeps all cores busy without oversubscribing"""
+    cpus = cpu_count or os.cpu_count() or 1
+    agents = max(1, cpus // 2)
+    transcribers = max(1, cpus // 4) if worker_mode == "split" else 0
+    return agents, transcribers
+
+def build_specs(agents: int, transcribers: int, token_server: bool = True, mode: str = "start") -> List[ServiceSpec]:
+    hostname = socket.gethostname()
+    specs = []
+    if token_server:
+        specs.append(ServiceSpec("token-server", [sys.executable, "token_server.py"], front=True))
+    for i in range(1, agents + 1):
+        worker_id = f"{hostname}:agent-{i}"
+        specs.append(ServiceSpec(
+            f"agent-{i}",
+            [sys.executable, "agent.py", mode],
+            env={"AGENT_WORKER_ID": worker_id, "WORKER_HTTP_PORT": str(AGENT_HTTP_PORT_BASE + i - 1)},
+            on_crash=_ended_calls_of(worker_id),
+        ))
+    for i in range(1, transcribers + 1):
+        specs.append(ServiceSpec(
+            f"transcriber-{i}",
+            [sys.executable, "transcriber.py", mode],
+            env={"TRANSCRIBER_WORKER_ID": f"{hostname}:transcriber-{i}",
+                 "WORKER_HTTP_PORT": str(TRANSCRIBER_HTTP_PORT_BASE + i - 1)},
+        ))
+    return specs
+
+def _ended_calls_of(worker_id: str):
+    def end_calls():
+        # A crashed worker can't end its calls; the restarted one reuses the id, so its
+        # stale calls would otherwise keep counting against its capacity
+        from worker_heartbeat import heartbeat_store
+        heartbeat_store.remove_worker(worker_id)
+    return end_calls
+
+class Supervisor:
+    def __init__(self, specs: List[ServiceSpec], backoff_initial_s: float = 1.0, backoff_max_s: float = 60.0,
+                 stable_after_s: float = 30.0, drain_timeout_s: float = 1800.0, cwd: Path = BACKEND_DIR):
+        self.specs = specs
+        self.backoff_initial_s = backoff_initial_s
+        self.backoff_max_s = backoff_max_s
+        self.stable_after_s = stable_after_s
+        self.drain_timeout_s = drain_timeout_s
+        self.cwd = cwd
+        self.restarts: Dict[str, int] = {spec.name: 0 for spec in specs}
+        self.exit_codes: Dict[str, Optional[int]] = {}
+        self._processes: Dict[str, asyncio.subprocess.Process] = {}
+        self._stopping: Optional[asyncio.Event] = None
+
+    def log(self, name: str, message: str):
+        print(f"[{time.strftime('%H:%M:%S')}] {name}: {message}", flush=True)
+
+    async def _pipe_output(self, name: str, stream: asyncio.StreamReader):
+        while True:
+            line = await stream.readline()
+            if not line:
+                return
+            print(f"[{name}] {line.decode(errors='replace').rstrip()}", flush=True)
+
+    async def _supervise(self, spec: ServiceSpec):
+        backoff = self.backoff_initial_s
+        while not self._stopping.is_set():
+            started = time.monotonic()
+            process = await asyncio.create_subprocess_exec(
+                *spec.args, cwd=self.cwd, env={**os.environ, **spec.env},
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+            )
+            self._processes[spec.name] = process
+            self.log(spec.name, f"started (pid {process.pid})")
+            if self._stopping.is_set():
+                # Shutdown began while this child was starting
+                process.terminate()
+            await asyncio.gather(self._pipe_output(spec.name, process.stdout), process.wait())
+            self._processes.pop(spec.name, None)
+            self.exit_codes[spec.name] = process.returncode
+
+            if self._stopping.is_set():
+                self.log(spec.name, f"stopped (exit code {process.returncode})")
+                return
+
+            # A child that stayed up for a while starts over from the shortest backoff
+            if time.monotonic() - started >= self.stable_after_s:
+                backoff = self.backoff_initial_s
+            self.restarts[spec.name] += 1
+            self.log(spec.name, f"exited with code {process.returncode}, restarting in {backoff:.1f}s "
+                                f"(restart {self.restarts[spec.name]})")
+            if spec.on_crash is not None:
+                try:
+                    await asyncio.to_thread(spec.on_crash)
+                except Exception as e:
+                    self.log(spec.name, f"crash cleanup failed: {e}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=backoff)
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, self.backoff_max_s)
+
+    async def _terminate(self, names: List[str]):
+        processes = [self._processes[name] for name in names if name in self._processes]
+        for process in processes:
+            if process.returncode is None:
+                process.terminate()
+        if not processes:
+            return
+        # LiveKit workers stop taking jobs on SIGTERM and exit once their calls have ended
+        _, pending = await asyncio.wait([asyncio.ensure_future(p.wait()) for p in processes],
+                                        timeout=self.drain_timeout_s)
+        if pending:
+            for process in processes:
+                if process.returncode is None:
+                    self.log("supervisor", f"pid {process.pid} did not drain in {self.drain_timeout_s:.0f}s, killing")
+                    process.kill()
+            await asyncio.gather(*(p.wait() for p in processes))
+
+    def stop(self):
+        """Begin a graceful shutdown; safe to call from a signal handler via call_soon_threadsafe"""
+        if self._stopping is not None and not self._stopping.is_set():
+            self.log("supervisor", "shutting down, draining workers...")
+            self._stopping.set()
+
+    async def run(self) -> int:
+        self._stopping = asyncio.Event()
+        tasks = [asyncio.create_task(self._supervise(spec)) for spec in self.specs]
+        await self._stopping.wait()
+
+        await self._terminate([spec.name for spec in self.specs if spec.front])
+        await self._terminate([spec.name for spec in self.specs if not spec.front])
+        await asyncio.gather(*tasks)
+        self.log("supervisor", "all services stopped")
         return 0
-    except Exception as e:
-        print(f"Error running {service_name}: {e}")
-        return 1
+
+def _install_signal_handlers(loop: asyncio.AbstractEventLoop, supervisor: Supervisor):
+    # signal.signal rather than loop.add_signal_handler, which Windows doesn't support
+    def handler(signum, frame):
+        loop.call_soon_threadsafe(supervisor.stop)
+
+    signal.signal(signal.SIGINT, handler)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, handler)
 
 def main():
     """Main function to run services"""
+    worker_mode = os.getenv("WORKER_MODE", "split").strip().lower()
+    default_agents, default_transcribers = default_worker_counts(worker_mode=worker_mode)
+
+    parser = argparse.ArgumentParser(description="Run and supervise the Service Desk backend services")
+    parser.add_argument("--agents", type=int, default=int(os.getenv("AGENT_WORKERS", default_agents)),
+                        help="agent workers to run (AGENT_WORKERS, default: one per two cores)")
+    parser.add_argument("--transcribers", type=int,
+                        default=int(os.getenv("TRANSCRIBER_WORKERS", default_transcribers)),
+                        help="transcriber workers to run (TRANSCRIBER_WORKERS, default: one per four cores, "
+                             "none in combined mode)")
+    parser.add_argument("--no-token-server", action="store_true", help="don't run the token server")
+    parser.add_argument("--mode", choices=["start", "dev"], default="start", help="LiveKit worker command")
+    parser.add_argument("--drain-timeout", type=float, default=float(os.getenv("SUPERVISOR_DRAIN_TIMEOUT", "1800")),
+                        help="seconds to wait for calls to end on shutdown before killing workers")
+    args = parser.parse_args()
+
     print("Service Desk Agent - Starting Services")
     print("=" * 50)
-    
-    # Check environment variables
-    required_vars = [
-        "AZURE_OPENAI_API_KEY",
-        "AZURE_OPENAI_ENDPOINT", 
-        "AZURE_OPENAI_DEPLOYMENT_NAME",
-        "LIVEKIT_URL",
-        "LIVEKIT_API_KEY",
-        "LIVEKIT_API_SECRET"
-    ]
-    
-    missing_vars = [var for var in required_vars if not os.getenv(var)]
+
+    missing_vars = [var for var in REQUIRED_VARS if not os.getenv(var)]
     if missing_vars:
         print("ERROR: Missing required environment variables:")
         for var in missing_vars:
             print(f"  - {var}")
         print("\nPlease set these variables in your .env file or environment")
         return 1
-    
+
     print("Environment variables check: ✓")
+    print(f"Agent workers: {args.agents}, transcriber workers: {args.transcribers}, "
+          f"token server: {'no' if args.no_token_server else 'yes'}")
     print()
-    
-    # Ask user which service to run
-    print("Select service to run:")
-    print("1. Transcriber only (Speech-to-Text)")
-    print("2. Agent only (Voice responses + Function tools)")
-    print("3. Both services (Recommended)")
-    
-    choice = input("\nEnter choice (1-3): ").strip()
-    
-    if choice == "1":
-        return run_service("transcriber.py", "Transcriber Service")
-    elif choice == "2":
-        return run_service("agent.py", "Agent Service")
-    elif choice == "3":
-        print("\nTo run both services, you'll need to run them in separate terminals:")
-        print(f"Terminal 1: python {Path(__file__).parent / 'transcriber.py'} start")
-        print(f"Terminal 2: python {Path(__file__).parent / 'agent.py'} start")
-        print("\nFor now, starting the transcriber service...")
-        return run_service("transcriber.py", "Transcriber Service")
-    else:
-        print("Invalid choice. Exiting.")
-        return 1
+
+    specs = build_specs(args.agents, args.transcribers, not args.no_token_server, args.mode)
+    supervisor = Supervisor(specs, drain_timeout_s=args.drain_timeout)
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    _install_signal_handlers(loop, supervisor)
+    try:
+        return loop.run_until_complete(supervisor.run())
+    finally:
+        loop.close()
 
 if __name__ == "__main__":
     sys.exit(main())
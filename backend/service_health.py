@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Service Health
+Readiness checks and Prometheus metrics for the backend: database query latency, SQLite
+WAL sizes, calls per worker, event-loop lag (of this server and of every worker's jobs) and
+tool latency percentiles. Every check is
+cached for a short TTL, so frequent probes don't add load
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from worker_heartbeat import LOOP_LAG_BUCKETS_S, WorkerHeartbeatStore
+
+logger = logging.getLogger("service-health")
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+class CachedCheck:
+    """Runs a blocking check in a thread at most once per ttl_s. Callers arriving while
+    it runs wait for that run instead of starting another"""
+
+    def __init__(self, fn: Callable[[], Any], ttl_s: float = 5.0):
+        self.fn = fn
+        self.ttl_s = ttl_s
+        self._value: Any = None
+        self._expires_at = 0.0
+        self._running: Optional[asyncio.Future] = None
+
+    async def get(self) -> Any:
+        if time.monotonic() < self._expires_at:
+            return self._value
+        if self._running is None:
+            self._running = asyncio.ensure_future(self._run())
+        return await asyncio.shield(self._running)
+
+    async def _run(self) -> Any:
+        try:
+            self._value = await asyncio.to_thread(self.fn)
+            self._expires_at = time.monotonic() + self.ttl_s
+            return self._value
+        finally:
+            self._running = None
+
+def timed_query(fn: Callable[[], Any]) -> Callable[[], Dict[str, Any]]:
+    """Wrap a database call so the check reports whether it worked and how long it took"""
+    def check():
+        started = time.perf_counter()
+        try:
+            fn()
+            return {"ok": True, "latency_s": time.perf_counter() - started}
+        except Exception as e:
+            logger.error(f"Readiness query failed: {e}")
+            return {"ok": False, "latency_s": time.perf_counter() - started, "error": str(e)}
+    return check
+
+def wal_sizes(db_paths: Dict[str, str]) -> Dict[str, int]:
+    """Bytes in each database's write-ahead log; 0 when it has none"""
+    sizes = {}
+    for name, path in db_paths.items():
+        try:
+            sizes[name] = os.path.getsize(path + "-wal")
+        except OSError:
+            sizes[name] = 0
+    return sizes
+
+class LoopLagSampler:
+    """Measures how late a periodic sleep wakes up on this process's event loop"""
+
+    def __init__(self, interval_s: float = 0.5):
+        self.interval_s = interval_s
+        self.last_s = 0.0
+        self.max_s = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval_s)
+            self.last_s = max(0.0, time.perf_counter() - started - self.interval_s)
+            self.max_s = max(self.max_s, self.last_s)
+
+    def take_max(self) -> float:
+        """Worst lag since the previous call"""
+        worst, self.max_s = max(self.max_s, self.last_s), self.last_s
+        return worst
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+class PrometheusText:
+    """Builds the Prometheus text exposition format, one HELP/TYPE block per metric"""
+
+    def __init__(self):
+        self._lines: List[str] = []
+
+    def metric(self, name: str, kind: str, help_text: str, samples: List[Tuple[Dict[str, str], float]],
+               suffixes: Optional[List[Tuple[str, Dict[str, str], float]]] = None):
+        self._lines.append(f"# HELP {name} {help_text}")
+        self._lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            self._lines.append(self._sample(name, labels, value))
+        for suffix, labels, value in suffixes or []:
+            self._lines.append(self._sample(name + suffix, labels, value))
+
+    @staticmethod
+    def _sample(name: str, labels: Dict[str, str], value: float) -> str:
+        if labels:
+            label_text = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+            return f"{name}{{{label_text}}} {_format_value(value)}"
+        return f"{name} {_format_value(value)}"
+
+    def render(self) -> str:
+        return "\n".join(self._lines) + "\n"
+
+class HealthMonitor:
+    def __init__(self, ticket_db, token_db, store: WorkerHeartbeatStore, db_paths: Dict[str, str],
+                 ttl_s: float = 5.0, stale_after_s: float = 15.0, admission=None):
+        self.store = store
+        self.admission = admission
+        self.loop_lag = LoopLagSampler()
+        self._db_checks = {
+            "tickets": CachedCheck(timed_query(ticket_db.ping), ttl_s),
+            "token_usage": CachedCheck(timed_query(token_db.ping), ttl_s),
+        }
+        self._wal = CachedCheck(lambda: wal_sizes(db_paths), ttl_s)
+        self._workers = CachedCheck(lambda: store.worker_loads(stale_after_s), ttl_s)
+        self._tools = CachedCheck(store.tool_latency, ttl_s)
+        self._worker_lag = CachedCheck(store.loop_lag, ttl_s)
+
+    async def start(self):
+        self.loop_lag.start()
+
+    async def aclose(self):
+        await self.loop_lag.aclose()
+
+    async def readiness(self) -> Tuple[bool, Dict[str, Any]]:
+        """Ready when every database answers a query"""
+        names = list(self._db_checks)
+        results = await asyncio.gather(*(self._db_checks[name].get() for name in names))
+        checks = dict(zip(names, results))
+        return all(check["ok"] for check in checks.values()), checks
+
+    async def _optional(self, check: CachedCheck, default):
+        try:
+            return await check.get()
+        except Exception as e:
+            logger.error(f"Metrics check failed: {e}")
+            return default
+
+    async def metrics_text(self) -> str:
+        _, db_checks = await self.readiness()
+        wal, workers, tools, worker_lag = await asyncio.gather(
+            self._optional(self._wal, {}),
+            self._optional(self._workers, []),
+            self._optional(self._tools, {}),
+            self._optional(self._worker_lag, {}),
+        )
+
+        out = PrometheusText()
+        out.metric("servicedesk_db_up", "gauge", "Whether the database answered the readiness query",
+                   [({"db": name}, 1 if check["ok"] else 0) for name, check in db_checks.items()])
+        out.metric("servicedesk_db_query_seconds", "gauge", "Latency of the readiness query",
+                   [({"db": name}, check["latency_s"]) for name, check in db_checks.items()])
+        out.metric("servicedesk_sqlite_wal_bytes", "gauge", "Size of the SQLite write-ahead log",
+                   [({"db": name}, size) for name, size in wal.items()])
+        out.metric("servicedesk_workers_live", "gauge", "Agent workers with a fresh heartbeat",
+                   [({}, len(workers))])
+        out.metric("servicedesk_worker_capacity", "gauge", "Concurrent calls the worker accepts",
+                   [({"worker": load.worker_id}, load.capacity) for load in workers])
+        out.metric("servicedesk_worker_active_calls", "gauge", "Calls in progress on the worker",
+                   [({"worker": load.worker_id}, load.active_calls) for load in workers])
+        out.metric("servicedesk_event_loop_lag_seconds", "gauge",
+                   "Worst event-loop scheduling delay of this server since the last scrape",
+                   [({}, self.loop_lag.take_max())])
+
+        lag_suffixes = []
+        for worker_id, histogram in sorted(worker_lag.items()):
+            cumulative = 0
+            for bound, count in zip(LOOP_LAG_BUCKETS_S + (float("inf"),), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lag_suffixes.append(("_bucket", {"worker": worker_id, "le": le}, cumulative))
+            lag_suffixes.append(("_count", {"worker": worker_id}, cumulative))
+            lag_suffixes.append(("_sum", {"worker": worker_id}, histogram.sum_s))
+        out.metric("servicedesk_worker_loop_lag_seconds", "histogram",
+                   "Event-loop scheduling delay in the worker's jobs over the last 15 minutes", [], lag_suffixes)
+        out.metric("servicedesk_worker_loop_stalls", "gauge",
+                   "Event-loop stalls over the threshold in the worker's jobs over the last 15 minutes",
+                   [({"worker": worker_id}, histogram.stalls) for worker_id, histogram in sorted(worker_lag.items())])
+
+        quantile_samples, suffixes = [], []
+        for tool, stats in tools.items():
+            for key, value in stats.items():
+                if key not in ("count", "sum"):
+                    quantile_samples.append(({"tool": tool, "quantile": key}, value))
+            suffixes.append(("_count", {"tool": tool}, stats["count"]))
+            suffixes.append(("_sum", {"tool": tool}, stats["sum"]))
+        out.metric("servicedesk_tool_latency_seconds", "summary",
+                   "Function tool latency over the last 15 minutes", quantile_samples, suffixes)
+
+        if self.admission is not None:
+            out.metric("servicedesk_admission_queue_length", "gauge", "Callers waiting for a free agent",
+                       [({}, self.admission.queue_length)])
+            out.metric("servicedesk_admission_degraded_workers", "gauge",
+                       "Live workers taking no new calls because their event loops lag",
+                       [({}, self.admission.snapshot.degraded if self.admission.snapshot else 0)])
+            out.metric("servicedesk_admission_free_slots", "gauge", "Call slots free for new callers (-1 while no worker reports capacity)",
+                       [({}, self.admission.free_slots() if self.admission.limited else -1)])
+        return out.render()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Spoken Identifier Normalizer
+Converts spoken computer names / asset tags ("golf delta kilo seven five seven five",
+"golfdeltakilo7575", "G D K double seven 5") into their characters ("GDK7575", "GDK775")
+in a single pass over a precompiled token trie, with results memoized for repeated inputs
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# Phonetic alphabet mapping, including common STT spellings
+PHONETIC_ALPHABET = {
+    'alpha': 'A', 'alfa': 'A', 'bravo': 'B', 'charlie': 'C', 'charley': 'C', 'delta': 'D',
+    'echo': 'E', 'foxtrot': 'F', 'golf': 'G', 'hotel': 'H', 'india': 'I', 'juliet': 'J',
+    'juliett': 'J', 'kilo': 'K', 'lima': 'L', 'mike': 'M', 'november': 'N', 'oscar': 'O',
+    'papa': 'P', 'quebec': 'Q', 'romeo': 'R', 'sierra': 'S', 'tango': 'T', 'uniform': 'U',
+    'victor': 'V', 'whiskey': 'W', 'whisky': 'W', 'xray': 'X', 'x-ray': 'X', 'yankee': 'Y',
+    'zulu': 'Z'
+}
+
+# Spoken digits ("oh" is how callers usually say zero inside a tag, "niner" is ICAO)
+SPOKEN_DIGITS = {
+    'zero': '0', 'oh': '0', 'one': '1', 'two': '2', 'three': '3', 'four': '4', 'five': '5',
+    'six': '6', 'seven': '7', 'eight': '8', 'nine': '9', 'niner': '9'
+}
+
+# Phrases that STT splits into several words
+SPOKEN_PHRASES = {
+    ('x', 'ray'): 'X', ('ex', 'ray'): 'X', ('fox', 'trot'): 'F',
+}
+
+REPEATERS = {'double': 2, 'triple': 3}
+SEPARATOR_WORDS = {'dash': '-', 'hyphen': '-'}
+
+# Token kinds
+_CHAR = 0      # spoken word for one character
+_REPEAT = 1    # double / triple
+_SEPARATOR = 2 # spoken dash
+_DIGITS = 3    # literal digit run
+_LITERAL = 4   # anything unrecognized, kept as an upper-cased word
+
+_TOKEN_RE = re.compile(r"[a-z]+|[0-9]+|[^a-z0-9]+")
+
+def _build_vocabulary() -> Dict[Tuple[str, ...], Tuple[int, object]]:
+    vocabulary = {}
+    for word, letter in PHONETIC_ALPHABET.items():
+        vocabulary[tuple(word.split('-'))] = (_CHAR, letter)
+    for word, digit in SPOKEN_DIGITS.items():
+        vocabulary[(word,)] = (_CHAR, digit)
+    for phrase, letter in SPOKEN_PHRASES.items():
+        vocabulary[phrase] = (_CHAR, letter)
+    for word, count in REPEATERS.items():
+        vocabulary[(word,)] = (_REPEAT, count)
+    for word, separator in SEPARATOR_WORDS.items():
+        vocabulary[(word,)] = (_SEPARATOR, separator)
+    return vocabulary
+
+def _build_token_trie(vocabulary) -> dict:
+    """Trie keyed by word; the None key holds the entry for the phrase ending there"""
+    trie = {}
+    for phrase, entry in vocabulary.items():
+        node = trie
+        for word in phrase:
+            node = node.setdefault(word, {})
+        node[None] = entry
+    return trie
+
+def _build_char_trie(words) -> dict:
+    """Character trie over single words, for splitting runs spoken without separators"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[None] = word
+    return trie
+
+_VOCABULARY = _build_vocabulary()
+_TOKEN_TRIE = _build_token_trie(_VOCABULARY)
+_CHAR_TRIE = _build_char_trie(phrase[0] for phrase in _VOCABULARY if len(phrase) == 1)
+
+def _split_run(run: str) -> Optional[List[str]]:
+    """Split an unseparated run ("golfdeltakilo") into vocabulary words, or None if it can't be"""
+    # best[i] holds the first segmentation found for run[:i]
+    best: List[Optional[List[str]]] = [None] * (len(run) + 1)
+    best[0] = []
+    for start in range(len(run)):
+        if best[start] is None:
+            continue
+        node = _CHAR_TRIE
+        for end in range(start, len(run)):
+            node = node.get(run[end])
+            if node is None:
+                break
+            word = node.get(None)
+            if word is not None and best[end + 1] is None:
+                best[end + 1] = best[start] + [word]
+    return best[len(run)]
+
+def _tokenize(text: str) -> List[Tuple[str, bool]]:
+    """Words and digit runs, each flagged with whether a separator preceded it"""
+    tokens = []
+    separated = False
+    for match in _TOKEN_RE.finditer(text.lower()):
+        token = match.group()
+        if token[0].isalpha():
+            if len(token) > 1 and (token,) not in _VOCABULARY and token not in _TOKEN_TRIE:
+                words = _split_run(token)
+                if words and len(words) > 1:
+                    tokens.append((words[0], separated))
+                    tokens.extend((word, False) for word in words[1:])
+                    separated = False
+                    continue
+            tokens.append((token, separated))
+            separated = False
+        elif token[0].isdigit():
+            tokens.append((token, separated))
+            separated = False
+        else:
+            separated = True
+    return tokens
+
+@lru_cache(maxsize=4096)
+def normalize_spoken_identifier(text: str) -> str:
+    """Convert a spoken computer name / asset tag to its characters"""
+    if not text:
+        return text
+
+    tokens = _tokenize(text)
+    output: List[str] = []
+    repeat = 1
+    previous_kind = None
+    i = 0
+
+    while i < len(tokens):
+        word, separated = tokens[i]
+
+        # Longest phrase match in the token trie starting at this token
+        node = _TOKEN_TRIE
+        entry = None
+        length = 0
+        j = i
+        while j < len(tokens):
+            node = node.get(tokens[j][0])
+            if node is None:
+                break
+            j += 1
+            if None in node:
+                entry, length = node[None], j - i
+
+        if entry is None:
+            length = 1
+            if word[0].isdigit():
+                kind, value = _DIGITS, word
+            elif len(word) == 1:
+                kind, value = _CHAR, word.upper()  # letter spoken as itself
+            else:
+                kind, value = _LITERAL, word.upper()
+        else:
+            kind, value = entry
+
+        if kind == _REPEAT:
+            # "double seven" -> "77"; a trailing "double" has nothing to repeat and is kept as a word
+            if i + length < len(tokens):
+                repeat = value
+                i += length
+                continue
+            kind, value = _LITERAL, word.upper()
+
+        if kind in (_CHAR, _DIGITS, _LITERAL) and repeat > 1:
+            value = value[0] * repeat + value[1:]
+            repeat = 1
+
+        # Separators are dropped except between two unrecognized words ("Regular-Computer-Name")
+        if kind == _LITERAL and previous_kind == _LITERAL and separated:
+            output.append('-')
+
+        output.append(value)
+        previous_kind = kind
+        i += length
+
+    return ''.join(output)
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Structured Logging
+One logging setup for the backend services. Records are put on a bounded in-memory queue and
+written by a background thread, so a slow stdout or log collector never blocks the event loop
+that handles call audio. Output is one JSON object per line, tagged with the room and session ID
+of the call that logged it. Levels are set globally (LOG_LEVEL) and per logger (LOG_LEVELS), and
+hot debug paths can be rate limited with RateLimitedLog
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+LOG_FORMAT_JSON = "json"
+LOG_FORMAT_TEXT = "text"
+
+# Records queued for the writer thread; beyond this the record is dropped rather than waiting
+LOG_QUEUE_SIZE = 10000
+
+_session_id: contextvars.ContextVar = contextvars.ContextVar("log_session_id", default=None)
+_room: contextvars.ContextVar = contextvars.ContextVar("log_room", default=None)
+
+# Attributes every LogRecord has; anything else was passed with extra= and is emitted as a field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+def bind_session(session_id: Optional[str] = None, room: Optional[str] = None):
+    """Tag the records logged from the current task (and the tasks it creates afterwards)
+    with the call's session ID and/or room"""
+    if session_id is not None:
+        _session_id.set(session_id)
+    if room is not None:
+        _room.set(room)
+
+class SessionContextFilter(logging.Filter):
+    """Copies the bound session ID and room onto the record while still on the logging thread"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "session_id"):
+            record.session_id = _session_id.get()
+        if not hasattr(record, "room"):
+            record.room = _room.get()
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, msg, session_id/room when bound, any extra=
+    fields, and exc for exceptions"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development, with the session ID when bound"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        session_id = getattr(record, "session_id", None)
+        return f"{line} [{session_id}]" if session_id else line
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread without waiting: the message is merged with its args
+    here (so later changes to the args can't alter it) and formatting happens on the writer
+    thread. When the queue is full the record is dropped and counted"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class QueueWriter(logging.handlers.QueueListener):
+    """The background writer thread. Stopping waits for room in a full queue instead of failing,
+    so everything queued before shutdown is written"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+class RateLimitedLog:
+    """Logs at most one record per key every interval_s; the next record logged for a key
+    reports how many were suppressed. Disabled levels cost one isEnabledFor check"""
+
+    def __init__(self, logger: logging.Logger, interval_s: float = 5.0, clock=time.monotonic):
+        self.logger = logger
+        self.interval_s = interval_s
+        self.clock = clock
+        self._last: Dict[str, float] = {}
+        self._suppressed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def log(self, level: int, key: str, msg: str, *args, **kwargs):
+        if not self.logger.isEnabledFor(level):
+            return
+        now = self.clock()
+        with self._lock:
+            last = self._last.get(key)
+            if last is not None and now - last < self.interval_s:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return
+            self._last[key] = now
+            suppressed = self._suppressed.pop(key, 0)
+        if suppressed:
+            msg = f"{msg} ({suppressed} similar suppressed)"
+        self.logger.log(level, msg, *args, **kwargs)
+
+    def debug(self, key: str, msg: str, *args, **kwargs):
+        self.log(logging.DEBUG, key, msg, *args, **kwargs)
+
+    def info(self, key: str, msg: str, *args, **kwargs):
+        self.log(logging.INFO, key, msg, *args, **kwargs)
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    """Per-logger levels from "name=LEVEL,name=LEVEL", e.g. "ticket-db=DEBUG,livekit=WARNING" """
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        name, level = name.strip(), level.strip().upper()
+        if name and level:
+            value = int(level) if level.isdigit() else logging.getLevelName(level)
+            if not isinstance(value, int):
+                raise ValueError(f"Unknown log level {level!r} for logger {name!r}")
+            levels[name] = value
+    return levels
+
+_config_lock = threading.Lock()
+_listener: Optional[QueueWriter] = None
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+_session_filter = SessionContextFilter()
+_tagged_handlers: List[logging.Handler] = []
+
+def configure_logging(level: Optional[str] = None, levels: Optional[str] = None,
+                      fmt: Optional[str] = None, stream=None) -> Optional[NonBlockingQueueHandler]:
+    """Route all logging in this process through the queue and the writer thread. If the root
+    logger already has handlers, they are kept and only tagged with the call's session: in a
+    LiveKit job process that is the handler forwarding records to the worker, which writes them
+    out, and a writer here would print every record twice. Calling it again only re-applies the
+    levels. Arguments default to LOG_LEVEL, LOG_LEVELS and LOG_FORMAT; returns the queue handler
+    when one was installed"""
+    global _listener, _queue_handler
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).strip().upper()
+    levels = parse_levels(levels if levels is not None else os.getenv("LOG_LEVELS", ""))
+    root = logging.getLogger()
+
+    with _config_lock:
+        if _queue_handler is None and not _tagged_handlers and root.handlers:
+            for handler in root.handlers:
+                handler.addFilter(_session_filter)
+            _tagged_handlers.extend(root.handlers)
+        elif _queue_handler is None and not _tagged_handlers:
+            fmt = (fmt or os.getenv("LOG_FORMAT", LOG_FORMAT_JSON)).strip().lower()
+            output = logging.StreamHandler(stream or sys.stdout)
+            output.setFormatter(TextFormatter() if fmt == LOG_FORMAT_TEXT else JsonFormatter())
+
+            _queue_handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+            _queue_handler.addFilter(_session_filter)
+            root.addHandler(_queue_handler)
+
+            _listener = QueueWriter(_queue_handler.queue, output)
+            _listener.start()
+            atexit.register(shutdown_logging)
+
+        root.setLevel(level)
+        for name, logger_level in levels.items():
+            logging.getLogger(name).setLevel(logger_level)
+    return _queue_handler
+
+def shutdown_logging():
+    """Write out the queued records and stop the writer thread"""
+    global _listener, _queue_handler
+    with _config_lock:
+        for handler in _tagged_handlers:
+            handler.removeFilter(_session_filter)
+        _tagged_handlers.clear()
+        if _listener is not None:
+            _listener.stop()
+            logging.getLogger().removeHandler(_queue_handler)
+            _listener = None
+            _queue_handler = None
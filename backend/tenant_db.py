@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Tenant Databases
+Keeps each business unit's tickets in its own database file. A call is routed to its tenant
+from the room metadata or the caller's token attributes, both set by the token server. Open
+tenants (a database connection, a ticket journal and a duplicate index each) are kept in a
+bounded LRU: tenants without active calls are closed once idle or when the limit is reached,
+so hundreds of tenants cost file handles and memory only while they take calls
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional
+from db_ticket import DatabaseTicket
+from issue_index import IssueIndex, issue_index_from_env
+from ticket_journal import TicketJournal
+
+logger = logging.getLogger("tenant-db")
+
+# The default tenant ("") is the single-tenant auto_db.sqlite
+DEFAULT_TENANT = ""
+
+# Tenant IDs become file names
+_TENANT_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+def normalize_tenant(tenant: Optional[str]) -> str:
+    """Lower-cased tenant ID; ValueError when it can't be used as a file name"""
+    tenant = (tenant or "").strip().lower()
+    if tenant and not _TENANT_RE.match(tenant):
+        raise ValueError(f"Invalid tenant: {tenant!r}")
+    return tenant
+
+def parse_tenants(spec: Optional[str]) -> Optional[List[str]]:
+    """The allowed tenants from a comma-separated list; None (any tenant) when empty"""
+    tenants = [normalize_tenant(part) for part in (spec or "").split(",") if part.strip()]
+    return tenants or None
+
+def tenant_for_call(room_metadata: Optional[str], participant_attributes: Optional[Dict[str, str]]) -> str:
+    """The call's tenant: "tenant" in the room's JSON metadata, else the caller's token attribute"""
+    if room_metadata:
+        try:
+            metadata = json.loads(room_metadata)
+        except ValueError:
+            metadata = None
+        if isinstance(metadata, dict) and metadata.get("tenant"):
+            return normalize_tenant(str(metadata["tenant"]))
+    return normalize_tenant((participant_attributes or {}).get("tenant"))
+
+class Tenant:
+    """One tenant's ticket database, journal and duplicate index, shared by its calls in this process"""
+
+    def __init__(self, tenant_id: str, db: DatabaseTicket, journal: Optional[TicketJournal],
+                 issue_index: IssueIndex):
+        self.tenant_id = tenant_id
+        self.db = db
+        self.journal = journal
+        self.issue_index = issue_index
+        self.refs = 0
+        self.last_used = 0.0
+
+    def close(self):
+        """Stop the journal, replay what it holds, and close the database connection"""
+        if self.journal is not None:
+            self.journal.close()
+            try:
+                self.journal.replay()
+            except Exception as e:
+                # Left in the journal; replayed when the tenant is opened again
+                logger.warning(f"Could not replay tenant {self.tenant_id}'s journal on close: {e}")
+        self.db.close()
+
+class TenantDatabases:
+    """Tenants by ID. acquire() a tenant for each call and release() it when the call ends; at
+    most max_open tenants without calls stay open, each for up to idle_s seconds"""
+
+    def __init__(self, base_dir: str = "tenants", max_open: int = 16, idle_s: float = 300.0,
+                 allowed: Optional[Iterable[str]] = None, journal: bool = True,
+                 default: Optional[Callable[[], Tenant]] = None, clock=time.monotonic):
+        self.base_dir = base_dir
+        self.max_open = max_open
+        self.idle_s = idle_s
+        self.allowed = set(allowed) if allowed is not None else None
+        self.journal = journal
+        self.clock = clock
+        self._default_factory = default
+        self._default: Optional[Tenant] = None
+        self._open: "OrderedDict[str, Tenant]" = OrderedDict()  # least recently used first
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.closed = 0
+
+    def __len__(self):
+        return len(self._open)
+
+    def paths(self, tenant_id: str) -> Dict[str, str]:
+        return {
+            "tickets": os.path.join(self.base_dir, f"{tenant_id}.sqlite"),
+            "journal": os.path.join(self.base_dir, f"{tenant_id}.journal.log"),
+        }
+
+    def _new_tenant(self, tenant_id: str) -> Tenant:
+        paths = self.paths(tenant_id)
+        os.makedirs(self.base_dir, exist_ok=True)
+        db = DatabaseTicket(paths["tickets"], keep_open=True)
+        journal = TicketJournal(paths["journal"], db) if self.journal else None
+        return Tenant(tenant_id, db, journal, issue_index_from_env())
+
+    def acquire(self, tenant_id: str) -> Tenant:
+        """The tenant's handle, opened if needed. Blocking on first open (schema check and journal
+        replay); run it off the event loop"""
+        tenant_id = normalize_tenant(tenant_id)
+        if tenant_id == DEFAULT_TENANT and self._default_factory is not None:
+            with self._lock:
+                if self._default is None:
+                    self._default = self._default_factory()
+                self._default.refs += 1
+                return self._default
+        if self.allowed is not None and tenant_id not in self.allowed:
+            raise ValueError(f"Unknown tenant: {tenant_id!r}")
+
+        with self._lock:
+            tenant = self._open.get(tenant_id)
+            if tenant is not None:
+                self._open.move_to_end(tenant_id)
+                tenant.refs += 1
+                tenant.last_used = self.clock()
+                evicted = self._evict()
+                new = False
+            else:
+                tenant = self._new_tenant(tenant_id)
+                tenant.refs = 1
+                tenant.last_used = self.clock()
+                self._open[tenant_id] = tenant
+                self.opened += 1
+                evicted = self._evict()
+                new = True
+        self._close(evicted)
+
+        if new:
+            # Schema check and startup replay, outside the registry lock
+            try:
+                tenant.db.ensure_initialized()
+                if tenant.journal is not None:
+                    tenant.journal.start()
+            except Exception:
+                # Dropped, not left open with a reference nobody will release
+                with self._lock:
+                    if self._open.get(tenant_id) is tenant:
+                        del self._open[tenant_id]
+                self._close([tenant])
+                raise
+            logger.info("Opened tenant %s (%d open)", tenant_id, len(self._open))
+        return tenant
+
+    def release(self, tenant: Tenant):
+        with self._lock:
+            tenant.refs = max(0, tenant.refs - 1)
+            tenant.last_used = self.clock()
+            evicted = self._evict()
+        self._close(evicted)
+
+    def sweep(self):
+        """Close tenants idle for idle_s; acquire() and release() also do this"""
+        with self._lock:
+            evicted = self._evict()
+        self._close(evicted)
+
+    def _evict(self) -> List[Tenant]:
+        """Take out idle tenants past idle_s, then the least recently used idle tenants over
+        max_open. Tenants with calls are never closed. Called with the lock held"""
+        now = self.clock()
+        evicted = []
+        idle = [tenant for tenant in self._open.values() if tenant.refs == 0]
+        excess = len(self._open) - self.max_open
+        for tenant in idle:
+            if excess > 0 or now - tenant.last_used >= self.idle_s:
+                del self._open[tenant.tenant_id]
+                evicted.append(tenant)
+                excess -= 1
+        return evicted
+
+    def _close(self, tenants: List[Tenant]):
+        for tenant in tenants:
+            try:
+                tenant.close()
+            except Exception as e:
+                logger.error(f"Error closing tenant {tenant.tenant_id}: {e}")
+            self.closed += 1
+            logger.info("Closed idle tenant %s", tenant.tenant_id)
+
+    def close_all(self):
+        with self._lock:
+            tenants = [tenant for tenant in self._open.values()]
+            self._open.clear()
+        self._close(tenants)
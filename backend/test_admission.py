@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test script for worker heartbeats and admission control at the token server
+"""
+import asyncio
+import os
+import tempfile
+import time
+from aiohttp.test_utils import TestClient, TestServer
+from livekit import api
+from admission import AdmissionController
+from token_server import TokenServer, TokenSigner
+from worker_heartbeat import WorkerHeartbeatStore
+
+API_KEY = "test-key"
+API_SECRET = "test-secret-" + "x" * 32
+
+def make_store(tmp_dir):
+    return WorkerHeartbeatStore(os.path.join(tmp_dir, "heartbeats.sqlite"))
+
+def test_snapshot_counts_live_workers_only():
+    """Calls of a worker whose heartbeat went stale don't use up capacity"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = make_store(tmp_dir)
+        store.beat("host:1", 2)
+        store.beat("host:2", 3)
+        store.call_started("host:1", "room-a")
+        store.call_started("host:2", "room-b")
+        store.call_started("host:2", "room-c")
+        store.call_ended("room-c")
+
+        snapshot = store.snapshot()
+        print(f"Snapshot: {snapshot}")
+        assert (snapshot.workers, snapshot.capacity, snapshot.active_calls) == (2, 5, 2)
+        assert snapshot.rooms == {"room-a", "room-b"}
+        assert snapshot.avg_call_s is not None and snapshot.free == 3
+
+        # Worker 2 stops beating: its capacity and calls drop out
+        snapshot = store.snapshot(stale_after_s=-1)
+        assert snapshot.workers == 0 and snapshot.active_calls == 0
+
+        store.remove_worker("host:1")
+        snapshot = store.snapshot()
+        assert (snapshot.workers, snapshot.capacity, snapshot.rooms) == (1, 3, frozenset({"room-b"}))
+
+def test_admission_without_heartbeats_admits_everyone():
+    """With no worker reporting, every caller gets a token as before"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            controller = AdmissionController(make_store(tmp_dir))
+            await controller.refresh()
+            return [controller.try_admit(f"room-{i}") for i in range(10)]
+
+    assert all(asyncio.run(run()))
+
+def test_queue_until_slot_frees():
+    """At capacity callers are queued in order and get their token once a call ends"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = make_store(tmp_dir)
+            store.beat("host:1", 1)
+            controller = AdmissionController(store, refresh_interval_s=0.05, default_call_s=120)
+            server = TokenServer(TokenSigner(API_KEY, API_SECRET), admission=controller)
+            async with TestClient(TestServer(server.create_app())) as client:
+                response = await client.get("/getToken", params={"name": "Jane"})
+                assert response.status == 200
+                first = api.TokenVerifier(API_KEY, API_SECRET).verify(await response.text())
+
+                # The slot is reserved for Jane's call before it reaches the worker
+                response = await client.get("/getToken", params={"name": "Sam"})
+                assert response.status == 202
+                sam = await response.json()
+                response = await client.get("/getToken", params={"name": "Alex"})
+                alex = await response.json()
+                assert (sam["position"], alex["position"]) == (1, 2)
+                assert sam["estimated_wait_s"] == 120 and alex["estimated_wait_s"] == 240
+
+                # Jane's call starts on the worker and then ends, which frees the slot
+                store.call_started("host:1", first.video.room)
+                await asyncio.sleep(0.1)
+                polled = await (await client.get(f"/queue/{sam['ticket']}")).json()
+                assert polled["status"] == "queued" and polled["position"] == 1
+                store.call_ended(first.video.room)
+
+                started = time.perf_counter()
+                admitted = await (await client.get(f"/queue/{sam['ticket']}", params={"wait": "5"})).json()
+                waited = time.perf_counter() - started
+                assert admitted["status"] == "admitted"
+                claims = api.TokenVerifier(API_KEY, API_SECRET).verify(admitted["token"])
+                assert claims.identity == "Sam" and claims.video.room == admitted["room"]
+
+                # Alex moved up; leaving the queue forgets the ticket
+                polled = await (await client.get(f"/queue/{alex['ticket']}")).json()
+                assert polled["position"] == 1
+                await client.delete(f"/queue/{alex['ticket']}")
+                response = await client.get(f"/queue/{alex['ticket']}")
+                assert response.status == 404
+                return waited
+
+    waited = asyncio.run(run())
+    print(f"Admitted from the queue {waited * 1000:.0f} ms after the slot freed")
+    assert waited < 1.0
+
+def test_queue_full():
+    """Past the queue limit callers are told to come back later"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = make_store(tmp_dir)
+            store.beat("host:1", 0)
+            controller = AdmissionController(store, max_queue=1)
+            server = TokenServer(TokenSigner(API_KEY, API_SECRET), admission=controller)
+            async with TestClient(TestServer(server.create_app())) as client:
+                queued = await client.get("/getToken", params={"name": "Jane"})
+                rejected = await client.get("/getToken", params={"name": "Sam"})
+                return queued.status, rejected.status, rejected.headers.get("Retry-After")
+
+    assert asyncio.run(run()) == (202, 503, "60")
+
+if __name__ == "__main__":
+    test_snapshot_counts_live_workers_only()
+    test_admission_without_heartbeats_admits_everyone()
+    test_queue_until_slot_frees()
+    test_queue_full()
+    print("🎉 All admission control tests passed!")
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test script for the asset inventory index and fuzzy computer-name resolution
+"""
+import csv
+import os
+import tempfile
+from asset_inventory import Asset, AssetInventory, edit_distance
+
+TAGS = ["GDK7575", "GDK7757", "HQL1024", "HQL1042", "WKS-00981", "LAB-PC-12"]
+
+def write_inventory(path, tags):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Hostname", "Building", "Owner"])
+        for tag in tags:
+            writer.writerow([tag, "HQ", "it"])
+
+def test_edit_distance():
+    """Levenshtein distance with early exit"""
+    assert edit_distance("GDK7575", "GDK7575") == 0
+    assert edit_distance("GDK7575", "GDK7675") == 1
+    assert edit_distance("GDK7575", "GDK775") == 1
+    assert edit_distance("GDK7575", "HQL1024", max_distance=2) == 3
+
+def test_exact_and_closest():
+    """Exact lookups ignore case/separators; misheard names resolve to the nearest tags"""
+    inventory = AssetInventory()
+    inventory.load_assets(Asset(tag) for tag in TAGS)
+
+    assert inventory.get("gdk7575").tag == "GDK7575"
+    assert inventory.get("WKS00981").tag == "WKS-00981"
+    assert inventory.get("GDK7576") is None
+
+    matches = inventory.find_closest("GDK7576")
+    print(f"GDK7576 -> {[(m.tag, m.distance) for m in matches]}")
+    assert matches[0].tag == "GDK7575" and matches[0].distance == 1
+
+    assert inventory.find_closest("HQL124")[0].tag in ("HQL1024", "HQL1042")
+    assert inventory.find_closest("LABPC21")[0].tag == "LAB-PC-12"
+    assert inventory.find_closest("ZZZ0000") == []
+
+def test_csv_incremental_reload():
+    """Changes to the CSV are applied to the index: added, removed and updated rows"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "assets.csv")
+        write_inventory(path, TAGS)
+        inventory = AssetInventory(path, check_interval=0)
+
+        assert inventory.get("HQL1024").attributes["Building"] == "HQ"
+        assert len(inventory) == len(TAGS)
+
+        write_inventory(path, [tag for tag in TAGS if tag != "HQL1024"] + ["NEW-0001"])
+        os.utime(path, ns=(1, 1))  # make sure the signature changes even within one mtime tick
+        assert inventory.get("HQL1024") is None
+        assert inventory.get("NEW0001").tag == "NEW-0001"
+        assert inventory.find_closest("HQL1024")[0].tag == "HQL1042"
+        assert len(inventory) == len(TAGS)
+
+def test_compaction_keeps_results():
+    """Removing many assets compacts the index without changing query results"""
+    inventory = AssetInventory()
+    inventory.load_assets(Asset(f"PC{n:05d}") for n in range(200))
+    for n in range(100):
+        inventory.remove_tag(f"PC{n:05d}")
+    inventory._compact()
+
+    assert len(inventory) == 100
+    assert inventory.get("PC00050") is None
+    assert inventory.find_closest("PC00150")[0].tag == "PC00150"
+    assert inventory.find_closest("PC0150")[0].tag == "PC00150"
+
+if __name__ == "__main__":
+    test_edit_distance()
+    test_exact_and_closest()
+    test_csv_incremental_reload()
+    test_compaction_keeps_results()
+    print("🎉 All asset inventory tests passed!")
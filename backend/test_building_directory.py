@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test script for the building directory lookups
+"""
+import asyncio
+import os
+import tempfile
+from building_directory import Building, BuildingDirectory, normalize_building
+
+BUILDINGS = [
+    Building("HQ", "Headquarters", ["main building", "head office"]),
+    Building("HQA", "Headquarters Annex", ["annex"]),
+    Building("B12", "Building 12", ["engineering"]),
+    Building("NT", "North Tower", ["north"]),
+]
+
+def make_directory():
+    directory = BuildingDirectory()
+    directory.load_buildings(BUILDINGS)
+    return directory
+
+def test_normalize_spoken_names():
+    """Fillers are dropped and spoken numbers become digits"""
+    assert normalize_building("The North Tower") == "northtower"
+    assert normalize_building("building twelve") == "12"
+    assert normalize_building("Bldg. 1-2") == "12"
+    assert normalize_building("twenty one") == "21"
+    assert normalize_building("one four") == "14"
+
+def test_exact_alias_prefix_fuzzy():
+    """Each match method resolves to the canonical code"""
+    directory = make_directory()
+    cases = {
+        "hq": ("HQ", "exact"),
+        "the head office": ("HQ", "exact"),
+        "building twelve": ("B12", "exact"),
+        "engineer": ("B12", "prefix"),
+        "north tow": ("NT", "prefix"),
+        "headquaters": ("HQ", "fuzzy"),
+        "the anex": ("HQA", "fuzzy"),
+    }
+    for text, (code, method) in cases.items():
+        match = directory.resolve(text)
+        print(f"{text!r} -> {match}")
+        assert match is not None and (match.code, match.method) == (code, method), text
+
+def test_ambiguous_and_unknown():
+    """Ambiguous names return candidates instead of guessing; unknown names return nothing"""
+    directory = make_directory()
+    match, candidates = directory.lookup("headquarters a")
+    assert match.code == "HQA"
+
+    match, candidates = directory.lookup("head")
+    assert match is None
+    assert [c.code for c in candidates] == ["HQ", "HQA"]
+
+    assert directory.lookup("parking garage") == (None, [])
+
+def test_numbers_match_exactly():
+    """Building numbers are never corrected or completed: building 2 is not building 12"""
+    directory = make_directory()
+    for text in ("building 2", "building one", "13", "b1"):
+        match, candidates = directory.lookup(text)
+        assert match is None and all(c.method != "fuzzy" for c in candidates), text
+    assert directory.resolve("hr") is None
+
+def test_create_ticket_confirms_fuzzy_buildings():
+    """create_ticket stores exact and prefix matches as the building code, but asks the user to
+    confirm a spelling correction; a name repeated after that is kept as given"""
+    import api
+    from db_ticket import DatabaseTicket
+    from issue_index import IssueIndex
+    from tenant_db import Tenant
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tenant = Tenant("", DatabaseTicket(os.path.join(tmp, "tickets.sqlite")), None, IssueIndex(enabled=False))
+        saved = api.building_directory
+        api.building_directory = make_directory()
+        try:
+            async def run():
+                fnc = api.AssistantFnc("Jane Doe", tenant)
+                exact = await fnc.create_ticket("Jane", "Doe", "GDK7575", "building twelve", "Printer jam")
+                exact_bldg = fnc._ticket.bldg
+                offered = await fnc.create_ticket("Jane", "Doe", "GDK7575", "headquaters", "VPN drops")
+                kept = await fnc.create_ticket("Jane", "Doe", "GDK7575", "headquaters", "VPN drops")
+                return exact, exact_bldg, offered, kept, fnc._ticket.bldg
+
+            exact, exact_bldg, offered, kept, kept_bldg = asyncio.run(run())
+        finally:
+            api.building_directory = saved
+        assert exact.startswith("Ticket created successfully") and exact_bldg == "B12"
+        assert offered.startswith("The ticket was not created yet") and "Headquarters" in offered
+        assert kept.startswith("Ticket created successfully") and kept_bldg == "headquaters"
+
+def test_file_reload():
+    """The directory file is re-read when it changes"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "buildings.csv")
+        with open(path, "w") as f:
+            f.write("code,name,aliases\nNT,North Tower,north\n")
+        directory = BuildingDirectory(path, check_interval=0)
+        assert directory.resolve("north").code == "NT"
+        assert directory.resolve("south") is None
+
+        with open(path, "w") as f:
+            f.write("Code,Name,Aliases\nNT,North Tower,north\nST,South Tower,south;the south one\n")
+        os.utime(path, ns=(1, 1))
+        assert directory.resolve("the south one").code == "ST"
+        assert len(directory) == 2
+
+if __name__ == "__main__":
+    test_normalize_spoken_names()
+    test_exact_alias_prefix_fuzzy()
+    test_ambiguous_and_unknown()
+    test_numbers_match_exactly()
+    test_create_ticket_confirms_fuzzy_buildings()
+    test_file_reload()
+    print("🎉 All building directory tests passed!")
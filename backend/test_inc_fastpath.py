@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test script for the spoken incident number fast path
+"""
+import asyncio
+from livekit.agents import llm
+from inc_fastpath import IncidentFastPath, parse_incident_number
+
+def test_parse_spoken_incident_numbers():
+    """Spoken digits, "oh", "zero" and "double" are parsed after an INC/incident/ticket anchor"""
+    cases = {
+        "my incident is I N C one nine zero two four four": "INC190244",
+        "INC190244": "INC190244",
+        "i.n.c. 1 9 0 2 4 4": "INC190244",
+        "ticket number is one nine oh two double four": "INC190244",
+        "Incident number, one, nine, zero, two, four, four.": "INC190244",
+        "I need help with ticket INC 190244 please": "INC190244",
+        "incident one two three": None,                          # too short
+        "inc one nine zero two four four five": None,            # too long
+        "my computer GDK7575 in building five is frozen": None,  # no anchor
+        "": None,
+    }
+    for text, expected in cases.items():
+        result = parse_incident_number(text)
+        print(f"{text!r} -> {result}")
+        assert result == expected, text
+
+class FakeAssistantFnc:
+    def __init__(self, tickets):
+        self.tickets = tickets
+        self.current = None
+        self.lookups = []
+
+    async def prefetch_ticket(self, inc):
+        self.lookups.append(inc)
+        self.current = self.tickets.get(inc)
+        return self.current
+
+    def get_ticket_str(self):
+        return f"inc: {self.current}\n"
+
+class FakeAgent:
+    def __init__(self):
+        self.chat_ctx = llm.ChatContext.empty()
+
+    async def update_chat_ctx(self, chat_ctx):
+        self.chat_ctx = chat_ctx
+
+def test_fast_path_injects_lookup():
+    """A transcript with an INC triggers one lookup and a context note, found or not"""
+    async def run():
+        assistant_fnc = FakeAssistantFnc({"INC190244": "INC190244"})
+        agent = FakeAgent()
+        fast_path = IncidentFastPath(assistant_fnc, agent)
+
+        fast_path.on_transcript("my incident is I N C one nine zero two four four")
+        fast_path.on_transcript("yes, I N C one nine zero two four four")  # repeated, not looked up again
+        fast_path.on_transcript("my screen is black")
+        fast_path.on_transcript("or maybe ticket one two three four five six")
+        await asyncio.sleep(0)
+        await asyncio.gather(*fast_path._tasks)
+        await fast_path.aclose()
+        return assistant_fnc, agent
+
+    assistant_fnc, agent = asyncio.run(run())
+    notes = [item.text_content for item in agent.chat_ctx.items]
+    print(f"Notes: {notes}")
+    assert assistant_fnc.lookups == ["INC190244", "INC123456"]
+    assert "INC190244 has already been looked up" in notes[0]
+    assert "INC123456" in notes[1] and "does not exist" in notes[1]
+
+if __name__ == "__main__":
+    test_parse_spoken_incident_numbers()
+    test_fast_path_injects_lookup()
+    print("🎉 All incident fast path tests passed!")
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Test script for near-duplicate issue detection during outages
+"""
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import api
+from db_ticket import DatabaseTicket
+from issue_index import IssueIndex, shingles
+from tenant_db import Tenant
+from ticket_journal import TicketJournal
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+def test_shingles():
+    assert shingles("The Wi-Fi isn't working!") == shingles("wi fi working")
+    assert shingles("is it the") == set()
+    assert shingles("VPN") == {"vpn"}
+
+def test_near_duplicates_by_building():
+    """Rewordings of one issue match within a building; other issues and buildings don't"""
+    index = IssueIndex(clock=FakeClock())
+    index.add("INC100001", "HQ", "The wifi is down on the third floor")
+    index.add("INC100002", "HQ", "Outlook crashes when opening attachments")
+    index.add("INC100003", "North Tower", "The wifi is down on the third floor")
+
+    match = index.find("hq", "no wifi on the third floor")
+    assert match is not None and match.inc == "INC100001" and match.similarity >= 0.5
+    assert index.find("HQ", "outlook keeps crashing when I open attachments").inc == "INC100002"
+    assert index.find("HQ", "my monitor is flickering") is None
+    assert index.find("north tower", "wifi is down third floor").inc == "INC100003"
+    assert index.find("Annex", "The wifi is down on the third floor") is None
+    assert index.find("", "The wifi is down on the third floor") is None
+
+def test_time_window():
+    """Tickets leave the index once they are older than the window; ties go to the newest ticket"""
+    clock = FakeClock()
+    index = IssueIndex(window_s=3600, clock=clock)
+    index.add("INC100001", "HQ", "Printer on the second floor is jammed")
+    clock.now += 1800
+    index.add("INC100002", "HQ", "Printer on the second floor is jammed")
+    assert index.find("HQ", "printer second floor jammed").inc == "INC100002"
+    assert len(index) == 2
+
+    clock.now += 4000
+    assert index.find("HQ", "printer second floor jammed") is None
+    assert len(index) == 0
+    index.add("INC100003", "HQ", "Printer on the second floor is jammed", created_at=clock.now - 4000)
+    assert len(index) == 0
+
+def test_sync_from_other_workers():
+    """Tickets filed by other worker processes are picked up from the ticket event log"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "tickets.sqlite")
+        other_worker = DatabaseTicket(path)
+        db = DatabaseTicket(path)
+        index = IssueIndex()
+
+        first = other_worker.create_ticket("", "Jane", "Doe", "GDK7575", "HQ", "Badge readers at the main entrance are offline")
+        index.sync(db)
+        assert index.find("HQ", "badge reader offline at main entrance").inc == first.inc
+
+        second = other_worker.create_ticket("", "Bob", "Roe", "LPT1234", "HQ", "Shared drive is not mapping")
+        index.add(first.inc, first.bldg, first.issue)
+        index.sync(db)
+        index.sync(db)
+        assert len(index) == 2
+        assert index.find("HQ", "the shared drive won't map").inc == second.inc
+
+def test_create_ticket_offers_the_existing_incident():
+    """The second caller is offered the first caller's ticket and attached to it; a caller who
+    says it's a different problem gets a new ticket"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DatabaseTicket(os.path.join(tmp_dir, "tickets.sqlite"))
+        journal = TicketJournal(os.path.join(tmp_dir, "ticket_journal.log"), db, background_replay=False)
+        saved = api.DB, api.JOURNAL, api.issue_index
+        api.DB, api.JOURNAL, api.issue_index = db, journal, IssueIndex()
+        try:
+            async def run():
+                first = api.AssistantFnc("Jane Doe")
+                created = await first.create_ticket("Jane", "Doe", "GDK7575", "HQ", "The wifi is down on the third floor")
+
+                second = api.AssistantFnc("Bob Roe")
+                offered = await second.create_ticket("Bob", "Roe", "LPT1234", "HQ", "no wifi on the third floor")
+                attached = await second.attach_to_incident(first._created_inc)
+
+                third = api.AssistantFnc("Ann Lee")
+                await third.create_ticket("Ann", "Lee", "DSK0042", "HQ", "wifi is down on third floor")
+                declined = await third.create_ticket("Ann", "Lee", "DSK0042", "HQ", "wifi is down on third floor")
+                return created, offered, attached, declined, first, second, third
+
+            created, offered, attached, declined, first, second, third = asyncio.run(run())
+        finally:
+            journal.close()
+            api.DB, api.JOURNAL, api.issue_index = saved
+
+        assert created.startswith("Ticket created successfully")
+        assert offered.startswith("The ticket was not created yet") and "attach_to_incident" in offered
+        assert attached.startswith("The report was added")
+        assert second.has_created_ticket() and second._created_inc == first._created_inc
+        events = db.get_ticket_events(first._created_inc)
+        assert [event.kind for event in events] == ["created", "note"]
+        assert events[1].value == "Also reported by Bob Roe on LPT1234: no wifi on the third floor"
+
+        assert declined.startswith("Ticket created successfully")
+        assert third._created_inc not in ("", first._created_inc)
+
+def test_busy_database_does_not_hold_up_create_ticket():
+    """While a journal replay holds a tenant's shared connection, a new ticket is still journaled
+    right away; the duplicate check uses the tickets indexed so far"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DatabaseTicket(os.path.join(tmp_dir, "tickets.sqlite"), keep_open=True)
+        journal = TicketJournal(os.path.join(tmp_dir, "ticket_journal.log"), db, background_replay=False)
+        journal.start()
+        index = IssueIndex()
+        index.add("INC100001", "HQ", "The wifi is down on the third floor")
+        tenant = Tenant("emea", db, journal, index)
+
+        held, release = threading.Event(), threading.Event()
+        def replay():
+            with db._conn_lock:
+                held.set()
+                release.wait(10)
+        replayer = threading.Thread(target=replay)
+        replayer.start()
+        held.wait(5)
+        try:
+            async def run():
+                fnc = api.AssistantFnc("Jane Doe", tenant)
+                started = time.perf_counter()
+                offered = await fnc.create_ticket("Jane", "Doe", "GDK7575", "HQ", "no wifi on the third floor")
+                created = await fnc.create_ticket("Ann", "Lee", "DSK0042", "HQ", "Monitor flickers")
+                elapsed = time.perf_counter() - started
+                # The sync left running in the background finishes once the replay lets go
+                release.set()
+                return offered, created, elapsed
+            offered, created, elapsed = asyncio.run(run())
+        finally:
+            release.set()
+            replayer.join()
+            journal.close()
+        assert offered.startswith("The ticket was not created yet") and "attach_to_incident" in offered
+        assert created.startswith("Ticket created successfully")
+        assert elapsed < 2 * api.DUPLICATE_SYNC_BUDGET_S + 1.0
+
+if __name__ == "__main__":
+    test_shingles()
+    test_near_duplicates_by_building()
+    test_time_window()
+    test_sync_from_other_workers()
+    test_create_ticket_offers_the_existing_incident()
+    test_busy_database_does_not_hold_up_create_ticket()
+    print("🎉 All issue index tests passed!")
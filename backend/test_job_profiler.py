@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Test script for on-demand job profiling and the profile merge tool
+"""
+import asyncio
+import os
+import pstats
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from job_profiler import PROFILE_MODE_CPROFILE, JobProfiler, profiler_for_job, should_profile
+from merge_profiles import read_collapsed, top_functions
+
+def busy_lookup(seconds):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(200))
+    return total
+
+def test_should_profile():
+    """Rooms are picked by name or glob pattern, or by sampling a fraction of jobs"""
+    assert should_profile("support-room-jane-1", "support-room-jane-*")
+    assert should_profile("room-b", "room-a, room-b")
+    assert not should_profile("room-c", "room-a,room-b")
+    assert not should_profile("room-c", "", 0.0)
+    assert should_profile("room-c", "", 0.5, rng=lambda: 0.2)
+    assert not should_profile("room-c", "", 0.5, rng=lambda: 0.7)
+
+def test_sampling_profile_finds_hot_function():
+    """The sampler attributes most samples to the function burning the event-loop thread"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        profiler = JobProfiler("support-room/jane:1", out_dir=tmp_dir, interval_s=0.002)
+        assert profiler.write() is None  # nothing profiled yet
+
+        profiler.start()
+        busy_lookup(0.3)
+        path = profiler.stop()
+        assert os.path.basename(path) == "support-room_jane_1.collapsed"
+
+        stacks = read_collapsed([path])
+        hot = sum(count for stack, count in stacks.items() if "busy_lookup" in stack)
+        print(f"Samples: {sum(stacks.values())}, in busy_lookup: {hot}")
+        assert sum(stacks.values()) >= 30
+        assert hot / sum(stacks.values()) > 0.8
+
+def test_cprofile_mode_writes_pstats():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        profiler = JobProfiler("session-1", mode=PROFILE_MODE_CPROFILE, out_dir=tmp_dir)
+        profiler.start()
+        busy_lookup(0.05)
+        path = profiler.stop()
+        assert path.endswith("session-1.pstats")
+        functions = {func[2] for func in pstats.Stats(path).stats}
+        assert "busy_lookup" in functions
+
+def test_off_by_default_costs_nothing():
+    """An unselected job starts no sampler thread"""
+    async def run():
+        before = threading.active_count()
+        profiler = profiler_for_job("support-room-unselected")
+        return profiler, threading.active_count() - before
+
+    os.environ.pop("PROFILE_ROOMS", None)
+    os.environ.pop("PROFILE_SAMPLE_RATE", None)
+    profiler, new_threads = asyncio.run(run())
+    assert not profiler.active and not profiler.has_data and new_threads == 0
+    assert profiler.stop() is None
+
+def test_sigusr1_toggles_profiling():
+    """SIGUSR1 to a job process switches profiling on, and again off (writing the profile)"""
+    if not hasattr(signal, "SIGUSR1"):
+        print("SIGUSR1 not available on this platform, skipping")
+        return
+    child = f"""
+import asyncio, os, sys, time
+sys.path.insert(0, {os.path.dirname(os.path.abspath(__file__))!r})
+from job_profiler import profiler_for_job
+
+async def main():
+    profiler = profiler_for_job("support-room-live")
+    print("ready", flush=True)
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and not os.path.exists(os.path.join(os.environ["PROFILE_DIR"], "done")):
+        sum(range(20000))
+        await asyncio.sleep(0)
+    profiler.stop()
+
+asyncio.run(main())
+"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = {**os.environ, "PROFILE_DIR": tmp_dir, "PROFILE_ROOMS": ""}
+        process = subprocess.Popen([sys.executable, "-c", child], env=env, stdout=subprocess.PIPE, text=True)
+        assert process.stdout.readline().strip() == "ready"
+        process.send_signal(signal.SIGUSR1)  # on
+        time.sleep(0.3)
+        process.send_signal(signal.SIGUSR1)  # off, writes the profile
+        time.sleep(0.2)
+        open(os.path.join(tmp_dir, "done"), "w").close()
+        assert process.wait(timeout=10) == 0
+
+        files = [name for name in os.listdir(tmp_dir) if name.endswith(".collapsed")]
+        assert len(files) == 1 and files[0].startswith("support-room-live_")
+        stacks = read_collapsed([os.path.join(tmp_dir, files[0])])
+        print(f"Toggled profile: {sum(stacks.values())} samples")
+        assert sum(stacks.values()) > 10
+
+def test_merge_collapsed_profiles():
+    """Merging sums identical stacks across jobs and ranks functions by self samples"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for i, lines in enumerate([["main;loop;select 30", "main;loop;create_ticket 10"],
+                                   ["main;loop;select 20", "main;loop;lookup_ticket 5"]]):
+            with open(os.path.join(tmp_dir, f"job{i}.collapsed"), "w") as f:
+                f.write("\n".join(lines) + "\n")
+
+        stacks = read_collapsed([os.path.join(tmp_dir, f"job{i}.collapsed") for i in range(2)])
+        assert stacks["main;loop;select"] == 50 and sum(stacks.values()) == 65
+        top = top_functions(stacks, 2)
+        assert top[0] == ("select", 50, 50) and top[1] == ("create_ticket", 10, 10)
+
+        merged = os.path.join(tmp_dir, "merged.collapsed")
+        subprocess.run([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "merge_profiles.py"),
+                        os.path.join(tmp_dir, "job*.collapsed"), "-o", merged, "--json"],
+                       check=True, capture_output=True)
+        assert read_collapsed([merged]) == stacks
+
+if __name__ == "__main__":
+    test_should_profile()
+    test_sampling_profile_finds_hot_function()
+    test_cprofile_mode_writes_pstats()
+    test_off_by_default_costs_nothing()
+    test_sigusr1_toggles_profiling()
+    test_merge_collapsed_profiles()
+    print("🎉 All job profiler tests passed!")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test script for the event-loop lag monitor and its use in admission control
+"""
+import asyncio
+import os
+import tempfile
+import time
+from admission import AdmissionController
+from loop_monitor import LoopLagMonitor, monitor_for_job
+from worker_heartbeat import LagHistogram, WorkerHeartbeatStore
+
+async def blocking_lookup(seconds):
+    # A sync database call made straight from a coroutine
+    time.sleep(seconds)
+
+def test_histogram_buckets_and_quantiles():
+    histogram = LagHistogram()
+    for lag_s in [0.001] * 97 + [0.03, 0.3, 4.0]:
+        histogram.observe(lag_s)
+    assert histogram.count == 100 and histogram.counts[0] == 97
+    assert histogram.quantile(0.5) == 0.005
+    assert histogram.quantile(0.98) == 0.05
+    assert histogram.quantile(0.99) == 0.5
+    assert histogram.quantile(1.0) == 4.0  # beyond the last bound: the maximum
+
+    other = LagHistogram()
+    other.observe(0.2)
+    other.stalls = 1
+    histogram.merge(other)
+    assert histogram.count == 101 and histogram.stalls == 1 and histogram.max_s == 4.0
+
+def test_stall_caught_with_stack():
+    """A blocking call on the loop is reported with the coroutine and stack that made it"""
+    async def run():
+        monitor = LoopLagMonitor(interval_s=0.02, stall_threshold_s=0.1)
+        monitor.start()
+        await asyncio.sleep(0.1)
+        await blocking_lookup(0.3)
+        await asyncio.sleep(0.1)
+        await monitor.aclose()
+        return monitor
+
+    monitor = asyncio.run(run())
+    histogram = monitor.histogram
+    print(f"Samples: {histogram.count}, max lag: {histogram.max_s * 1000:.0f}ms, stalls: {histogram.stalls}")
+    assert histogram.stalls == 1 and len(monitor.stalls) == 1
+    stall = monitor.stalls[0]
+    assert 0.2 < stall.lag_s < 0.6
+    assert stall.coroutine.startswith("blocking_lookup (test_loop_monitor.py:")
+    assert "time.sleep(seconds)" in stall.stack
+    assert histogram.count >= 5 and histogram.quantile(0.5) <= 0.025
+
+def test_lag_flushed_per_worker():
+    """Jobs of the same worker add up in the store; a job with nothing measured writes nothing"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = WorkerHeartbeatStore(os.path.join(tmp_dir, "heartbeats.sqlite"))
+
+        async def job():
+            monitor = LoopLagMonitor(interval_s=0.01, store=store, worker_id="host:agent-1", flush_interval_s=0.05)
+            monitor.start()
+            await asyncio.sleep(0.2)
+            await monitor.aclose()
+
+        async def run():
+            await asyncio.gather(job(), job())
+
+        asyncio.run(run())
+        LoopLagMonitor(store=store, worker_id="host:agent-2").flush()
+        lag = store.loop_lag()
+        assert set(lag) == {"host:agent-1"}
+        print(f"host:agent-1 samples: {lag['host:agent-1'].count}")
+        assert lag["host:agent-1"].count >= 20 and lag["host:agent-1"].stalls == 0
+
+def test_lagging_worker_takes_no_new_calls():
+    """Admission control stops sending callers to a worker whose jobs' event loops lag"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = WorkerHeartbeatStore(os.path.join(tmp_dir, "heartbeats.sqlite"))
+        store.beat("host:agent-1", 4)
+        store.beat("host:agent-2", 4)
+        store.call_started("host:agent-1", "room-a")
+
+        stalled = LagHistogram()
+        for lag_s in [0.002] * 90 + [0.4] * 10:
+            stalled.observe(lag_s)
+        stalled.stalls = 10
+        store.record_loop_lag("host:agent-1", stalled)
+        healthy = LagHistogram()
+        healthy.observe(0.002)
+        store.record_loop_lag("host:agent-2", healthy)
+
+        assert store.snapshot().free == 7
+        snapshot = store.snapshot(max_loop_lag_s=0.25)
+        assert (snapshot.capacity, snapshot.free, snapshot.degraded) == (5, 4, 1)
+        assert store.snapshot(max_loop_lag_s=0.25, lag_window_s=-1).degraded == 0
+
+        async def run():
+            admission = AdmissionController(store, max_loop_lag_s=0.25)
+            await admission.refresh()
+            return admission.free_slots()
+
+        assert asyncio.run(run()) == 4
+
+def test_monitor_off():
+    async def run():
+        return monitor_for_job(None, "")
+
+    os.environ["LOOP_MONITOR"] = "off"
+    try:
+        assert asyncio.run(run()) is None
+    finally:
+        del os.environ["LOOP_MONITOR"]
+
+if __name__ == "__main__":
+    test_histogram_buckets_and_quantiles()
+    test_stall_caught_with_stack()
+    test_lag_flushed_per_worker()
+    test_lagging_worker_takes_no_new_calls()
+    test_monitor_off()
+    print("🎉 All loop monitor tests passed!")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test script for the readiness and metrics endpoints
+"""
+import asyncio
+import os
+import tempfile
+import time
+from aiohttp.test_utils import TestClient, TestServer
+from prometheus_client.parser import text_string_to_metric_families
+from db_ticket import DatabaseTicket
+from db_token_usage import TokenUsageDatabase
+from service_health import CachedCheck, HealthMonitor
+from token_server import TokenServer, TokenSigner
+from tool_metrics import ToolLatencyRecorder
+from worker_heartbeat import LagHistogram, WorkerHeartbeatStore
+
+def test_cached_check_runs_once_per_ttl():
+    """Concurrent and repeated probes within the TTL share one run of the check"""
+    calls = []
+
+    def slow_check():
+        calls.append(time.monotonic())
+        time.sleep(0.05)
+        return len(calls)
+
+    async def run():
+        check = CachedCheck(slow_check, ttl_s=0.2)
+        results = await asyncio.gather(*(check.get() for _ in range(20)))
+        again = await check.get()
+        await asyncio.sleep(0.25)
+        after_ttl = await check.get()
+        return results, again, after_ttl
+
+    results, again, after_ttl = asyncio.run(run())
+    assert results == [1] * 20 and again == 1
+    assert after_ttl == 2 and len(calls) == 2
+
+def test_tool_latency_percentiles():
+    """Tool samples flushed by a job come back as per-tool percentiles"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = WorkerHeartbeatStore(os.path.join(tmp_dir, "heartbeats.sqlite"))
+        recorder = ToolLatencyRecorder()
+        for ms in range(1, 101):
+            recorder.record("lookup_ticket", ms / 1000)
+        recorder.record("create_ticket", 0.25)
+        assert recorder.flush(store, "host:1") == 101
+        assert recorder.flush(store, "host:1") == 0
+
+        stats = store.tool_latency()
+        print(f"lookup_ticket: {stats['lookup_ticket']}")
+        assert stats["lookup_ticket"]["count"] == 100
+        assert stats["lookup_ticket"]["0.5"] == 0.05
+        assert stats["lookup_ticket"]["0.99"] == 0.099
+        assert stats["create_ticket"]["0.5"] == 0.25
+
+def make_server(tmp_dir, ticket_path=None):
+    ticket_db = DatabaseTicket(ticket_path or os.path.join(tmp_dir, "tickets.sqlite"))
+    token_db = TokenUsageDatabase(os.path.join(tmp_dir, "tokens.sqlite"))
+    store = WorkerHeartbeatStore(os.path.join(tmp_dir, "heartbeats.sqlite"))
+    db_paths = {"tickets": ticket_db.db_path, "worker_heartbeats": store.db_path}
+    health = HealthMonitor(ticket_db, token_db, store, db_paths, ttl_s=1.0)
+    return TokenServer(TokenSigner("key", "secret-" + "x" * 32), health=health), store
+
+def test_ready_and_metrics_endpoints():
+    """/ready checks the databases and /metrics parses as Prometheus text"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            server, store = make_server(tmp_dir)
+            store.beat("host:1", 4)
+            store.call_started("host:1", "room-a")
+            store.record_tool_calls("host:1", [("lookup_ticket", 0.02, time.time())])
+            lag = LagHistogram()
+            for lag_s in (0.001, 0.002, 0.3):
+                lag.observe(lag_s)
+            lag.stalls = 1
+            store.record_loop_lag("host:1", lag)
+            async with TestClient(TestServer(server.create_app())) as client:
+                ready = await client.get("/ready")
+                metrics = await client.get("/metrics")
+                return ready.status, await ready.json(), metrics.headers["Content-Type"], await metrics.text()
+
+    status, ready, content_type, text = asyncio.run(run())
+    assert status == 200 and ready["status"] == "ready"
+    assert ready["checks"]["tickets"]["ok"] and ready["checks"]["token_usage"]["ok"]
+    assert content_type.startswith("text/plain; version=0.0.4")
+
+    samples = {}
+    for family in text_string_to_metric_families(text):
+        for sample in family.samples:
+            samples[(sample.name, tuple(sorted(sample.labels.items())))] = sample.value
+    print(f"Parsed {len(samples)} metric samples")
+    assert samples[("servicedesk_db_up", (("db", "tickets"),))] == 1
+    assert samples[("servicedesk_worker_active_calls", (("worker", "host:1"),))] == 1
+    assert samples[("servicedesk_worker_capacity", (("worker", "host:1"),))] == 4
+    assert samples[("servicedesk_tool_latency_seconds", (("quantile", "0.5"), ("tool", "lookup_ticket")))] == 0.02
+    assert samples[("servicedesk_tool_latency_seconds_count", (("tool", "lookup_ticket"),))] == 1
+    assert ("servicedesk_sqlite_wal_bytes", (("db", "worker_heartbeats"),)) in samples
+    assert samples[("servicedesk_worker_loop_lag_seconds_bucket", (("le", "0.005"), ("worker", "host:1")))] == 2
+    assert samples[("servicedesk_worker_loop_lag_seconds_bucket", (("le", "+Inf"), ("worker", "host:1")))] == 3
+    assert samples[("servicedesk_worker_loop_stalls", (("worker", "host:1"),))] == 1
+
+def test_not_ready_when_database_fails():
+    """A database that can't be opened makes /ready answer 503"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            server, _ = make_server(tmp_dir, ticket_path=os.path.join(tmp_dir, "missing", "tickets.sqlite"))
+            async with TestClient(TestServer(server.create_app())) as client:
+                response = await client.get("/ready")
+                return response.status, await response.json()
+
+    status, body = asyncio.run(run())
+    assert status == 503 and body["status"] == "not ready"
+    assert not body["checks"]["tickets"]["ok"] and body["checks"]["token_usage"]["ok"]
+
+if __name__ == "__main__":
+    test_cached_check_runs_once_per_ttl()
+    test_tool_latency_percentiles()
+    test_ready_and_metrics_endpoints()
+    test_not_ready_when_database_fails()
+    print("🎉 All service health tests passed!")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test script for the spoken identifier normalizer (examples and randomized property tests)
+"""
+import random
+from spoken_identifier import PHONETIC_ALPHABET, SPOKEN_DIGITS, normalize_spoken_identifier
+
+LETTER_WORDS = {}
+for word, letter in PHONETIC_ALPHABET.items():
+    LETTER_WORDS.setdefault(letter, []).append(word)
+DIGIT_WORDS = {}
+for word, digit in SPOKEN_DIGITS.items():
+    DIGIT_WORDS.setdefault(digit, []).append(word)
+
+def test_spoken_examples():
+    """Spoken digits, repeats, misspellings and unseparated runs"""
+    test_cases = [
+        ("golf delta kilo seven five seven five", "GDK7575"),
+        ("Golf-Delta-Kilo-7575", "GDK7575"),
+        ("golfdeltakilo7575", "GDK7575"),
+        ("G D K double seven 5", "GDK775"),
+        ("triple zero one", "0001"),
+        ("alfa juliett oh niner", "AJ09"),
+        ("X Ray whisky 12", "XW12"),
+        ("fox trot ex-ray", "FX"),
+        ("GDK dash seven five", "GDK-75"),
+        ("laptop 42", "LAPTOP42"),
+        ("Regular-Computer-Name", "REGULAR-COMPUTER-NAME"),
+        ("double", "DOUBLE"),
+        ("", ""),
+    ]
+
+    for input_text, expected in test_cases:
+        result = normalize_spoken_identifier(input_text)
+        print(f"Input: '{input_text}' -> Output: '{result}' (Expected: '{expected}')")
+        assert result == expected
+
+def random_tag(rng):
+    length = rng.randint(1, 10)
+    return ''.join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789") for _ in range(length))
+
+def speak(tag, rng):
+    """Say a tag the way a caller might: phonetic or plain letters, spoken or typed digits"""
+    words = []
+    for char in tag:
+        if char.isdigit():
+            words.append(rng.choice(DIGIT_WORDS[char]) if rng.random() < 0.7 else char)
+        else:
+            words.append(rng.choice(LETTER_WORDS[char]) if rng.random() < 0.8 else char)
+    words = [rng.choice([str.lower, str.upper, str.title])(word) for word in words]
+    return ''.join(word + rng.choice([" ", "-", ", ", "  "]) for word in words).rstrip(" ,-")
+
+def test_property_round_trip():
+    """Any tag spoken word by word normalizes back to the tag"""
+    rng = random.Random(1234)
+    for _ in range(2000):
+        tag = random_tag(rng)
+        spoken = speak(tag, rng)
+        assert normalize_spoken_identifier(spoken) == tag, (spoken, tag)
+
+def test_property_unseparated_runs():
+    """Phonetic words run together without separators still round-trip"""
+    rng = random.Random(99)
+    for _ in range(1000):
+        tag = ''.join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(rng.randint(2, 6)))
+        spoken = ''.join(rng.choice([w for w in LETTER_WORDS[c] if '-' not in w]) for c in tag)
+        assert normalize_spoken_identifier(spoken) == tag, (spoken, tag)
+
+def test_property_repeats():
+    """'double'/'triple' before a spoken character repeats it"""
+    rng = random.Random(7)
+    for _ in range(500):
+        char = rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789")
+        words = LETTER_WORDS.get(char) or DIGIT_WORDS[char]
+        for repeater, count in (("double", 2), ("triple", 3)):
+            assert normalize_spoken_identifier(f"{repeater} {rng.choice(words)}") == char * count
+
+def test_property_idempotent():
+    """Normalized alphanumeric tags are fixed points"""
+    rng = random.Random(42)
+    for _ in range(2000):
+        tag = random_tag(rng)
+        normalized = normalize_spoken_identifier(tag)
+        assert normalize_spoken_identifier(normalized) == normalized
+
+if __name__ == "__main__":
+    test_spoken_examples()
+    test_property_round_trip()
+    test_property_unseparated_runs()
+    test_property_repeats()
+    test_property_idempotent()
+    print("🎉 All spoken identifier tests passed!")
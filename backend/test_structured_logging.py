@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Test script for the queued, structured logging setup
+"""
+import asyncio
+import contextvars
+import io
+import json
+import logging
+import queue
+import threading
+import time
+from structured_logging import (
+    JsonFormatter, NonBlockingQueueHandler, QueueWriter, RateLimitedLog, SessionContextFilter,
+    bind_session, configure_logging, parse_levels, shutdown_logging
+)
+
+class BlockingStream(io.StringIO):
+    """A log destination that hangs until released, like a full pipe"""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def write(self, text):
+        self.release.wait()
+        return super().write(text)
+
+def run_configured(body, **kwargs):
+    """Run body with configure_logging() writing to a buffer; returns the JSON records written"""
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    stream = io.StringIO()
+    root.handlers[:] = []
+    try:
+        configure_logging(stream=stream, **kwargs)
+        body()
+    finally:
+        shutdown_logging()
+        root.handlers[:] = saved_handlers
+        root.setLevel(saved_level)
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+def test_records_tagged_with_session():
+    """Records carry the room and session ID bound in the call's task, and extra= fields"""
+    async def call(room, session_id):
+        bind_session(room=room)
+        await asyncio.sleep(0)
+        bind_session(session_id=session_id)
+        await asyncio.create_task(asyncio.to_thread(lambda: None))
+        logging.getLogger("agent").info("Voice session started for %s", room, extra={"participant": "jane"})
+
+    async def main():
+        await asyncio.gather(call("room-a", "session-a"), call("room-b", "session-b"))
+        logging.getLogger("agent").info("worker idle")
+
+    records = run_configured(lambda: asyncio.run(main()), level="INFO")
+    by_room = {record.get("room"): record for record in records}
+    assert by_room["room-a"]["session_id"] == "session-a"
+    assert by_room["room-b"]["msg"] == "Voice session started for room-b"
+    assert by_room["room-b"]["participant"] == "jane" and by_room["room-b"]["logger"] == "agent"
+    assert "session_id" not in by_room[None]  # logged outside any call
+
+def test_per_logger_levels():
+    """LOG_LEVELS-style overrides change single loggers without touching the rest"""
+    assert parse_levels("ticket-db=DEBUG, livekit=warning,x=10") == {
+        "ticket-db": logging.DEBUG, "livekit": logging.WARNING, "x": 10}
+    try:
+        parse_levels("agent=LOUD")
+        assert False, "unknown level accepted"
+    except ValueError:
+        pass
+
+    def body():
+        logging.getLogger("ticket-db").debug("collision")
+        logging.getLogger("agent").debug("hidden")
+        logging.getLogger("livekit").info("hidden too")
+        logging.getLogger("agent").info("shown")
+
+    records = run_configured(body, level="INFO", levels="ticket-db=DEBUG,livekit=WARNING")
+    logging.getLogger("ticket-db").setLevel(logging.NOTSET)
+    logging.getLogger("livekit").setLevel(logging.NOTSET)
+    assert [record["msg"] for record in records] == ["collision", "shown"]
+
+def test_exceptions_are_formatted():
+    def body():
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logging.getLogger("ticket-db").exception("Error inserting ticket")
+
+    records = run_configured(body)
+    assert records[0]["level"] == "ERROR" and "ZeroDivisionError" in records[0]["exc"]
+
+def test_existing_root_handler_is_kept():
+    """A handler already on the root logger, like the one a LiveKit job process forwards its
+    records to the worker with, keeps receiving every record, tagged with the call's session,
+    and nothing is written a second time"""
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    forwarded = []
+    forwarder = logging.Handler()
+    forwarder.emit = forwarded.append
+    root.handlers[:] = [forwarder]
+    stream = io.StringIO()
+    try:
+        assert configure_logging(stream=stream, level="INFO") is None
+        def call():
+            bind_session(session_id="session-a", room="room-a")
+            logging.getLogger("agent").info("Voice session started")
+        contextvars.copy_context().run(call)
+        assert root.handlers == [forwarder]
+    finally:
+        shutdown_logging()
+        root.handlers[:] = saved_handlers
+        root.setLevel(saved_level)
+    assert [record.getMessage() for record in forwarded] == ["Voice session started"]
+    assert forwarded[0].session_id == "session-a" and forwarded[0].room == "room-a"
+    assert stream.getvalue() == "" and not forwarder.filters
+
+def test_slow_output_never_blocks_caller():
+    """With the writer stuck on its output, logging returns at once and drops what doesn't fit"""
+    stream = BlockingStream()
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter())
+    handler = NonBlockingQueueHandler(queue.Queue(50))
+    handler.addFilter(SessionContextFilter())
+    listener = QueueWriter(handler.queue, output)
+    listener.start()
+
+    logger = logging.getLogger("test-slow-output")
+    logger.propagate = False
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    try:
+        started = time.perf_counter()
+        for i in range(1000):
+            logger.info("audio frame %d", i)
+        elapsed = time.perf_counter() - started
+        print(f"1000 records with a stuck writer: {elapsed * 1000:.1f}ms, dropped {handler.dropped}")
+        assert elapsed < 0.5
+        assert handler.dropped >= 1000 - 51
+    finally:
+        stream.release.set()
+        listener.stop()
+        logger.removeHandler(handler)
+    assert "audio frame 0" in stream.getvalue()
+
+def test_rate_limited_log():
+    """One record per key per interval; the next one says how many were suppressed"""
+    now = [0.0]
+    logger = logging.getLogger("test-rate-limited")
+    logger.propagate = False
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    limited = RateLimitedLog(logger, interval_s=5, clock=lambda: now[0])
+    try:
+        for _ in range(10):
+            limited.debug("tokens", "Tracked tokens - Input: %d", 5)
+            now[0] += 1
+        limited.debug("other", "different key")
+        messages = [record.getMessage() for record in records]
+        assert messages == ["Tracked tokens - Input: 5",
+                            "Tracked tokens - Input: 5 (4 similar suppressed)",
+                            "different key"]
+
+        logger.setLevel(logging.INFO)
+        limited.debug("disabled", "not evaluated")
+        assert "disabled" not in limited._last
+    finally:
+        logger.removeHandler(handler)
+
+if __name__ == "__main__":
+    test_records_tagged_with_session()
+    test_per_logger_levels()
+    test_exceptions_are_formatted()
+    test_existing_root_handler_is_kept()
+    test_slow_output_never_blocks_caller()
+    test_rate_limited_log()
+    print("🎉 All structured logging tests passed!")
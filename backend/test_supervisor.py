@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test script for the service supervisor (run_services.py)
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from run_services import ServiceSpec, Supervisor, build_specs, default_worker_counts
+
+# Child that writes when it gets SIGTERM, takes a moment to "drain" its calls, then exits cleanly
+DRAINING_CHILD = """
+import signal, sys, time
+log = sys.argv[1]
+def drain(signum, frame):
+    with open(log, "a") as f:
+        f.write(f"{sys.argv[2]} {time.time()}\\n")
+    time.sleep(0.2)
+    sys.exit(0)
+signal.signal(signal.SIGTERM, drain)
+print("ready", flush=True)
+while True:
+    time.sleep(0.05)
+"""
+
+def test_default_worker_counts():
+    """Workers scale with the core count; combined mode runs no transcribers"""
+    assert default_worker_counts(1) == (1, 1)
+    assert default_worker_counts(16) == (8, 4)
+    assert default_worker_counts(16, worker_mode="combined") == (8, 0)
+
+    specs = build_specs(2, 1)
+    assert [spec.name for spec in specs] == ["token-server", "agent-1", "agent-2", "transcriber-1"]
+    ports = [spec.env.get("WORKER_HTTP_PORT") for spec in specs[1:]]
+    assert len(set(ports)) == 3
+    assert specs[1].env["AGENT_WORKER_ID"].endswith(":agent-1")
+
+def test_restarts_with_backoff():
+    """A crashing child is restarted with growing delays"""
+    crashes = []
+
+    async def run():
+        spec = ServiceSpec("crasher", [sys.executable, "-c", "import sys; sys.exit(3)"],
+                           on_crash=lambda: crashes.append(time.monotonic()))
+        supervisor = Supervisor([spec], backoff_initial_s=0.05, backoff_max_s=0.4)
+        task = asyncio.create_task(supervisor.run())
+        await asyncio.sleep(1.5)
+        supervisor.stop()
+        await task
+        return supervisor
+
+    supervisor = asyncio.run(run())
+    gaps = [b - a for a, b in zip(crashes, crashes[1:])]
+    print(f"Restarts: {supervisor.restarts['crasher']}, gaps: {[round(g, 2) for g in gaps]}")
+    assert supervisor.restarts["crasher"] >= 3
+    assert gaps[1] > gaps[0] and max(gaps) < 0.4 + 0.5
+
+def test_sigterm_drains_front_first():
+    """On shutdown the token server stops first, then workers drain and exit on their own"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log = os.path.join(tmp_dir, "stops.log")
+
+        async def run():
+            specs = [
+                ServiceSpec("token-server", [sys.executable, "-c", DRAINING_CHILD, log, "token-server"], front=True),
+                ServiceSpec("agent-1", [sys.executable, "-c", DRAINING_CHILD, log, "agent-1"]),
+                ServiceSpec("agent-2", [sys.executable, "-c", DRAINING_CHILD, log, "agent-2"]),
+            ]
+            supervisor = Supervisor(specs, drain_timeout_s=5)
+            task = asyncio.create_task(supervisor.run())
+            await asyncio.sleep(1.0)
+            supervisor.stop()
+            await task
+            return supervisor
+
+        supervisor = asyncio.run(run())
+        with open(log) as f:
+            stops = dict(line.split() for line in f)
+
+    assert set(stops) == {"token-server", "agent-1", "agent-2"}
+    assert float(stops["token-server"]) < min(float(stops["agent-1"]), float(stops["agent-2"]))
+    assert supervisor.exit_codes == {"token-server": 0, "agent-1": 0, "agent-2": 0}
+    assert sum(supervisor.restarts.values()) == 0
+
+def test_kills_after_drain_timeout():
+    """A child that ignores SIGTERM is killed once the drain timeout passes"""
+    stubborn = "import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); print('up', flush=True); time.sleep(60)"
+
+    async def run():
+        supervisor = Supervisor([ServiceSpec("stubborn", [sys.executable, "-c", stubborn])], drain_timeout_s=0.3)
+        task = asyncio.create_task(supervisor.run())
+        await asyncio.sleep(0.5)
+        started = time.monotonic()
+        supervisor.stop()
+        await task
+        return supervisor, time.monotonic() - started
+
+    supervisor, elapsed = asyncio.run(run())
+    assert supervisor.exit_codes["stubborn"] == -9
+    assert elapsed < 2
+
+if __name__ == "__main__":
+    test_default_worker_counts()
+    test_restarts_with_backoff()
+    test_sigterm_drains_front_first()
+    test_kills_after_drain_timeout()
+    print("🎉 All supervisor tests passed!")
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test script for per-tenant ticket databases: routing, separate files, the bounded set of open
+tenants, and one-time schema creation
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import api
+from db_ticket import SCHEMA_VERSION, DatabaseTicket
+from tenant_db import TenantDatabases, normalize_tenant, parse_tenants, tenant_for_call
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_tenant_for_call():
+    """Room metadata wins over the token attribute; names that can't be file names are refused"""
+    assert tenant_for_call(json.dumps({"tenant": "EMEA"}), {"tenant": "apac"}) == "emea"
+    assert tenant_for_call("", {"tenant": "apac"}) == "apac"
+    assert tenant_for_call("not json", None) == ""
+    assert tenant_for_call(json.dumps({"other": 1}), {}) == ""
+    assert parse_tenants(" emea, APAC ,") == ["emea", "apac"]
+    assert parse_tenants("") is None
+    for bad in ("../emea", "emea.sqlite", "-emea", "x" * 65):
+        try:
+            normalize_tenant(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"{bad!r} accepted")
+
+def test_separate_databases():
+    """Each tenant's tickets live in its own file, and a tenant outside the allowlist is refused"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tenants = TenantDatabases(tmp_dir, allowed=["emea", "apac"], journal=False)
+        emea = tenants.acquire("emea")
+        apac = tenants.acquire("APAC")
+        ticket = emea.db.create_ticket("", "Jane", "Doe", "GDK7575", "HQ", "VPN drops")
+        assert emea.db.get_ticket_by_inc(ticket.inc) == ticket
+        assert apac.db.get_ticket_by_inc(ticket.inc) is None
+        assert sorted(os.listdir(tmp_dir)) == ["apac.sqlite", "emea.sqlite"]
+        assert tenants.acquire("emea") is emea and emea.refs == 2
+        try:
+            tenants.acquire("nasa")
+            raise AssertionError("unknown tenant accepted")
+        except ValueError:
+            pass
+        tenants.close_all()
+
+def test_lru_and_idle_eviction():
+    """Tenants without calls are closed when idle too long or beyond max_open, least recently
+    used first; tenants with calls stay open"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        clock = FakeClock()
+        tenants = TenantDatabases(tmp_dir, max_open=2, idle_s=60, journal=False, clock=clock)
+        busy = tenants.acquire("busy")
+        for name in ("a", "b"):
+            tenants.release(tenants.acquire(name))
+            clock.now += 1
+        assert len(tenants) == 2 and tenants.closed == 1
+        assert set(tenants._open) == {"busy", "b"}
+
+        tenants.release(tenants.acquire("c"))
+        assert set(tenants._open) == {"busy", "c"}
+
+        clock.now += 61
+        tenants.sweep()
+        assert set(tenants._open) == {"busy"}
+        assert busy.db.get_ticket_by_inc("INC000001") is None
+
+        tenants.release(busy)
+        tenants.sweep()
+        assert len(tenants) == 1
+        clock.now += 61
+        tenants.sweep()
+        assert len(tenants) == 0 and tenants.opened == tenants.closed == 4
+
+def test_failed_open_is_not_kept():
+    """A tenant whose database can't be opened isn't left open with a reference held"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tenants = TenantDatabases(tmp_dir)
+        os.makedirs(tenants.paths("emea")["tickets"])
+        try:
+            tenants.acquire("emea")
+            raise AssertionError("unusable database accepted")
+        except sqlite3.Error:
+            pass
+        assert len(tenants) == 0 and tenants.closed == 1
+
+def test_journaled_tickets_survive_eviction():
+    """A tenant's journaled tickets reach its database when the tenant is closed"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        clock = FakeClock()
+        tenants = TenantDatabases(tmp_dir, idle_s=60, clock=clock)
+        tenant = tenants.acquire("emea")
+        ticket = tenant.journal.submit("Jane", "Doe", "GDK7575", "HQ", "Monitor flickers").result(timeout=10)
+        tenants.release(tenant)
+        clock.now += 61
+        tenants.sweep()
+        assert len(tenants) == 0
+        assert DatabaseTicket(tenants.paths("emea")["tickets"]).get_ticket_by_inc(ticket.inc) == ticket
+
+def test_schema_created_once():
+    """The schema is stamped with its version, and a stamped file isn't given the DDL again"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "tickets.sqlite")
+        DatabaseTicket(path).ensure_initialized()
+        with sqlite3.connect(path) as conn:
+            assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+            conn.execute("DROP INDEX idx_ticket_events_kind")
+
+        DatabaseTicket(path).ensure_initialized()
+        with sqlite3.connect(path) as conn:
+            indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert "idx_ticket_events_kind" not in indexes
+
+def test_tools_use_the_calls_tenant():
+    """A call's tools read and write its tenant's tickets, not the default database's"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tenants = TenantDatabases(tmp_dir, journal=False)
+        tenant = tenants.acquire("emea")
+        fnc = api.AssistantFnc("Jane Doe", tenant)
+        created = asyncio.run(fnc.create_ticket("Jane", "Doe", "GDK7575", "HQ", "Docking station dead"))
+        assert created.startswith("Ticket created successfully")
+        assert tenant.db.get_ticket_by_inc(fnc._created_inc).issue == "Docking station dead"
+        assert api.AssistantFnc("Jane Doe")._db is api.DB
+        tenants.close_all()
+
+if __name__ == "__main__":
+    test_tenant_for_call()
+    test_separate_databases()
+    test_lru_and_idle_eviction()
+    test_failed_open_is_not_kept()
+    test_journaled_tickets_survive_eviction()
+    test_schema_created_once()
+    test_tools_use_the_calls_tenant()
+    print("🎉 All tenant database tests passed!")
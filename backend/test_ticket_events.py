@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test script for ticket status, escalation and notes kept as an append-only event log
+"""
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import api
+from db_ticket import MAX_ESCALATION_LEVEL, DatabaseTicket, TicketState
+
+def make_db(tmp_dir):
+    return DatabaseTicket(os.path.join(tmp_dir, "tickets.sqlite"))
+
+def test_events_and_current_state():
+    """Each change appends an event and rewrites the single state row"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = make_db(tmp_dir)
+        ticket = db.create_ticket("", "Jane", "Doe", "GDK7575", "HQ", "Computer freezes")
+        assert db.get_ticket_state(ticket.inc) == TicketState(ticket.inc, "open", 1, 0, db.get_ticket_state(ticket.inc).updated_at)
+
+        db.add_note(ticket.inc, "Restarted twice, still freezing")
+        state = db.escalate(ticket.inc, "Freezing persists after restart")
+        assert (state.status, state.level, state.notes) == ("escalated", 2, 1)
+        db.escalate(ticket.inc, "Needs hardware check")
+        db.escalate(ticket.inc, "Still waiting")
+        state = db.set_status(ticket.inc, "in_progress", actor="tech:bob")
+        assert (state.status, state.level) == ("in_progress", MAX_ESCALATION_LEVEL)
+        assert db.get_ticket_state(ticket.inc) == state
+
+        events = db.get_ticket_events(ticket.inc)
+        assert [event.kind for event in events] == ["created", "note", "escalated", "escalated", "escalated", "status"]
+        assert events[1].value == "Restarted twice, still freezing" and events[-1].actor == "tech:bob"
+
+        try:
+            db.set_status(ticket.inc, "done")
+            assert False, "unknown status accepted"
+        except ValueError:
+            pass
+        assert db.escalate("INC000001", "no such ticket") is None
+        assert db.get_ticket_state("INC000001") is None
+        assert len(db.get_ticket_events(ticket.inc)) == 6
+
+def test_ticket_from_before_the_event_log():
+    """A ticket without a state row reads as open at level 1 and gets a row on its first change"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = make_db(tmp_dir)
+        db.ensure_initialized()
+        with sqlite3.connect(db.db_path) as conn:
+            conn.execute("INSERT INTO tickets VALUES ('INC123456', 'Bob', 'Roe', 'PC1', 'NT', 'Printer jam')")
+        assert db.get_ticket_state("INC123456") == TicketState("INC123456")
+        assert db.add_note("INC123456", "Paper tray replaced").notes == 1
+        assert [event.kind for event in db.get_ticket_events("INC123456")] == ["note"]
+
+def test_concurrent_changes_are_not_lost():
+    """Writers from several threads each append; the state row counts every one of them"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = make_db(tmp_dir)
+        inc = db.create_ticket("", "Jane", "Doe", "GDK7575", "HQ", "Slow network").inc
+
+        def add_notes(worker):
+            for i in range(25):
+                db.add_note(inc, f"worker {worker} note {i}")
+
+        threads = [threading.Thread(target=add_notes, args=(worker,)) for worker in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert db.get_ticket_state(inc).notes == 200
+        with sqlite3.connect(db.db_path) as conn:
+            last_event_id, = conn.execute("SELECT last_event_id FROM ticket_state WHERE inc = ?", (inc,)).fetchone()
+        events = db.get_ticket_events(inc)
+        assert len(events) == 201 and events[-1].id == last_event_id
+
+def test_escalation_and_note_tools():
+    """The tools act on the current ticket and report the new support level"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = make_db(tmp_dir)
+        saved_db, api.DB = api.DB, db
+        try:
+            async def run():
+                assistant_fnc = api.AssistantFnc("Jane Doe")
+                before = await assistant_fnc.escalate_ticket(reason="Freezing")
+                ticket = db.create_ticket("", "Jane", "Doe", "GDK7575", "HQ", "Computer freezes")
+                looked_up = await assistant_fnc.lookup_ticket(ticket.inc)
+                noted = await assistant_fnc.add_ticket_note(note="Restarted, still freezing")
+                escalated = await assistant_fnc.escalate_ticket(reason="Freezing persists")
+                return before, looked_up, noted, escalated, ticket.inc
+
+            before, looked_up, noted, escalated, inc = asyncio.run(run())
+        finally:
+            api.DB = saved_db
+
+        assert before.startswith("There is no ticket to escalate yet")
+        assert "status: open\nsupport_level: 1\n" in looked_up
+        assert noted.startswith("The note was added")
+        assert "Level 2 Technician" in escalated
+        assert [event.kind for event in db.get_ticket_events(inc)] == ["created", "note", "escalated"]
+
+if __name__ == "__main__":
+    test_events_and_current_state()
+    test_ticket_from_before_the_event_log()
+    test_concurrent_changes_are_not_lost()
+    test_escalation_and_note_tools()
+    print("🎉 All ticket event tests passed!")
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Test script for the durable ticket journal: batched fsyncs, acknowledgement while the database
+is locked, idempotent replay, and crash consistency across processes
+"""
+import asyncio
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import api
+from db_ticket import DatabaseTicket
+from issue_index import IssueIndex
+from tenant_db import Tenant
+from ticket_journal import TicketJournal, encode_record, read_journal, read_records
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Files tickets in a loop from several threads and dies abruptly, without any cleanup, after
+# some of them were acknowledged. Replay never runs in it: the database is only reached later
+CRASHING_WORKER = """
+import os, sys, threading
+import api
+from db_ticket import DatabaseTicket
+from issue_index import IssueIndex
+from tenant_db import Tenant
+from ticket_journal import TicketJournal
+
+tmp_dir, name, crash_after = sys.argv[1], sys.argv[2], int(sys.argv[3])
+journal = TicketJournal(os.path.join(tmp_dir, "ticket_journal.log"),
+                        DatabaseTicket(os.path.join(tmp_dir, "tickets.sqlite")), background_replay=False)
+acked = []
+lock = threading.Lock()
+
+def file_tickets(thread):
+    for i in range(1000):
+        ticket = journal.submit(name, "Worker", "PC1", "HQ", f"{name} thread {thread} ticket {i}").result()
+        with lock:
+            print(ticket.inc, ticket.issue, flush=True)
+            acked.append(ticket)
+            if len(acked) >= crash_after:
+                os._exit(1)
+
+for thread in range(4):
+    threading.Thread(target=file_tickets, args=(thread,), daemon=True).start()
+threading.Event().wait(60)
+"""
+
+def make_journal(tmp_dir, **kwargs):
+    db = DatabaseTicket(os.path.join(tmp_dir, "tickets.sqlite"))
+    return TicketJournal(os.path.join(tmp_dir, "ticket_journal.log"), db, **kwargs), db
+
+def count_rows(db, sql, *params):
+    with sqlite3.connect(db.db_path) as conn:
+        return conn.execute(sql, params).fetchone()[0]
+
+def test_batched_writes_and_replay():
+    """Tickets queued together share an fsync; replay applies each exactly once and empties the journal"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        journal, db = make_journal(tmp_dir, background_replay=False)
+        futures = [journal.submit("Jane", "Doe", "GDK7575", "HQ", f"Issue {i}") for i in range(50)]
+        tickets = [future.result(timeout=10) for future in futures]
+        journal.close()
+
+        incs = [ticket.inc for ticket in tickets]
+        assert len(set(incs)) == 50 and incs == sorted(incs)
+        assert journal.records == 50 and journal.batches < 50
+        assert all(journal.is_pending(inc) for inc in incs)
+        assert db.get_ticket_by_inc(incs[0]) is None
+
+        assert journal.replay() == 50
+        assert journal.replay() == 0
+        assert db.get_ticket_by_inc(incs[7]) == tickets[7]
+        assert count_rows(db, "SELECT COUNT(*) FROM ticket_events WHERE kind = 'created'") == 50
+        assert not journal.is_pending(incs[0])
+        assert read_records(journal.path)[0] == []
+        assert read_journal(journal.path)[0] == 2
+
+def test_acknowledged_while_database_is_locked():
+    """A locked database delays the replay, not the caller"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        journal, db = make_journal(tmp_dir, replay_interval_s=0.05)
+        journal.start()
+        locker = sqlite3.connect(db.db_path)
+        locker.execute("BEGIN EXCLUSIVE")
+        try:
+            started = time.perf_counter()
+            ticket = journal.submit("Jane", "Doe", "GDK7575", "HQ", "VPN drops every hour").result(timeout=10)
+            assert time.perf_counter() - started < 2.0
+            assert journal.is_pending(ticket.inc)
+        finally:
+            locker.rollback()
+            locker.close()
+
+        deadline = time.monotonic() + 15
+        while journal.is_pending(ticket.inc) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        journal.close()
+        assert db.get_ticket_by_inc(ticket.inc) == ticket
+
+def test_damaged_records_and_existing_tickets():
+    """A torn last line is skipped and later appends still land on their own line. INCs continue
+    after the database's highest, and a record matching another ticket's INC is reported"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        journal, db = make_journal(tmp_dir, background_replay=False)
+        existing = db.create_ticket("", "Bob", "Roe", "LPT1234", "NT", "Printer jam")
+        conflicting = existing.replace(issue="Something else")
+        with open(journal.path, "wb") as f:
+            f.write(encode_record(conflicting, time.time()))
+            f.write(encode_record(existing.replace(inc="INC000001"), time.time())[:40])
+
+        ticket = journal.submit("Jane", "Doe", "GDK7575", "HQ", "Monitor flickers").result(timeout=10)
+        journal.close()
+        assert ticket.inc > existing.inc
+        records, _ = read_records(journal.path)
+        assert [record.inc for record, _ in records] == [existing.inc, ticket.inc]
+
+        assert journal.replay() == 1
+        assert journal.conflicts == 1
+        assert db.get_ticket_by_inc(existing.inc).issue == "Printer jam"
+        assert db.get_ticket_by_inc(ticket.inc) == ticket
+
+def test_replay_after_another_process_compacts():
+    """A replayer whose journal was compacted by another process, and then grew past the offset
+    it had read up to, still applies the new tickets from the start of the new file"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        writer, db = make_journal(tmp_dir, background_replay=False)
+        stale, _ = make_journal(tmp_dir, background_replay=False)
+        other, _ = make_journal(tmp_dir, background_replay=False)
+        for i in range(2):
+            writer.submit("Jane", "Doe", "GDK7575", "HQ", f"Issue {i}").result(timeout=10)
+
+        # New tickets were journaled between this replay's read and its compaction
+        compact, stale._compact = stale._compact, lambda generation, end: None
+        assert stale.replay() == 2
+        stale._compact = compact
+        generation, offset = stale._applied
+
+        assert other.replay() == 0
+        assert read_journal(other.path)[0] == generation + 1
+        tickets = [writer.submit("Jane", "Doe", "GDK7575", "HQ", f"Later issue {i}").result(timeout=10)
+                   for i in range(5)]
+        writer.close()
+        assert os.path.getsize(writer.path) > offset
+
+        assert stale.replay() == 5
+        assert all(db.get_ticket_by_inc(ticket.inc) == ticket for ticket in tickets)
+
+def test_crash_consistency():
+    """Two worker processes file tickets into one journal and are killed mid-stream. On restart
+    every acknowledged ticket reaches the database exactly once, no INC is handed out twice,
+    and new INCs continue after the ones already given out"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        workers = [
+            subprocess.Popen([sys.executable, "-c", CRASHING_WORKER, tmp_dir, name, str(crash_after)],
+                             cwd=BACKEND_DIR, stdout=subprocess.PIPE, text=True)
+            for name, crash_after in (("alpha", 60), ("beta", 45))
+        ]
+        acked = {}
+        for worker in workers:
+            output, _ = worker.communicate(timeout=60)
+            assert worker.returncode == 1
+            for line in output.splitlines():
+                inc, issue = line.split(" ", 1)
+                assert inc not in acked
+                acked[inc] = issue
+        assert len(acked) >= 105
+
+        # Simulate power loss in the middle of a write after the last acknowledgement
+        with open(os.path.join(tmp_dir, "ticket_journal.log"), "ab") as f:
+            f.write(b'1234abcd {"inc":"INC9')
+
+        journal, db = make_journal(tmp_dir, replay_interval_s=0.05)
+        journal.start()
+        deadline = time.monotonic() + 15
+        while read_records(journal.path)[0] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        ticket = journal.submit("Ann", "Lee", "DSK0042", "HQ", "Keyboard missing keys").result(timeout=10)
+        journal.close()
+
+        for inc, issue in acked.items():
+            assert db.get_ticket_by_inc(inc).issue == issue
+        with sqlite3.connect(db.db_path) as conn:
+            rows = conn.execute("SELECT inc FROM ticket_events WHERE kind = 'created'").fetchall()
+        incs = [row[0] for row in rows]
+        assert len(incs) == len(set(incs)) and set(acked) <= set(incs)
+        assert ticket.inc > max(incs)
+
+def test_journaled_ticket_can_be_looked_up():
+    """A ticket is found right after it is created, before the journal is replayed, by the call
+    that filed it and by another call in the same worker"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        journal, db = make_journal(tmp_dir, background_replay=False)
+        tenant = Tenant("", db, journal, IssueIndex(enabled=False))
+        try:
+            async def run():
+                # Filed on behalf of someone other than the participant
+                fnc = api.AssistantFnc("Front Desk", tenant)
+                await fnc.create_ticket("Jane", "Doe", "GDK7575", "HQ", "Monitor flickers")
+                assert journal.is_pending(fnc._created_inc)
+                mine = await fnc.lookup_ticket(fnc._created_inc)
+                other = await api.AssistantFnc("Bob Roe", tenant).lookup_ticket(fnc._created_inc)
+                return mine, other
+            mine, other = asyncio.run(run())
+        finally:
+            journal.close()
+        assert "Monitor flickers" in mine and "Monitor flickers" in other
+
+if __name__ == "__main__":
+    test_batched_writes_and_replay()
+    test_acknowledged_while_database_is_locked()
+    test_damaged_records_and_existing_tickets()
+    test_replay_after_another_process_compacts()
+    test_crash_consistency()
+    test_journaled_ticket_can_be_looked_up()
+    print("🎉 All ticket journal tests passed!")
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Test script for the immutable Ticket record and its cached renderings
+"""
+import os
+import tempfile
+from db_ticket import DatabaseTicket, Ticket
+
+def test_renderings():
+    """Spoken INC and tool text are rendered once and reused"""
+    ticket = Ticket("INC190244", "Jane", "Doe", "GDK7575", "HQ", "Screen flickers")
+    assert ticket.spoken_inc == "INC1 9 zero 2 4 4"
+    assert ticket.tool_text == (
+        "inc: INC1 9 zero 2 4 4\nfirst: Jane\nlast: Doe\ncomp_name: GDK7575\nbldg: HQ\nissue: Screen flickers\n"
+    )
+    assert ticket.tool_text is ticket.tool_text
+
+    empty = Ticket("", "Jane", "", "", "", "")
+    assert empty.tool_text.startswith("inc: \nfirst: Jane\n")
+
+def test_immutable_and_comparable():
+    """Tickets can't be modified in place; replace() returns a changed copy"""
+    ticket = Ticket("INC190244", "Jane", "Doe", "GDK7575", "HQ", "Screen flickers")
+    try:
+        ticket.bldg = "NT"
+        assert False, "Ticket should be immutable"
+    except AttributeError:
+        pass
+    assert not hasattr(ticket, "__dict__")
+
+    moved = ticket.replace(bldg="NT")
+    assert moved.bldg == "NT" and ticket.bldg == "HQ"
+    assert moved != ticket
+    assert ticket == Ticket("INC190244", "Jane", "Doe", "GDK7575", "HQ", "Screen flickers")
+    assert "bldg='HQ'" in repr(ticket)
+
+def test_database_round_trip():
+    """The DB returns Ticket records built directly by the row factory"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseTicket(os.path.join(tmp, "tickets.sqlite"))
+        created = db.create_ticket("", "Jane", "Doe", "GDK7575", "HQ", "Screen flickers")
+
+        assert db.get_ticket_by_inc(created.inc) == created
+        assert db.get_ticket_by_inc("INC000000") is None
+        assert db.get_tickets_by_name("jane", "doe") == [created]
+
+if __name__ == "__main__":
+    test_renderings()
+    test_immutable_and_comparable()
+    test_database_round_trip()
+    print("🎉 All ticket model tests passed!")
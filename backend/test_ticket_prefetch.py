@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Test script for the participant ticket prefetch: prefetched tickets are served without querying
+the ticket database again
+"""
+import asyncio
+import os
+import tempfile
+import api
+from db_ticket import DatabaseTicket
+from issue_index import IssueIndex
+from tenant_db import Tenant
+
+class CountingDatabase(DatabaseTicket):
+    """Counts ticket reads"""
+
+    def __init__(self, db_path: str):
+        super().__init__(db_path)
+        self.reads = []
+
+    def get_ticket_by_inc(self, inc):
+        self.reads.append(("get_ticket_by_inc", inc))
+        return super().get_ticket_by_inc(inc)
+
+    def get_tickets_by_name(self, first, last="", limit=5):
+        self.reads.append(("get_tickets_by_name", first))
+        return super().get_tickets_by_name(first, last, limit)
+
+def test_prefetched_tickets_skip_the_database():
+    """After the join-time prefetch, the participant's tickets are looked up and listed from
+    memory; other tickets are read from the database once"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = CountingDatabase(os.path.join(tmp_dir, "tickets.sqlite"))
+        mine = db.create_ticket("", "Jane", "Doe", "GDK7575", "HQ", "VPN drops every hour")
+        other = db.create_ticket("", "Bob", "Roe", "LPT1234", "HQ", "Printer jam")
+        tenant = Tenant("", db, None, IssueIndex(enabled=False))
+
+        async def run():
+            fnc = api.AssistantFnc("Jane Doe", tenant)
+            await fnc.start_ticket_prefetch()
+            prefetch_reads = len(db.reads)
+
+            found = await fnc.lookup_ticket(mine.inc.lower())
+            listed = await fnc.search_tickets_by_name("jane", "doe")
+            prefetched = await fnc.prefetch_ticket(mine.inc)
+            assert len(db.reads) == prefetch_reads
+
+            await fnc.lookup_ticket(other.inc)
+            await fnc.lookup_ticket(other.inc)
+            return found, listed, prefetched, db.reads[prefetch_reads:]
+
+        found, listed, prefetched, reads = asyncio.run(run())
+        assert mine.issue in found and mine.spoken_inc in listed
+        assert prefetched == mine
+        assert reads == [("get_ticket_by_inc", other.inc)]
+
+if __name__ == "__main__":
+    test_prefetched_tickets_skip_the_database()
+    print("🎉 All ticket prefetch tests passed!")
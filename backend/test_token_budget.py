@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Test script for token budgets and what a call does when it reaches them
+"""
+import asyncio
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+from livekit.agents import llm
+from budget_guard import BudgetGuard, compact_chat_ctx
+from db_token_usage import TokenUsageDatabase
+from prompts import BUDGET_HARD_INSTRUCTIONS, BUDGET_SOFT_INSTRUCTIONS
+from token_budget import BudgetLimits, BudgetState, TokenBudget
+from token_tracker import UsageWriter
+
+def test_session_limits():
+    budget = TokenBudget(BudgetLimits(session_soft=1000, session_hard=2000))
+    budget.open_session("s1", "Jane Doe")
+    assert budget.add("s1", 999) == BudgetState.OK
+    assert budget.add("s1", 1) == BudgetState.SOFT
+    assert budget.add("s1", 1500) == BudgetState.HARD
+    assert budget.state("s1") == BudgetState.HARD
+    assert budget.add("unknown", 10 ** 9) == BudgetState.OK
+
+    budget.close_session("s1")
+    assert budget.state("s1") == BudgetState.OK
+
+def test_user_and_deployment_daily_limits():
+    """A user's calls add up over the day; the deployment limit covers everyone; a new day resets both"""
+    today = [date(2026, 3, 2)]
+    budget = TokenBudget(BudgetLimits(user_daily_hard=5000, deployment_daily_soft=8000), today=lambda: today[0])
+    budget.open_session("jane-1", "Jane Doe")
+    budget.add("jane-1", 3000)
+    budget.close_session("jane-1")
+
+    budget.open_session("jane-2", "Jane Doe")
+    budget.open_session("bob-1", "Bob Roe")
+    assert budget.add("jane-2", 1000) == BudgetState.OK
+    assert budget.add("jane-2", 1000) == BudgetState.HARD
+    assert budget.add("bob-1", 2000) == BudgetState.OK
+    assert budget.add("bob-1", 1000) == BudgetState.SOFT  # deployment at 8000
+    assert budget.usage("bob-1") == {"session": 3000, "user_daily": 3000, "deployment_daily": 8000}
+
+    today[0] += timedelta(days=1)
+    assert budget.state("jane-2") == BudgetState.OK
+    assert budget.usage("jane-2")["user_daily"] == 0
+
+def test_refresh_from_database():
+    """Daily totals come from the usage database without counting this process's tokens twice"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = TokenUsageDatabase(os.path.join(tmp_dir, "tokens.sqlite"))
+        # Another worker's call earlier today, and one from yesterday that doesn't count
+        db.start_session("other", "Jane Doe", "agent", "gpt-4o-realtime")
+        db.update_token_usage("other", "agent", 3000, 1000)
+        with db._connect() as conn:
+            conn.execute("INSERT INTO token_usage (session_id, user_name, service_type, model_name, total_tokens, session_start) "
+                         "VALUES ('old', 'Jane Doe', 'agent', 'gpt-4o-realtime', 50000, ?)",
+                         (datetime.now() - timedelta(days=1, hours=1),))
+            conn.commit()
+
+        loads = []
+        def load_daily(user, since):
+            loads.append(user)
+            return db.get_daily_usage(user, since)
+
+        budget = TokenBudget(BudgetLimits(user_daily_soft=5000, user_daily_hard=10000))
+        budget.open_session("mine", "Jane Doe")
+        db.start_session("mine", "Jane Doe", "agent", "gpt-4o-realtime")
+        budget.refresh("Jane Doe", load_daily)
+        assert budget.usage("mine")["user_daily"] == 4000
+
+        # Tokens are counted first and written to the database later, as TokenTracker does
+        for _ in range(1000):
+            state = budget.add("mine", 2)
+            db.update_token_usage("mine", "agent", 1, 1)
+            budget.persisted("Jane Doe", 2)
+        assert state == BudgetState.SOFT and budget.usage("mine")["user_daily"] == 6000
+        assert loads == ["Jane Doe"]  # checks never query the database
+
+        budget.refresh("Jane Doe", load_daily)
+        assert budget.usage("mine")["user_daily"] == 6000
+        assert budget.usage("mine")["deployment_daily"] == 6000
+
+        # Tokens not written yet are still counted after a refresh, and only once after they are
+        budget.add("mine", 500)
+        budget.refresh("Jane Doe", load_daily)
+        assert budget.usage("mine")["user_daily"] == 6500
+        db.update_token_usage("mine", "agent", 250, 250)
+        budget.persisted("Jane Doe", 500)
+        budget.refresh("Jane Doe", load_daily)
+        assert budget.usage("mine")["user_daily"] == 6500
+
+def test_tracking_writes_in_background():
+    """track_tokens only counts in memory; the usage writer merges the queued increments into
+    the database and marks them written for the budget"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = TokenUsageDatabase(os.path.join(tmp_dir, "tokens.sqlite"))
+        budget = TokenBudget(BudgetLimits(user_daily_hard=10 ** 6))
+        writer = UsageWriter(db, on_written=budget.persisted)
+        budget.open_session("s1", "Jane Doe")
+        db.start_session("s1", "Jane Doe", "agent", "gpt-4o-realtime")
+        for _ in range(200):
+            budget.add("s1", 3)
+            writer.record("s1", "agent", "Jane Doe", 2, 1)
+        assert writer.flush()
+        writer.close()
+
+        record, = db.get_session_usage("s1")
+        assert (record.input_tokens, record.output_tokens) == (400, 200)
+        assert writer.failed_updates == 0
+
+        # Increments for one session and service that were queued together are one UPDATE
+        written = writer.updates_written
+        writer._write([("s1", "agent", "Jane Doe", 5, 5)] * 3)
+        assert writer.updates_written == written + 1
+        assert db.get_session_usage("s1")[0].total_tokens == 630
+        budget.refresh("Jane Doe", db.get_daily_usage)
+        assert budget.usage("s1")["user_daily"] == 630
+
+def make_chat_ctx(turns):
+    chat_ctx = llm.ChatContext()
+    chat_ctx.add_message(role="system", content="You are an IT Help Desk Technician")
+    for i in range(turns):
+        chat_ctx.add_message(role="user", content=f"user turn {i}")
+        chat_ctx.items.append(llm.FunctionCall(call_id=f"c{i}", name="lookup_ticket", arguments=f'{{"inc": "INC10000{i}"}}'))
+        chat_ctx.items.append(llm.FunctionCallOutput(call_id=f"c{i}", name="lookup_ticket", output=f"inc: INC10000{i}", is_error=False))
+        chat_ctx.add_message(role="assistant", content=f"assistant turn {i}")
+    return chat_ctx
+
+def test_compact_chat_ctx():
+    """Older turns become one summary message; tool results never lose their call"""
+    chat_ctx = make_chat_ctx(5)
+    compacted = compact_chat_ctx(chat_ctx, keep_last=5)
+    items = compacted.items
+    assert items[0].role == "system" and items[0].text_content.startswith("You are")
+    summary = items[1].text_content
+    assert summary.startswith("Summary of the earlier part") and "user: user turn 0" in summary
+    assert "lookup_ticket returned: inc: INC100003" in summary
+    recent = items[2:]
+    assert recent[0].type != "function_call_output" and recent[-1].text_content == "assistant turn 4"
+    assert len(items) < len(chat_ctx.items)
+
+    short = make_chat_ctx(1)
+    assert len(compact_chat_ctx(short, keep_last=6).items) == len(short.items)
+
+class FakeSpeech:
+    async def wait_for_playout(self):
+        await asyncio.sleep(0.01)
+
+class FakeAgent:
+    def __init__(self, chat_ctx):
+        self.chat_ctx = chat_ctx
+        self.instructions = []
+
+    async def update_instructions(self, instructions):
+        self.instructions.append(instructions)
+
+    async def update_chat_ctx(self, chat_ctx):
+        self.chat_ctx = chat_ctx
+
+class FakeSession:
+    def __init__(self, on_reply):
+        self.current_speech = None
+        self.replies = []
+        self.on_reply = on_reply
+
+    def generate_reply(self, instructions):
+        self.replies.append(instructions)
+        self.on_reply()
+        return FakeSpeech()
+
+def test_budget_guard():
+    """Soft: brief answers and a compacted context. Hard: wrap up, wait for the ticket, end the call"""
+    filed = []
+    ended = []
+
+    async def end_call():
+        ended.append(True)
+
+    async def run():
+        agent = FakeAgent(make_chat_ctx(6))
+        session = FakeSession(on_reply=lambda: asyncio.get_running_loop().call_later(0.3, filed.append, "INC100042"))
+        guard = BudgetGuard(agent, session, "base", lambda: bool(filed), end_call, wrap_up_grace_s=5)
+
+        guard.update(BudgetState.SOFT)
+        guard.update(BudgetState.SOFT)
+        await asyncio.sleep(0.05)
+        assert agent.instructions == ["base" + BUDGET_SOFT_INSTRUCTIONS]
+        assert len(agent.chat_ctx.items) <= 8 and not session.replies
+
+        guard.update(BudgetState.HARD)
+        await guard._task
+        assert agent.instructions[-1] == "base" + BUDGET_HARD_INSTRUCTIONS
+        assert len(session.replies) == 1 and filed and ended == [True]
+
+    asyncio.run(run())
+
+def test_limits_from_env():
+    os.environ["TOKEN_BUDGET_SESSION_SOFT"] = "40000"
+    os.environ["TOKEN_BUDGET_DEPLOYMENT_DAILY_HARD"] = "5000000"
+    try:
+        limits = BudgetLimits.from_env()
+        assert limits.session_soft == 40000 and limits.deployment_daily_hard == 5000000
+        assert limits.enabled and limits.daily and limits.session_hard == 0
+    finally:
+        del os.environ["TOKEN_BUDGET_SESSION_SOFT"]
+        del os.environ["TOKEN_BUDGET_DEPLOYMENT_DAILY_HARD"]
+    assert not BudgetLimits().enabled
+
+if __name__ == "__main__":
+    test_session_limits()
+    test_user_and_deployment_daily_limits()
+    test_refresh_from_database()
+    test_tracking_writes_in_background()
+    test_compact_chat_ctx()
+    test_budget_guard()
+    test_limits_from_env()
+    print("🎉 All token budget tests passed!")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test script for the async token server
+"""
+import asyncio
+import jwt
+from aiohttp.test_utils import TestClient, TestServer
+from livekit import api
+from token_server import TokenServer, TokenSigner, generate_room_name
+
+API_KEY = "test-key"
+API_SECRET = "test-secret-" + "x" * 32
+
+def test_tokens_match_livekit_access_tokens():
+    """Signed tokens verify with LiveKit and carry the same claims as api.AccessToken"""
+    token = TokenSigner(API_KEY, API_SECRET).issue(identity="Jane Doe", name="Jane Doe", room="room-1")
+    claims = api.TokenVerifier(API_KEY, API_SECRET).verify(token)
+    assert claims.identity == "Jane Doe" and claims.video.room == "room-1" and claims.video.room_join
+
+    reference = api.AccessToken(API_KEY, API_SECRET).with_identity("Jane Doe").with_name("Jane Doe") \
+        .with_grants(api.VideoGrants(room_join=True, room="room-1", can_publish=True, can_subscribe=True)).to_jwt()
+    ours = jwt.decode(token, options={"verify_signature": False})
+    theirs = jwt.decode(reference, options={"verify_signature": False})
+    for timestamp in ("nbf", "exp"):
+        assert abs(ours.pop(timestamp) - theirs.pop(timestamp)) <= 2
+    assert ours == theirs
+
+def test_room_names_unique():
+    """Room names are readable and never repeat, without asking LiveKit"""
+    names = {generate_room_name("Jane O'Doe") for _ in range(10000)}
+    assert len(names) == 10000
+    assert next(iter(names)).startswith("support-room-jane-o-doe-")
+    assert generate_room_name("!!!").startswith("support-room-caller-")
+
+def test_get_token_endpoint():
+    """/getToken returns a plain-text token for a fresh room; a room named by the caller is ignored"""
+    async def run():
+        server = TokenServer(TokenSigner(API_KEY, API_SECRET))
+        async with TestClient(TestServer(server.create_app())) as client:
+            response = await client.get("/getToken", params={"name": "Jane Doe"})
+            assert response.status == 200
+            assert response.headers["Access-Control-Allow-Origin"] == "*"
+            first = api.TokenVerifier(API_KEY, API_SECRET).verify(await response.text())
+
+            response = await client.get("/getToken", params={"name": "Jane Doe"})
+            second = api.TokenVerifier(API_KEY, API_SECRET).verify(await response.text())
+
+            response = await client.get("/getToken", params={"name": "Sam", "room": "support-room-jane-doe"})
+            joined = api.TokenVerifier(API_KEY, API_SECRET).verify(await response.text())
+
+            health = await (await client.get("/health")).json()
+        return first, second, joined, health
+
+    first, second, joined, health = asyncio.run(run())
+    print(f"Rooms: {first.video.room}, {second.video.room}, {joined.video.room}")
+    assert first.video.room != second.video.room
+    assert joined.video.room.startswith("support-room-sam-")
+    assert health["status"] == "healthy"
+
+def test_tenant_in_token():
+    """A tenant served here travels in the token's attributes; any other tenant is refused"""
+    async def run():
+        server = TokenServer(TokenSigner(API_KEY, API_SECRET), tenants=["emea", "apac"])
+        async with TestClient(TestServer(server.create_app())) as client:
+            response = await client.get("/getToken", params={"name": "Jane Doe", "tenant": "EMEA"})
+            assert response.status == 200
+            claims = api.TokenVerifier(API_KEY, API_SECRET).verify(await response.text())
+
+            plain = api.TokenVerifier(API_KEY, API_SECRET).verify(
+                await (await client.get("/getToken", params={"name": "Sam"})).text())
+            unknown = await client.get("/getToken", params={"name": "Sam", "tenant": "nasa"})
+            invalid = await client.get("/getToken", params={"name": "Sam", "tenant": "../emea"})
+        return claims, plain, unknown, invalid
+
+    claims, plain, unknown, invalid = asyncio.run(run())
+    assert claims.attributes == {"tenant": "emea"}
+    assert not plain.attributes
+    assert unknown.status == 400 and invalid.status == 400
+
+if __name__ == "__main__":
+    test_tokens_match_livekit_access_tokens()
+    test_room_names_unique()
+    test_get_token_endpoint()
+    test_tenant_in_token()
+    print("🎉 All token server tests passed!")
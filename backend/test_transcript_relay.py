@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test script for publishing realtime model input transcriptions through the transcript relay
+"""
+import asyncio
+from types import SimpleNamespace
+from livekit.rtc import EventEmitter
+from transcript_relay import (
+    TranscriptRelay,
+    TRANSCRIPTION_SOURCE_REALTIME,
+    TRANSCRIPTION_SOURCE_STT,
+    get_transcription_source,
+)
+
+class FakeRealtimeSession(EventEmitter):
+    """Stands in for an AgentSession, emitting scripted input transcription events"""
+
+    def transcribe(self, transcript, is_final=True, item_id=None):
+        self.emit("user_input_transcribed", SimpleNamespace(
+            transcript=transcript,
+            is_final=is_final,
+            item_id=item_id,
+        ))
+
+def test_realtime_transcripts_published():
+    """Final realtime transcripts reach listeners once; interim and empty ones are dropped"""
+    session = FakeRealtimeSession()
+    relay = TranscriptRelay(TRANSCRIPTION_SOURCE_REALTIME)
+    published = []
+    relay.add_listener(published.append)
+    relay.attach(session)
+
+    session.transcribe("my computer", is_final=False, item_id="item_1")
+    session.transcribe("my computer is freezing", item_id="item_1")
+    session.transcribe("my computer is freezing", item_id="item_1")  # re-sent completed item
+    session.transcribe("   ", item_id="item_2")
+    session.transcribe("it is in building five", item_id="item_3")
+    session.transcribe("thanks")  # no item id
+
+    expected = ["my computer is freezing", "it is in building five", "thanks"]
+    print(f"Published: {published}")
+    assert published == expected
+    assert relay.transcript_count == len(expected)
+
+def test_listener_errors_isolated():
+    """A failing listener does not stop the others"""
+    session = FakeRealtimeSession()
+    relay = TranscriptRelay(TRANSCRIPTION_SOURCE_REALTIME)
+    published = []
+
+    def failing_listener(transcript):
+        raise RuntimeError("token database unavailable")
+
+    relay.add_listener(failing_listener)
+    relay.add_listener(published.append)
+    relay.attach(session)
+
+    session.transcribe("reset my password", item_id="item_1")
+
+    assert published == ["reset my password"]
+
+class FakeTextStreamReader:
+    def __init__(self, text, final, segment_id):
+        self.info = SimpleNamespace(attributes={"lk.transcription_final": final, "lk.segment_id": segment_id})
+        self.text = text
+
+    async def read_all(self):
+        return self.text
+
+class FakeRoom:
+    def __init__(self):
+        self.handlers = {}
+
+    def register_text_stream_handler(self, topic, handler):
+        self.handlers[topic] = handler
+
+def test_room_transcriptions_relayed():
+    """Final transcriptions published to the room by another worker reach listeners once"""
+    async def run():
+        room = FakeRoom()
+        relay = TranscriptRelay(TRANSCRIPTION_SOURCE_STT)
+        published = []
+        relay.add_listener(published.append)
+        relay.attach_room(room)
+
+        handler = room.handlers["lk.transcription"]
+        handler(FakeTextStreamReader("my inc", "false", "seg_1"), "transcriber")
+        handler(FakeTextStreamReader("my inc is one two", "true", "seg_1"), "transcriber")
+        handler(FakeTextStreamReader("my inc is one two", "true", "seg_1"), "transcriber")
+        handler(FakeTextStreamReader("thanks", "true", "seg_2"), "transcriber")
+        await asyncio.gather(*relay._room_tasks)
+        return published
+
+    published = asyncio.run(run())
+    print(f"Published: {published}")
+    assert published == ["my inc is one two", "thanks"]
+
+def test_transcription_source_parsing():
+    """TRANSCRIPTION_SOURCE values are normalized, unknown ones fall back to the STT"""
+    test_cases = [
+        (None, TRANSCRIPTION_SOURCE_STT),
+        ("", TRANSCRIPTION_SOURCE_STT),
+        ("stt", TRANSCRIPTION_SOURCE_STT),
+        (" Realtime ", TRANSCRIPTION_SOURCE_REALTIME),
+        ("whisper", TRANSCRIPTION_SOURCE_STT),
+    ]
+
+    for value, expected in test_cases:
+        result = get_transcription_source(value)
+        print(f"Input: {value!r} -> Output: {result!r} (Expected: {expected!r})")
+        assert result == expected
+
+if __name__ == "__main__":
+    test_realtime_transcripts_published()
+    test_listener_errors_isolated()
+    test_room_transcriptions_relayed()
+    test_transcription_source_parsing()
+    print("🎉 All transcript relay tests passed!")
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test script for the transcript store and its batched background writer
+"""
+import os
+import tempfile
+import time
+from db_transcript import TranscriptDatabase, TranscriptWriter
+
+def make_db(directory):
+    return TranscriptDatabase(os.path.join(directory, "transcripts.sqlite"))
+
+def test_batched_writes_and_call_transcript():
+    """Turns are batched off the caller's thread and read back in spoken order"""
+    with tempfile.TemporaryDirectory() as directory:
+        db = make_db(directory)
+        writer = TranscriptWriter(db, batch_size=10, flush_interval=60)
+
+        started = time.perf_counter()
+        for i in range(25):
+            writer.record("session-1", "room-a", "Jane Doe", "user" if i % 2 == 0 else "agent", f"turn {i}")
+        record_ms = (time.perf_counter() - started) * 1000
+
+        assert writer.flush()
+        writer.close()
+
+        turns = db.get_call_transcript("session-1")
+        print(f"Recorded 25 turns in {record_ms:.2f}ms, written in {writer.batches_written} batches")
+        assert [turn.text for turn in turns] == [f"turn {i}" for i in range(25)]
+        assert db.get_call_transcript("room-a") == turns
+        assert writer.batches_written == 3
+        assert writer.dropped_turns == 0
+
+def test_flush_interval_writes_partial_batch():
+    """A partial batch is written once the flush interval passes"""
+    with tempfile.TemporaryDirectory() as directory:
+        db = make_db(directory)
+        writer = TranscriptWriter(db, batch_size=100, flush_interval=0.05)
+        writer.record("session-2", "room-b", "John Roe", "user", "my monitor is flickering")
+
+        deadline = time.monotonic() + 2
+        while writer.written_turns == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        writer.close()
+
+        assert len(db.get_call_transcript("session-2")) == 1
+
+def test_full_text_search():
+    """Search finds turns across calls and honours the user filter"""
+    with tempfile.TemporaryDirectory() as directory:
+        db = make_db(directory)
+        writer = TranscriptWriter(db)
+        writer.record("s1", "room-1", "Jane Doe", "user", "my computer is freezing after the update")
+        writer.record("s1", "room-1", "Jane Doe", "agent", "have you been able to restart your device")
+        writer.record("s2", "room-2", "John Roe", "user", "the printer in building five is jammed")
+        writer.record("s3", "room-3", "Ann Poe", "user", "laptop freezing on login")
+        writer.close()
+
+        results = db.search("freezing")
+        print(f"'freezing' -> {[turn.session_id for turn in results]}")
+        assert sorted(turn.session_id for turn in results) == ["s1", "s3"]
+        assert [turn.session_id for turn in db.search("freezing", user_name="Ann Poe")] == ["s3"]
+        assert [turn.room_name for turn in db.search("printer AND jammed")] == ["room-2"]
+        assert db.search("password") == []
+
+if __name__ == "__main__":
+    test_batched_writes_and_call_transcript()
+    test_flush_interval_writes_partial_batch()
+    test_full_text_search()
+    print("🎉 All transcript store tests passed!")
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test script for the local energy/ZCR VAD gate
+"""
+import asyncio
+import os
+import numpy as np
+from livekit import rtc
+from livekit.agents import voice
+from vad_gate import VADConfig, VADGate
+
+SAMPLE_RATE = 16000
+FRAME_SIZE = 160  # 10ms
+FRAME_S = FRAME_SIZE / SAMPLE_RATE
+
+def noise_frames(count, level=20, seed=1):
+    rng = np.random.default_rng(seed)
+    return [rng.normal(0, level, FRAME_SIZE).astype(np.int16) for _ in range(count)]
+
+def voiced_frames(count, pitch=150.0):
+    t = np.arange(count * FRAME_SIZE) / SAMPLE_RATE
+    signal = (6000 * np.sin(2 * np.pi * pitch * t)).astype(np.int16)
+    return [signal[i * FRAME_SIZE:(i + 1) * FRAME_SIZE] for i in range(count)]
+
+def run_gate(gate, frames):
+    sent = []
+    for index, frame in enumerate(frames):
+        for out in gate.process(index, frame, FRAME_S):
+            sent.append(out)
+    return sent
+
+def test_silence_is_dropped():
+    """Background noise alone never opens the gate"""
+    gate = VADGate()
+    sent = run_gate(gate, noise_frames(300))
+    assert sent == []
+    assert gate.segments == 0
+
+def test_speech_forwarded_with_preroll_and_hangover():
+    """Speech opens the gate with pre-roll, and it closes after the hangover"""
+    config = VADConfig(onset_s=0.03, hangover_s=0.2, preroll_s=0.1)
+    gate = VADGate(config)
+    frames = noise_frames(50) + voiced_frames(100) + noise_frames(100)
+    sent = run_gate(gate, frames)
+
+    print(f"Sent frames {sent[0]}..{sent[-1]} ({len(sent)} of {len(frames)})")
+    assert gate.segments == 1
+    assert sent == sorted(set(sent))  # in order, no duplicates
+    assert sent[0] <= 50 - 7           # pre-roll reaches back before the onset
+    assert 50 + 100 + 15 <= sent[-1] <= 50 + 100 + 21  # hangover of ~20 frames
+    assert not gate.is_open
+
+def test_hiss_rejected_by_zcr():
+    """Loud broadband noise has a zero-crossing rate above zcr_max"""
+    gate = VADGate()
+    sent = run_gate(gate, noise_frames(200, level=3000))
+    assert sent == []
+
+def test_config_from_env():
+    """VAD_* environment variables override the defaults, with ms converted to seconds"""
+    os.environ["VAD_HANGOVER_MS"] = "250"
+    os.environ["VAD_ZCR_MAX"] = "0.3"
+    os.environ["VAD_ONSET_MS"] = "not-a-number"
+    try:
+        config = VADConfig.from_env()
+    finally:
+        for name in ("VAD_HANGOVER_MS", "VAD_ZCR_MAX", "VAD_ONSET_MS"):
+            del os.environ[name]
+
+    assert config.hangover_s == 0.25
+    assert config.zcr_max == 0.3
+    assert config.onset_s == VADConfig().onset_s
+
+def test_combined_mode_agent_gates_stt_input():
+    """In combined mode the agent's STT receives only the speech, like the transcriber worker's"""
+    import agent
+    received = []
+
+    async def fake_stt_node(assistant, audio, model_settings):
+        async for frame in audio:
+            received.append(frame)
+            yield frame
+
+    async def run(stt_audio):
+        received.clear()
+        assistant = agent.ServiceDeskAgent(instructions="test", stt_audio=stt_audio)
+
+        async def frames():
+            for samples in noise_frames(100) + voiced_frames(50) + noise_frames(100):
+                yield rtc.AudioFrame(samples.tobytes(), SAMPLE_RATE, 1, FRAME_SIZE)
+
+        async for _ in assistant.stt_node(frames(), None):
+            pass
+        return len(received)
+
+    default_stt_node = vars(voice.Agent.default)["stt_node"]
+    voice.Agent.default.stt_node = fake_stt_node
+    try:
+        gated = asyncio.run(run((VADConfig(), None)))
+        ungated = asyncio.run(run(None))
+    finally:
+        voice.Agent.default.stt_node = default_stt_node
+    print(f"STT received {gated} of {ungated} frames")
+    assert ungated == 250 and 50 <= gated < 150
+
+if __name__ == "__main__":
+    test_silence_is_dropped()
+    test_speech_forwarded_with_preroll_and_hangover()
+    test_hiss_rejected_by_zcr()
+    test_config_from_env()
+    test_combined_mode_agent_gates_stt_input()
+    print("🎉 All VAD gate tests passed!")
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Ticket Journal
+Durable append-only journal in front of the ticket database. A new ticket is acknowledged once
+its record, with the INC reserved for it, is written and fsynced to the journal, and a background
+replayer applies journaled tickets to the database. Tickets from concurrent calls are written
+with one fsync per batch, so a caller waits on a local append, never on SQLite lock contention.
+Replay is idempotent and also runs when the journal starts, so tickets acknowledged before a
+crash still reach the database. Each journal file starts with a generation number that goes up
+whenever the file is replaced, so a replayer can tell that the file it was reading was compacted
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from typing import List, Optional, Set, Tuple
+from db_ticket import DatabaseTicket, Ticket
+
+logger = logging.getLogger("ticket-journal")
+
+MIN_INC_NUMBER = 100000
+MAX_INC_NUMBER = 999999
+
+if os.name == "nt":
+    import msvcrt
+
+    # Windows byte-range locks are mandatory, so lock a byte past the INC stored in the file
+    _LOCK_OFFSET = 1 << 20
+
+    def _lock(fd: int):
+        os.lseek(fd, _LOCK_OFFSET, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+
+    def _unlock(fd: int):
+        os.lseek(fd, _LOCK_OFFSET, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock(fd: int):
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+    def _unlock(fd: int):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+class _SequenceFile:
+    """Highest INC number reserved so far and the latest journal generation, shared by every
+    process using the journal. Holding its lock also serializes appends to the journal and compaction"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._fd: Optional[int] = None
+
+    def __enter__(self) -> "_SequenceFile":
+        self._thread_lock.acquire()
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                _lock(fd)
+            except BaseException:
+                os.close(fd)
+                raise
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        self._fd = fd
+        return self
+
+    def __exit__(self, *exc_info):
+        fd, self._fd = self._fd, None
+        try:
+            _unlock(fd)
+        finally:
+            os.close(fd)
+            self._thread_lock.release()
+
+    def _read_lines(self) -> List[bytes]:
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        return [line.strip() for line in os.read(self._fd, 64).split(b"\n")] + [b"", b""]
+
+    def read(self) -> Optional[int]:
+        text = self._read_lines()[0]
+        return int(text) if text.isdigit() else None
+
+    def read_generation(self) -> int:
+        text = self._read_lines()[1]
+        return int(text) if text.isdigit() else 0
+
+    def write(self, number: Optional[int], generation: Optional[int] = None):
+        """Store and fsync the number (and generation, else the current one is kept); done before
+        the journal write that uses it, so a crash can leave a gap in the INCs but never hand one
+        out twice"""
+        if generation is None:
+            generation = self.read_generation()
+        data = f"{'' if number is None else number}\n{generation}\n".encode()
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.write(self._fd, data)
+        os.ftruncate(self._fd, len(data))
+        os.fsync(self._fd)
+
+def encode_record(ticket: Ticket, created_at: float) -> bytes:
+    """One journal line: CRC-32 of the JSON payload, then the payload"""
+    payload = json.dumps({**{name: getattr(ticket, name) for name in Ticket.FIELDS}, "created_at": created_at},
+                         ensure_ascii=False, separators=(",", ":")).encode()
+    return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+def encode_header(generation: int) -> bytes:
+    """First line of a journal file"""
+    return b"# generation %d\n" % generation
+
+def _read_header(f) -> Tuple[int, int]:
+    """The journal's generation and the length of its header line; 0 and 0 for a file without one"""
+    f.seek(0)
+    line = f.readline()
+    prefix, _, number = line.partition(b"# generation ")
+    if prefix or not line.endswith(b"\n") or not number.strip().isdigit():
+        return 0, 0
+    return int(number), len(line)
+
+def read_journal(path: str, offset: int = 0, generation: Optional[int] = None
+                 ) -> Tuple[int, List[Tuple[Ticket, float]], int]:
+    """The journal's generation, its complete, intact records from offset on, and the offset after
+    the last complete line. When generation is given and the file has another, it was compacted
+    since offset was read and is read from the start. A line cut short by a crash fails its CRC
+    and is skipped"""
+    try:
+        with open(path, "rb") as f:
+            current, _ = _read_header(f)
+            size = os.fstat(f.fileno()).st_size
+            if generation is not None and (current != generation or offset > size):
+                offset = 0
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return 0, [], 0
+    end = data.rfind(b"\n") + 1  # a line still being written is read next time
+    records = []
+    for line in data[:end].splitlines():
+        if line.startswith(b"#"):
+            continue
+        crc, _, payload = line.partition(b" ")
+        try:
+            if int(crc, 16) != zlib.crc32(payload):
+                raise ValueError("CRC mismatch")
+            record = json.loads(payload)
+            ticket = Ticket(*(record[name] for name in Ticket.FIELDS))
+        except (ValueError, KeyError, TypeError):
+            if line.strip():
+                logger.warning("Skipping a damaged journal record (%d bytes)", len(line))
+            continue
+        records.append((ticket, record["created_at"]))
+    return current, records, offset + end
+
+def read_records(path: str, offset: int = 0) -> Tuple[List[Tuple[Ticket, float]], int]:
+    """Complete, intact records from offset on, and the offset after the last complete line"""
+    _, records, end = read_journal(path, offset)
+    return records, end
+
+class TicketJournal:
+    """Ticket creation through the journal. Call start() once per process (it replays what
+    earlier processes left behind), then create_ticket() from the calls"""
+
+    def __init__(self, path: str = "ticket_journal.log", db: Optional[DatabaseTicket] = None,
+                 replay_interval_s: float = 1.0, max_batch: int = 256, background_replay: bool = True):
+        self.path = path
+        self.db = db or DatabaseTicket()
+        self.replay_interval_s = replay_interval_s
+        self.max_batch = max_batch
+        self.background_replay = background_replay
+        self._sequence = _SequenceFile(path + ".seq")
+
+        self._queue: List[Tuple[Ticket, Future]] = []
+        self._queue_cond = threading.Condition()
+        self._closing = False
+        self._writer: Optional[threading.Thread] = None
+        self._replayer: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._replay_wakeup = threading.Event()
+
+        self._replay_lock = threading.Lock()
+        self._applied: Tuple[int, int] = (0, 0)  # (journal generation, offset replayed up to)
+        self._pending: Set[str] = set()  # INCs journaled by this process and not yet replayed
+
+        # Counters for tests and the benchmark
+        self.batches = 0
+        self.records = 0
+        self.conflicts = 0
+
+    @property
+    def started(self) -> bool:
+        return self._writer is not None
+
+    def start(self):
+        """Start the writer and replayer threads; the replayer first applies anything already in
+        the journal. Reads the database's highest INC, so call it at startup, before the first
+        ticket. Safe to call more than once"""
+        with self._start_lock:
+            if self._writer is not None:
+                return
+            try:
+                self._seed_sequence()
+            except Exception as e:
+                logger.error(f"Error reading the highest incident number in use: {e}")
+            self._closing = False
+            self._writer = threading.Thread(target=self._write_loop, name="ticket-journal-writer", daemon=True)
+            self._writer.start()
+            if self.background_replay:
+                self._replayer = threading.Thread(target=self._replay_loop, name="ticket-journal-replay", daemon=True)
+                self._replayer.start()
+
+    def close(self, timeout: float = 5.0):
+        """Write out queued tickets and stop the threads; unreplayed records stay in the journal"""
+        with self._start_lock:
+            if self._writer is None:
+                return
+            with self._queue_cond:
+                self._closing = True
+                self._queue_cond.notify_all()
+            self._replay_wakeup.set()
+            self._writer.join(timeout)
+            if self._replayer is not None:
+                self._replayer.join(timeout)
+            self._writer = self._replayer = None
+
+    def submit(self, first: str, last: str, comp_name: str, bldg: str, issue: str) -> Future:
+        """Queue a new ticket; the future's result is the Ticket, with its INC, once journaled"""
+        self.start()
+        future: Future = Future()
+        with self._queue_cond:
+            self._queue.append((Ticket("", first, last, comp_name, bldg, issue), future))
+            self._queue_cond.notify()
+        return future
+
+    async def create_ticket(self, first: str, last: str, comp_name: str, bldg: str, issue: str) -> Ticket:
+        return await asyncio.wrap_future(self.submit(first, last, comp_name, bldg, issue))
+
+    def is_pending(self, inc: str) -> bool:
+        """Whether a ticket this process journaled has yet to reach the database"""
+        return inc in self._pending
+
+    def _write_loop(self):
+        while True:
+            with self._queue_cond:
+                while not self._queue and not self._closing:
+                    self._queue_cond.wait()
+                if not self._queue:
+                    return
+                batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+            try:
+                tickets = self._write_batch([ticket for ticket, _ in batch])
+            except Exception as e:
+                logger.error(f"Error writing {len(batch)} tickets to the journal: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for ticket, (_, future) in zip(tickets, batch):
+                future.set_result(ticket)
+            self._replay_wakeup.set()
+
+    def _write_batch(self, tickets: List[Ticket]) -> List[Ticket]:
+        now = time.time()
+        with self._sequence as sequence:
+            number = sequence.read()
+            if number is None:
+                number = self._highest_known_number()
+            journaled = []
+            for ticket in tickets:
+                # Same spacing as the database's own incident numbers
+                number = max(MIN_INC_NUMBER, number + random.randint(1, 100))
+                if number > MAX_INC_NUMBER:
+                    raise RuntimeError("No incident numbers are left")
+                journaled.append(ticket.replace(inc=f"INC{number:06d}"))
+            sequence.write(number)
+
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                data = b"".join(encode_record(ticket, now) for ticket in journaled)
+                # A writer that crashed mid-line leaves no newline; start on a fresh line
+                size = os.fstat(fd).st_size
+                if not size:
+                    # A journal file created anew gets a generation no earlier file had
+                    generation = sequence.read_generation() + 1
+                    sequence.write(number, generation)
+                    data = encode_header(generation) + data
+                elif self._last_byte(size) != b"\n":
+                    data = b"\n" + data
+                self._pending.update(ticket.inc for ticket in journaled)
+                os.write(fd, data)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        self.batches += 1
+        self.records += len(journaled)
+        return journaled
+
+    def _last_byte(self, size: int) -> bytes:
+        with open(self.path, "rb") as f:
+            f.seek(size - 1)
+            return f.read(1)
+
+    def _highest_known_number(self) -> int:
+        """Starting point when there is no sequence file yet: the highest INC in the database or journal"""
+        records, _ = read_records(self.path)
+        numbers = [self.db.max_incident_number()]
+        numbers += [int(ticket.inc[3:]) for ticket, _ in records if ticket.inc[3:].isdigit()]
+        return max(numbers)
+
+    def _seed_sequence(self):
+        """Raise the sequence to the highest INC in use, in case tickets were created directly
+        in the database while the journal was off"""
+        highest = self._highest_known_number()
+        with self._sequence as sequence:
+            number = sequence.read()
+            if number is None or number < highest:
+                sequence.write(highest)
+
+    def replay(self) -> int:
+        """Apply journaled tickets to the database; returns how many were new there. Idempotent,
+        so several processes may replay the same journal. Blocking"""
+        with self._replay_lock:
+            # Read from the start if the journal was compacted since the last replay
+            generation, records, end = read_journal(self.path, *self._applied)
+            applied = 0
+            if records:
+                applied, conflicts = self.db.apply_journaled_tickets(records)
+                self.conflicts += len(conflicts)
+                for ticket in conflicts:
+                    logger.error("Journaled ticket %s conflicts with a different ticket in the database", ticket.inc)
+                self._pending.difference_update(ticket.inc for ticket, _ in records)
+                if applied:
+                    logger.info("Replayed %d journaled tickets into the database", applied)
+            self._applied = (generation, end)
+            self._compact(generation, end)
+            return applied
+
+    def _compact(self, generation: int, end: int):
+        """Replace the journal with one of the next generation, holding no records, once
+        everything in it is in the database"""
+        with self._sequence as sequence:
+            try:
+                with open(self.path, "rb") as f:
+                    current, header_end = _read_header(f)
+                    size = os.fstat(f.fileno()).st_size
+                    if current != generation or size <= header_end:
+                        return
+                    if size > end:
+                        # With the lock held no one is writing, so an unfinished last line was left by
+                        # a crashed writer; anything more is new tickets, compacted after the next replay
+                        f.seek(end)
+                        if b"\n" in f.read():
+                            return
+                        logger.warning("Dropping %d bytes of a record a crashed writer left unfinished",
+                                       size - end)
+                # Stored first, so a crash before the replace can skip a generation but not reuse one
+                generation = max(generation, sequence.read_generation()) + 1
+                sequence.write(sequence.read(), generation)
+                header = encode_header(generation)
+                empty_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(empty_path, "wb") as f:
+                    f.write(header)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(empty_path, self.path)
+                self._applied = (generation, len(header))
+            except FileNotFoundError:
+                return
+            except OSError as e:
+                # Windows can't replace a file another process has open; try again next time
+                logger.debug(f"Journal compaction skipped: {e}")
+
+    def _replay_loop(self):
+        delay = self.replay_interval_s
+        while not self._closing:
+            try:
+                self.replay()
+                delay = self.replay_interval_s
+            except sqlite3.OperationalError as e:
+                # The database is locked or busy; tickets stay journaled until it frees up
+                delay = min(delay * 2, 30.0)
+                logger.warning(f"Ticket replay deferred {delay:.0f} s: {e}")
+            except Exception as e:
+                delay = min(delay * 2, 30.0)
+                logger.error(f"Error replaying the ticket journal: {e}")
+            self._replay_wakeup.wait(delay)
+            self._replay_wakeup.clear()
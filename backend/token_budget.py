@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Token Budgets
+Soft and hard token limits per call session, per user per day and for the whole deployment per
+day. Checks only touch in-memory counters. Each user's and the deployment's usage for the day
+is loaded from the token usage database when a session opens and refreshed periodically
+in the background. Usage recorded since the last load is added on top, so other workers'
+calls are seen within one refresh interval
+"""
+
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, time as dt_time
+from enum import IntEnum
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger("token-budget")
+
+class BudgetState(IntEnum):
+    OK = 0
+    SOFT = 1  # answer briefly and work from a compacted context
+    HARD = 2  # wrap up: file the ticket and end the call
+
+def _limit(name: str) -> int:
+    return int(os.getenv(name, "0") or 0)
+
+@dataclass
+class BudgetLimits:
+    """Token limits; 0 means no limit"""
+    session_soft: int = 0
+    session_hard: int = 0
+    user_daily_soft: int = 0
+    user_daily_hard: int = 0
+    deployment_daily_soft: int = 0
+    deployment_daily_hard: int = 0
+
+    @classmethod
+    def from_env(cls) -> "BudgetLimits":
+        return cls(
+            session_soft=_limit("TOKEN_BUDGET_SESSION_SOFT"),
+            session_hard=_limit("TOKEN_BUDGET_SESSION_HARD"),
+            user_daily_soft=_limit("TOKEN_BUDGET_USER_DAILY_SOFT"),
+            user_daily_hard=_limit("TOKEN_BUDGET_USER_DAILY_HARD"),
+            deployment_daily_soft=_limit("TOKEN_BUDGET_DEPLOYMENT_DAILY_SOFT"),
+            deployment_daily_hard=_limit("TOKEN_BUDGET_DEPLOYMENT_DAILY_HARD"),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return any(vars(self).values())
+
+    @property
+    def daily(self) -> bool:
+        return any((self.user_daily_soft, self.user_daily_hard,
+                    self.deployment_daily_soft, self.deployment_daily_hard))
+
+def _state(used: int, soft: int, hard: int) -> BudgetState:
+    if hard and used >= hard:
+        return BudgetState.HARD
+    if soft and used >= soft:
+        return BudgetState.SOFT
+    return BudgetState.OK
+
+def start_of_day(day: date) -> datetime:
+    return datetime.combine(day, dt_time.min)
+
+class TokenBudget:
+    """In-memory token counters checked against BudgetLimits in O(1)"""
+
+    def __init__(self, limits: Optional[BudgetLimits] = None, today: Callable[[], date] = date.today):
+        self.limits = limits or BudgetLimits()
+        self.today = today
+        self._sessions: Dict[str, list] = {}  # session_id -> [user, tokens]
+        self._day = today()
+        # Today's usage as last loaded from the database, usage added here since, and how much
+        # of the added usage has been written to the database
+        self._user_loaded: Dict[str, int] = {}
+        self._user_added: Dict[str, int] = {}
+        self._user_persisted: Dict[str, int] = {}
+        self._deployment_loaded = 0
+        self._deployment_added = 0
+        self._deployment_persisted = 0
+        self._lock = threading.Lock()
+
+    def _roll_day(self):
+        day = self.today()
+        if day != self._day:
+            self._day = day
+            self._user_loaded.clear()
+            self._user_added.clear()
+            self._user_persisted.clear()
+            self._deployment_loaded = self._deployment_added = self._deployment_persisted = 0
+
+    def open_session(self, session_id: str, user: str):
+        with self._lock:
+            self._sessions.setdefault(session_id, [user, 0])
+
+    def close_session(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def add(self, session_id: str, tokens: int) -> BudgetState:
+        """Count tokens a session used and return its budget state"""
+        with self._lock:
+            self._roll_day()
+            session = self._sessions.get(session_id)
+            if session is None:
+                return BudgetState.OK
+            session[1] += tokens
+            self._user_added[session[0]] = self._user_added.get(session[0], 0) + tokens
+            self._deployment_added += tokens
+            return self._state_of(session)
+
+    def persisted(self, user: str, tokens: int):
+        """Record that tokens counted with add() have been written to the database"""
+        with self._lock:
+            self._roll_day()
+            # Capped, as tokens counted before a new day began were dropped with that day
+            self._user_persisted[user] = min(self._user_persisted.get(user, 0) + tokens,
+                                             self._user_added.get(user, 0))
+            self._deployment_persisted = min(self._deployment_persisted + tokens, self._deployment_added)
+
+    def state(self, session_id: str) -> BudgetState:
+        with self._lock:
+            self._roll_day()
+            session = self._sessions.get(session_id)
+            return self._state_of(session) if session is not None else BudgetState.OK
+
+    def _state_of(self, session: list) -> BudgetState:
+        user, session_tokens = session
+        limits = self.limits
+        user_tokens = self._user_loaded.get(user, 0) + self._user_added.get(user, 0)
+        deployment_tokens = self._deployment_loaded + self._deployment_added
+        return max(_state(session_tokens, limits.session_soft, limits.session_hard),
+                   _state(user_tokens, limits.user_daily_soft, limits.user_daily_hard),
+                   _state(deployment_tokens, limits.deployment_daily_soft, limits.deployment_daily_hard))
+
+    def usage(self, session_id: str) -> Dict[str, int]:
+        """Token counts the session's state is based on"""
+        with self._lock:
+            user, session_tokens = self._sessions.get(session_id, ["", 0])
+            return {
+                "session": session_tokens,
+                "user_daily": self._user_loaded.get(user, 0) + self._user_added.get(user, 0),
+                "deployment_daily": self._deployment_loaded + self._deployment_added,
+            }
+
+    def refresh(self, user: str, load_daily: Callable[[str, datetime], Tuple[int, int]]):
+        """Reload today's (user, deployment) totals with load_daily. Blocking; run it off the
+        event loop. The loaded totals replace only the usage persisted() before the load
+        started; usage still waiting to be written stays counted on top of them"""
+        if not self.limits.daily:
+            return
+        with self._lock:
+            self._roll_day()
+            day = self._day
+            user_before = self._user_persisted.get(user, 0)
+            deployment_before = self._deployment_persisted
+        user_total, deployment_total = load_daily(user, start_of_day(day))
+        with self._lock:
+            if self._day != day:
+                return
+            self._user_loaded[user] = user_total
+            self._user_added[user] = self._user_added.get(user, 0) - user_before
+            self._user_persisted[user] = self._user_persisted.get(user, 0) - user_before
+            self._deployment_loaded = deployment_total
+            self._deployment_added -= deployment_before
+            self._deployment_persisted -= deployment_before
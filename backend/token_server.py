@@ -1,65 +1,313 @@
 #!/usr/bin/env python3
+"""
+LiveKit Token Server
+Asyncio (aiohttp) token service for the frontend. All requests share one LiveKitAPI client
+and one token signer, and room names are unique by construction, so issuing a token needs
+no round trip to LiveKit. When the agent workers are at capacity, callers are queued and
+given their token once a call slot frees up
+"""
 
-import os
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
 import logging
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+import os
+import re
+import sys
+import time
+import uuid
+from typing import Dict, Iterable, Optional, Set
+from aiohttp import web
 from livekit import api
 from dotenv import load_dotenv
+from admission import AdmissionController
+from db_ticket import DatabaseTicket
+from db_token_usage import token_db
+from db_transcript import transcript_db
+from service_health import PROMETHEUS_CONTENT_TYPE, HealthMonitor
+from structured_logging import configure_logging
+from tenant_db import normalize_tenant, parse_tenants
+from worker_heartbeat import heartbeat_store
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-CORS(app)
-
 # LiveKit configuration
 LIVEKIT_URL = os.getenv("LIVEKIT_URL")
 LIVEKIT_API_KEY = os.getenv("LIVEKIT_API_KEY")
 LIVEKIT_API_SECRET = os.getenv("LIVEKIT_API_SECRET")
 
-if not all([LIVEKIT_URL, LIVEKIT_API_KEY, LIVEKIT_API_SECRET]):
-    logger.error("Missing required LiveKit environment variables")
-    exit(1)
-
-@app.route('/getToken', methods=['GET'])
-def get_token():
-    try:
-        # Get user name from query parameters
-        name = request.args.get('name', 'Anonymous')
-        
-        # Generate a unique room name (you can customize this logic)
-        room_name = f"support-room-{name.lower().replace(' ', '-')}"
-        
-        logger.info(f"Generating token for user: {name}, room: {room_name}")
-        
-        # Create access token
-        token = api.AccessToken(LIVEKIT_API_KEY, LIVEKIT_API_SECRET) \
-            .with_identity(name) \
-            .with_name(name) \
-            .with_grants(api.VideoGrants(
-                room_join=True,
-                room=room_name,
-                can_publish=True,
-                can_subscribe=True,
-            )).to_jwt()
-        
-        logger.info(f"Token generated successfully for {name}")
-        return token, 200, {'Content-Type': 'text/plain'}
-        
-    except Exception as e:
-        logger.error(f"Error generating token: {str(e)}")
-        return jsonify({"error": "Failed to generate token"}), 500
-
-@app.route('/health', methods=['GET'])
-def health_check():
-    return jsonify({"status": "healthy", "service": "livekit-token-server"}), 200
+TOKEN_SERVER_PORT = int(os.getenv("TOKEN_SERVER_PORT", "5001"))
 
-if __name__ == '__main__':
-    logger.info("Starting LiveKit Token Server on port 5001...")
+# Create each new room in the background when its token is issued, so the agent is
+# dispatched while the caller's browser is still connecting
+CREATE_ROOMS = os.getenv("TOKEN_SERVER_CREATE_ROOMS", "off").strip().lower() == "on"
+ROOM_EMPTY_TIMEOUT = int(os.getenv("ROOM_EMPTY_TIMEOUT", "60"))
+
+# Queue callers when the agent workers' heartbeats report no free call slots
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "on").strip().lower() != "off"
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "200"))
+# A worker whose jobs' p99 event-loop lag over the last minute is above this many ms takes no
+# new calls until it recovers; 0 turns the check off
+ADMISSION_MAX_LOOP_LAG_MS = int(os.getenv("ADMISSION_MAX_LOOP_LAG_MS", "250"))
+
+# Business units callers may name with ?tenant=; each keeps its tickets in its own database
+TENANTS = parse_tenants(os.getenv("TENANTS"))
+
+# Longest a /queue long-poll is held open, in seconds
+QUEUE_POLL_MAX_WAIT = 25.0
+
+# How long /ready and /metrics reuse a check result, in seconds
+HEALTH_CHECK_TTL = float(os.getenv("HEALTH_CHECK_TTL", "5"))
+
+_SLUG_RE = re.compile(r"[^a-z0-9]+")
+
+def generate_room_name(user_name: str) -> str:
+    """Unique room name for a new call: a readable user slug plus a random 48-bit suffix"""
+    slug = _SLUG_RE.sub("-", user_name.lower()).strip("-")[:32] or "caller"
+    return f"support-room-{slug}-{uuid.uuid4().hex[:12]}"
+
+def _b64(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+class TokenSigner:
+    """Signs room-join tokens: HS256 JWTs with the claims api.AccessToken produces. The HMAC
+    key schedule and the encoded JWT header are prepared once and reused for every token"""
+
+    HEADER = _b64(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode())
+
+    def __init__(self, api_key: str, api_secret: str, ttl_s: int = 6 * 3600):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.ttl_s = ttl_s
+        self._mac = hmac.new(api_secret.encode(), digestmod=hashlib.sha256)
+
+    def issue(self, identity: str, name: str, room: str, attributes: Optional[Dict[str, str]] = None) -> str:
+        now = int(time.time())
+        claims = {
+            "name": name,
+            "video": {
+                "roomJoin": True,
+                "room": room,
+                "canPublish": True,
+                "canSubscribe": True,
+                "canPublishData": True,
+            },
+            "sub": identity,
+            "iss": self.api_key,
+            "nbf": now,
+            "exp": now + self.ttl_s,
+        }
+        if attributes:
+            claims["attributes"] = attributes
+        signing_input = self.HEADER + b"." + _b64(json.dumps(claims, separators=(",", ":")).encode())
+        mac = self._mac.copy()
+        mac.update(signing_input)
+        return (signing_input + b"." + _b64(mac.digest())).decode()
+
+@web.middleware
+async def cors_middleware(request: web.Request, handler):
+    if request.method == "OPTIONS":
+        response = web.Response()
+    else:
+        response = await handler(request)
+    response.headers["Access-Control-Allow-Origin"] = "*"
+    response.headers["Access-Control-Allow-Methods"] = "GET, POST, DELETE, OPTIONS"
+    response.headers["Access-Control-Allow-Headers"] = "Content-Type"
+    return response
+
+class TokenServer:
+    def __init__(self, signer: TokenSigner, livekit_url: Optional[str] = None, create_rooms: bool = False,
+                 admission: Optional[AdmissionController] = None, health: Optional[HealthMonitor] = None,
+                 tenants: Optional[Iterable[str]] = None):
+        self.signer = signer
+        self.livekit_url = livekit_url
+        self.create_rooms = create_rooms and bool(livekit_url)
+        self.admission = admission
+        self.health = health
+        self.tenants = set(tenants) if tenants else set()
+        self.livekit_api: Optional[api.LiveKitAPI] = None
+        self._room_tasks: Set[asyncio.Task] = set()
+
+    async def _create_room(self, room_name: str, tenant: str = ""):
+        try:
+            # The agent reads the call's tenant from the room metadata
+            metadata = json.dumps({"tenant": tenant}) if tenant else ""
+            await self.livekit_api.room.create_room(
+                api.CreateRoomRequest(name=room_name, empty_timeout=ROOM_EMPTY_TIMEOUT, metadata=metadata)
+            )
+        except Exception as e:
+            # The room is still created when the caller joins; only the early dispatch is lost
+            logger.warning(f"Could not pre-create room {room_name}: {e}")
+
+    def _issue(self, name: str, room_name: str, tenant: str = "") -> str:
+        # The tenant also travels in the token, for rooms the server doesn't create itself
+        token = self.signer.issue(identity=name, name=name, room=room_name,
+                                  attributes={"tenant": tenant} if tenant else None)
+
+        if self.create_rooms:
+            task = asyncio.create_task(self._create_room(room_name, tenant))
+            self._room_tasks.add(task)
+            task.add_done_callback(self._room_tasks.discard)
+
+        logger.info(f"Token generated for user: {name}, room: {room_name}")
+        return token
+
+    def _tenant(self, request: web.Request) -> Optional[str]:
+        """The tenant the caller asked for, "" for none, or None when it isn't one served here"""
+        try:
+            tenant = normalize_tenant(request.query.get("tenant"))
+        except ValueError:
+            return None
+        if tenant and tenant not in self.tenants:
+            return None
+        return tenant
+
+    def _queue_status(self, entry) -> dict:
+        position = self.admission.position(entry)
+        return {
+            "status": "queued",
+            "ticket": entry.ticket,
+            "position": position,
+            "estimated_wait_s": self.admission.estimated_wait_s(position),
+        }
+
+    async def get_token(self, request: web.Request) -> web.Response:
+        try:
+            # Get user name from query parameters
+            name = request.query.get("name", "Anonymous")
+            tenant = self._tenant(request)
+            if tenant is None:
+                return web.json_response({"error": "Unknown tenant"}, status=400)
+            # Every token is for a fresh room, so each call goes through admission
+            room_name = generate_room_name(name)
+            if self.admission is None or self.admission.try_admit(room_name):
+                return web.Response(text=self._issue(name, room_name, tenant), content_type="text/plain")
+
+            entry = self.admission.enqueue(name, room_name, tenant)
+            if entry is None:
+                logger.warning(f"Queue full, turning away user: {name}")
+                return web.json_response({"error": "All agents are busy, please try again later"},
+                                         status=503, headers={"Retry-After": "60"})
+
+            status = self._queue_status(entry)
+            logger.info(f"Queued user: {name}, position: {status['position']}")
+            return web.json_response(status, status=202)
+
+        except Exception as e:
+            logger.error(f"Error generating token: {str(e)}")
+            return web.json_response({"error": "Failed to generate token"}, status=500)
+
+    async def queue_status(self, request: web.Request) -> web.Response:
+        """Long-poll for a queued caller: answers as soon as it is admitted or its place in line
+        changes, or after `wait` seconds. An admitted caller gets its token here"""
+        if self.admission is None:
+            return web.json_response({"error": "Unknown ticket"}, status=404)
+        entry = self.admission.get(request.match_info["ticket"])
+        if entry is None:
+            return web.json_response({"error": "Unknown ticket"}, status=404)
+
+        try:
+            wait = min(float(request.query.get("wait", "0")), QUEUE_POLL_MAX_WAIT)
+        except ValueError:
+            wait = 0.0
+        if wait > 0:
+            await self.admission.wait_for_change(entry, wait)
+
+        if not entry.admitted:
+            return web.json_response(self._queue_status(entry))
+
+        # The slot stays reserved until the call reaches a worker
+        self.admission.leave(entry.ticket, release=False)
+        token = self._issue(entry.name, entry.room, entry.tenant)
+        return web.json_response({"status": "admitted", "token": token, "room": entry.room})
+
+    async def leave_queue(self, request: web.Request) -> web.Response:
+        if self.admission is not None:
+            self.admission.leave(request.match_info["ticket"])
+        return web.json_response({"status": "left"})
+
+    async def health_check(self, request: web.Request) -> web.Response:
+        """Liveness: the server is up and its event loop answers"""
+        return web.json_response({"status": "healthy", "service": "livekit-token-server"})
+
+    async def readiness_check(self, request: web.Request) -> web.Response:
+        """Readiness: the ticket and token databases answer queries"""
+        if self.health is None:
+            return web.json_response({"status": "ready", "checks": {}})
+        ready, checks = await self.health.readiness()
+        return web.json_response({"status": "ready" if ready else "not ready", "checks": checks},
+                                 status=200 if ready else 503)
+
+    async def metrics(self, request: web.Request) -> web.Response:
+        if self.health is None:
+            return web.json_response({"error": "Metrics are not enabled"}, status=404)
+        response = web.Response(text=await self.health.metrics_text())
+        response.headers["Content-Type"] = PROMETHEUS_CONTENT_TYPE
+        return response
+
+    async def _on_startup(self, app: web.Application):
+        # One client (and one HTTP connection pool) for the lifetime of the server
+        if self.livekit_url:
+            self.livekit_api = api.LiveKitAPI(self.livekit_url, self.signer.api_key, self.signer.api_secret)
+        if self.admission is not None:
+            await self.admission.start()
+        if self.health is not None:
+            await self.health.start()
+
+    async def _on_cleanup(self, app: web.Application):
+        if self.admission is not None:
+            await self.admission.aclose()
+        if self.health is not None:
+            await self.health.aclose()
+        for task in list(self._room_tasks):
+            task.cancel()
+        if self._room_tasks:
+            await asyncio.gather(*self._room_tasks, return_exceptions=True)
+        if self.livekit_api is not None:
+            await self.livekit_api.aclose()
+            self.livekit_api = None
+
+    def create_app(self) -> web.Application:
+        app = web.Application(middlewares=[cors_middleware])
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        app.router.add_get("/getToken", self.get_token)
+        app.router.add_get("/queue/{ticket}", self.queue_status)
+        app.router.add_delete("/queue/{ticket}", self.leave_queue)
+        app.router.add_get("/health", self.health_check)
+        app.router.add_get("/ready", self.readiness_check)
+        app.router.add_get("/metrics", self.metrics)
+        return app
+
+def main():
+    configure_logging()
+    if not all([LIVEKIT_URL, LIVEKIT_API_KEY, LIVEKIT_API_SECRET]):
+        logger.error("Missing required LiveKit environment variables")
+        return 1
+
+    logger.info(f"Starting LiveKit Token Server on port {TOKEN_SERVER_PORT}...")
     logger.info(f"LiveKit URL: {LIVEKIT_URL}")
-    app.run(host='0.0.0.0', port=5001, debug=False)
+    admission = AdmissionController(
+        heartbeat_store, max_queue=ADMISSION_MAX_QUEUE,
+        max_loop_lag_s=ADMISSION_MAX_LOOP_LAG_MS / 1000 if ADMISSION_MAX_LOOP_LAG_MS > 0 else None
+    ) if ADMISSION_CONTROL else None
+    ticket_db = DatabaseTicket()
+    db_paths = {
+        "tickets": ticket_db.db_path,
+        "token_usage": token_db.db_path,
+        "transcripts": transcript_db.db_path,
+        "worker_heartbeats": heartbeat_store.db_path,
+    }
+    health = HealthMonitor(ticket_db, token_db, heartbeat_store, db_paths, ttl_s=HEALTH_CHECK_TTL, admission=admission)
+    server = TokenServer(TokenSigner(LIVEKIT_API_KEY, LIVEKIT_API_SECRET), LIVEKIT_URL, CREATE_ROOMS,
+                         admission, health, TENANTS)
+    web.run_app(server.create_app(), host="0.0.0.0", port=TOKEN_SERVER_PORT, access_log=None, print=None)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
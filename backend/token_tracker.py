@@ -1,20 +1,114 @@
 #!/usr/bin/env python3
 """
 Token Tracking Service
-Centralized service for tracking Azure OpenAI token usage across transcriber and agent services
+Centralized service for tracking Azure OpenAI token usage across transcriber and agent services,
+and for checking it against the token budgets
 """
 
+import atexit
 import logging
+import queue
+import threading
 import uuid
 from datetime import datetime
-from typing import Optional, Dict, Any
-from db_token_usage import token_db, TokenUsageRecord
+from typing import Optional, Dict, Any, Callable, List, Tuple
+from db_token_usage import token_db, TokenUsageDatabase, TokenUsageRecord
+from token_budget import BudgetLimits, BudgetState, TokenBudget
 
 logger = logging.getLogger("token-tracker")
 
+class UsageWriter:
+    """Adds token counts to the usage database on a background thread, so tracking never waits
+    for SQLite. Counts queued while a write is in progress are merged into one UPDATE per
+    session and service"""
+
+    def __init__(self, db: TokenUsageDatabase, on_written: Optional[Callable[[str, int], None]] = None):
+        self.db = db
+        # Called with (user, tokens) once tokens are in the database
+        self.on_written = on_written
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.updates_written = 0
+        self.failed_updates = 0
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="token-usage-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def record(self, session_id: str, service_type: str, user: str, input_tokens: int, output_tokens: int):
+        """Queue a usage increment; never blocks the caller"""
+        self._ensure_started()
+        self._queue.put((session_id, service_type, user, input_tokens, output_tokens))
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until every increment queued so far has been written"""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """Write out queued increments and stop the writer thread"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _write(self, items: List[Tuple[str, str, str, int, int]]):
+        merged: Dict[Tuple[str, str], list] = {}
+        for session_id, service_type, user, input_tokens, output_tokens in items:
+            counts = merged.setdefault((session_id, service_type), [user, 0, 0])
+            counts[1] += input_tokens
+            counts[2] += output_tokens
+        for (session_id, service_type), (user, input_tokens, output_tokens) in merged.items():
+            try:
+                self.db.update_token_usage(session_id, service_type, input_tokens, output_tokens)
+                self.updates_written += 1
+            except Exception as e:
+                self.failed_updates += 1
+                logger.error(f"Error writing token usage for {session_id}/{service_type}: {e}")
+                continue
+            if self.on_written is not None:
+                self.on_written(user, input_tokens + output_tokens)
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write([item for item in items if isinstance(item, tuple)])
+            for item in items:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if None in items:
+                return
+
 class TokenTracker:
-    def __init__(self):
+    def __init__(self, limits: Optional[BudgetLimits] = None):
         self.active_sessions = {}  # session_id -> session_info
+        self._limits = limits
+        self._budget: Optional[TokenBudget] = None
+        # Usage reaches the database in the background; the budget only counts it as loaded
+        # from there once it is written
+        self.writer = UsageWriter(token_db, on_written=lambda user, tokens: self.budget.persisted(user, tokens))
+    
+    @property
+    def budget(self) -> TokenBudget:
+        # Limits are read on first use, after the services have loaded their .env
+        if self._budget is None:
+            self._budget = TokenBudget(self._limits or BudgetLimits.from_env())
+        return self._budget
     
     def start_session(self, room_name: str, user_name: str, participant_identity: str) -> str:
         """Start a new token tracking session for a user"""
@@ -35,6 +129,7 @@ class TokenTracker:
         }
         
         self.active_sessions[session_id] = session_info
+        self.budget.open_session(session_id, user_name)
         logger.info(f"Started token tracking session: {session_id} for user: {user_name}")
         
         return session_id
@@ -67,31 +162,43 @@ class TokenTracker:
             logger.error(f"Error registering service {service_type} for session {session_id}: {e}")
             return False
     
-    def track_tokens(self, session_id: str, service_type: str, input_tokens: int, output_tokens: int):
-        """Track token usage for a specific service in a session"""
+    def track_tokens(self, session_id: str, service_type: str, input_tokens: int, output_tokens: int) -> BudgetState:
+        """Track token usage for a specific service in a session and return the session's
+        budget state"""
         if session_id not in self.active_sessions:
             logger.warning(f"Session {session_id} not found for token tracking")
-            return
+            return BudgetState.OK
         
         session_info = self.active_sessions[session_id]
         
         if service_type not in session_info["services"]:
             logger.warning(f"Service {service_type} not registered for session {session_id}")
-            return
+            return BudgetState.OK
+        
+        # Update in-memory tracking; the database write is queued for the background writer
+        service_info = session_info["services"][service_type]
+        service_info["total_input_tokens"] += input_tokens
+        service_info["total_output_tokens"] += output_tokens
+        state = self.budget.add(session_id, input_tokens + output_tokens)
+        self.writer.record(session_id, service_type, session_info["user_name"], input_tokens, output_tokens)
         
+        logger.debug(f"Tracked tokens for {session_id}/{service_type}: +{input_tokens} input, +{output_tokens} output")
+        return state
+    
+    def budget_state(self, session_id: str) -> BudgetState:
+        """The session's budget state, from in-memory counters only"""
+        return self.budget.state(session_id)
+    
+    def refresh_budget(self, session_id: str):
+        """Reload today's usage of the session's user and of the deployment. Blocking (one
+        database query), call it from a thread"""
+        session_info = self.active_sessions.get(session_id)
+        if session_info is None:
+            return
         try:
-            # Update database
-            token_db.update_token_usage(session_id, service_type, input_tokens, output_tokens)
-            
-            # Update in-memory tracking
-            service_info = session_info["services"][service_type]
-            service_info["total_input_tokens"] += input_tokens
-            service_info["total_output_tokens"] += output_tokens
-            
-            logger.debug(f"Tracked tokens for {session_id}/{service_type}: +{input_tokens} input, +{output_tokens} output")
-            
+            self.budget.refresh(session_info["user_name"], token_db.get_daily_usage)
         except Exception as e:
-            logger.error(f"Error tracking tokens for {session_id}/{service_type}: {e}")
+            logger.error(f"Error refreshing token budget for {session_id}: {e}")
     
     def end_session(self, session_id: str, service_type: str = None) -> Dict[str, Any]:
         """End token tracking session and return usage summary"""
@@ -102,6 +209,9 @@ class TokenTracker:
         session_info = self.active_sessions[session_id]
         
         try:
+            # Queued usage goes to the records before they are closed
+            self.writer.flush()
+            
             # End database session(s)
             token_db.end_session(session_id, service_type)
             
@@ -138,6 +248,7 @@ class TokenTracker:
             # Clean up in-memory session if ending all services
             if not service_type:
                 del self.active_sessions[session_id]
+                self.budget.close_session(session_id)
                 logger.info(f"Ended complete token tracking session: {session_id}")
             else:
                 # Remove specific service
@@ -208,6 +319,7 @@ class TokenTracker:
                 token_db.end_session(session_id)
                 # Remove from memory
                 del self.active_sessions[session_id]
+                self.budget.close_session(session_id)
             except Exception as e:
                 logger.error(f"Error cleaning up session {session_id}: {e}")
     
@@ -230,6 +342,7 @@ class TokenTracker:
                 logger.info(f"Cleaning up stale session: {session_id}")
                 token_db.end_session(session_id)
                 del self.active_sessions[session_id]
+                self.budget.close_session(session_id)
             except Exception as e:
                 logger.error(f"Error cleaning up stale session {session_id}: {e}")
         
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tool Latency Metrics
+Times each function tool call in memory; the job flushes the samples to the worker
+heartbeat store in batches, where the token server's /metrics endpoint reads them
+"""
+
+import functools
+import logging
+import threading
+import time
+from typing import List, Tuple
+from worker_heartbeat import WorkerHeartbeatStore
+
+logger = logging.getLogger("tool-metrics")
+
+class ToolLatencyRecorder:
+    def __init__(self, max_samples: int = 10000):
+        self.max_samples = max_samples
+        self._samples: List[Tuple[str, float, float]] = []
+        self._lock = threading.Lock()
+
+    def record(self, tool: str, duration_s: float):
+        with self._lock:
+            if len(self._samples) < self.max_samples:
+                self._samples.append((tool, duration_s, time.time()))
+
+    def drain(self) -> List[Tuple[str, float, float]]:
+        with self._lock:
+            samples, self._samples = self._samples, []
+        return samples
+
+    def flush(self, store: WorkerHeartbeatStore, worker_id: str) -> int:
+        """Write the pending samples to the store; blocking, so call it through asyncio.to_thread"""
+        samples = self.drain()
+        if samples:
+            try:
+                store.record_tool_calls(worker_id, samples)
+            except Exception as e:
+                logger.error(f"Error writing tool latencies: {e}")
+                return 0
+        return len(samples)
+
+def timed_tool(func):
+    """Record how long an async tool method takes, under its function name. Goes below
+    @llm.function_tool so the tool keeps the wrapped function's signature"""
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            tool_latency.record(name, time.perf_counter() - started)
+
+    return wrapper
+
+# Global instance
+tool_latency = ToolLatencyRecorder()
@@ -5,7 +5,9 @@ from livekit.agents import (
     AgentSession,
     AutoSubscribe,
     JobContext,
+    JobProcess,
     MetricsCollectedEvent,
+    RoomInputOptions,
     RoomOutputOptions,
     StopResponse,
     WorkerOptions,
@@ -13,69 +15,171 @@ from livekit.agents import (
     llm,
     metrics,
 )
+from livekit import rtc
 from livekit.plugins import openai
 from token_tracker import token_tracker
+from db_token_usage import token_db
+from db_transcript import transcript_db, transcript_writer
+from vad_gate import VADConfig, VADGate
+from audio_preprocess import AudioPreprocessor
+from transcript_relay import TRANSCRIPTION_SOURCE_REALTIME, get_transcription_source
+from job_profiler import profiler_for_job
+from loop_monitor import monitor_for_job
+from worker_heartbeat import default_worker_id, heartbeat_store
+from structured_logging import bind_session, configure_logging
 import os
+from typing import AsyncIterable, Optional, Tuple
 
 load_dotenv()
 
 logger = logging.getLogger("transcriber")
 
+# Model of the Azure OpenAI STT, also recorded with the transcriber's token usage
+TRANSCRIBER_STT_MODEL = "gpt-4o-transcribe"
+
+def create_transcriber_stt():
+    """Create the Azure OpenAI STT used for caller transcription"""
+    # Azure OpenAI Configuration
+    azure_api_key = os.getenv("AZURE_OPENAI_API_KEY")
+    azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+    azure_api_version = os.getenv("AZURE_OPENAI_API_VERSION")
+    azure_deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
+    
+    return openai.STT.with_azure(
+        azure_deployment=azure_deployment,
+        azure_endpoint=azure_endpoint,
+        api_key=azure_api_key,
+        api_version=azure_api_version,
+        model=TRANSCRIBER_STT_MODEL,
+        language="en"
+    )
+
+# RoomIO resamples and downmixes the caller's track to this rate, mono, before the agent sees it;
+# it is also the rate the OpenAI streaming STT uploads
+ROOM_INPUT_SAMPLE_RATE = 24000
+
+def stt_audio_settings(log_prefix: str = "Transcriber") -> Tuple[Optional[VADConfig], Optional[int]]:
+    """Local VAD gate settings (VAD_GATE, VAD_*) and the rate caller audio is resampled to before
+    the STT (STT_PREPROCESS, STT_SAMPLE_RATE); None turns off the gate or the resampling"""
+    # Silero VAD is unavailable, so silence is filtered by the local energy/ZCR gate instead
+    vad_config = None
+    if os.getenv("VAD_GATE", "on").strip().lower() not in ("off", "false", "0"):
+        vad_config = VADConfig.from_env()
+        logger.info(f"{log_prefix}: Local VAD gate enabled - {vad_config}")
+    
+    # Opt-in: room audio already arrives as mono at ROOM_INPUT_SAMPLE_RATE, so the preprocessor
+    # only runs when STT_PREPROCESS=on and STT_SAMPLE_RATE asks for another rate (16000 for STTs
+    # that accept narrower input)
+    stt_sample_rate = None
+    if os.getenv("STT_PREPROCESS", "off").strip().lower() in ("on", "true", "1"):
+        target_rate = int(os.getenv("STT_SAMPLE_RATE", str(ROOM_INPUT_SAMPLE_RATE)))
+        if target_rate != ROOM_INPUT_SAMPLE_RATE:
+            stt_sample_rate = target_rate
+            logger.info(f"{log_prefix}: Resampling caller audio to {stt_sample_rate} Hz mono")
+    return vad_config, stt_sample_rate
+
+def gate_stt_audio(audio: AsyncIterable[rtc.AudioFrame], vad_config: Optional[VADConfig],
+                   stt_sample_rate: Optional[int]) -> AsyncIterable[rtc.AudioFrame]:
+    """Caller audio as the STT node should receive it: resampled, then with silence dropped"""
+    # Downmix/resample first so the VAD gate and the STT both see mono at the upload rate
+    if stt_sample_rate:
+        audio = AudioPreprocessor(stt_sample_rate).preprocess(audio)
+    
+    # Drop silence locally so only speech is uploaded to the cloud STT
+    if vad_config is not None:
+        audio = VADGate(vad_config).gate(audio)
+    return audio
+
+def track_transcription_tokens(tracking_session_id: str, user_transcript: str):
+    """Record estimated token usage for a completed user transcript"""
+    if not tracking_session_id:
+        return
+    
+    try:
+        # Estimate token usage for transcription
+        # Note: This is an approximation since actual token usage may not be directly available
+        estimated_input_tokens = len(user_transcript.split()) * 1.3  # Rough estimate
+        estimated_output_tokens = len(user_transcript.split())  # Output is the transcript
+        
+        token_tracker.track_tokens(
+            tracking_session_id, 
+            "transcriber", 
+            int(estimated_input_tokens), 
+            int(estimated_output_tokens)
+        )
+        logger.debug("Tracked transcription tokens - Input: %d, Output: %d", estimated_input_tokens, estimated_output_tokens)
+    except Exception as e:
+        logger.error(f"Error tracking transcription tokens: {e}")
+
 # This transcriber will handle speech-to-text and publish transcripts to the room
 class ServiceDeskTranscriber(Agent):
-    def __init__(self, tracking_session_id: str = None):
-        # Azure OpenAI Configuration
-        azure_api_key = os.getenv("AZURE_OPENAI_API_KEY")
-        azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-        azure_api_version = os.getenv("AZURE_OPENAI_API_VERSION")
-        azure_deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
-        
+    def __init__(self, tracking_session_id: str = None, vad_config: VADConfig = None, stt_sample_rate: int = None,
+                 room_name: str = "", user_name: str = ""):
         # Store tracking session ID
         self.tracking_session_id = tracking_session_id
         
-        # Create Azure OpenAI STT
-        stt = openai.STT.with_azure(
-            azure_deployment=azure_deployment,
-            azure_endpoint=azure_endpoint,
-            api_key=azure_api_key,
-            api_version=azure_api_version,
-            model="gpt-4o-transcribe",
-            language="en"
-        )
+        # Call identity for the stored transcript
+        self.room_name = room_name
+        self.user_name = user_name
+        
+        # Mono sample rate audio is converted to before the STT; None leaves frames untouched
+        self.stt_sample_rate = stt_sample_rate
+        
+        # Local VAD gate settings; None sends all audio to the STT
+        self.vad_config = vad_config
         
         super().__init__(
             instructions="Transcribe audio for service desk support",
-            stt=stt,
+            stt=create_transcriber_stt(),
         )
 
+    def stt_node(self, audio, model_settings):
+        audio = gate_stt_audio(audio, self.vad_config, self.stt_sample_rate)
+        return Agent.default.stt_node(self, audio, model_settings)
+
     async def on_user_turn_completed(self, chat_ctx: llm.ChatContext, new_message: llm.ChatMessage):
         user_transcript = new_message.text_content
-        logger.info(f"Transcribed: {user_transcript}")
+        logger.debug("Transcribed: %s", user_transcript)
+        
+        # Queued for the batched background writer, no database work on the STT path
+        transcript_writer.record(self.tracking_session_id, self.room_name, self.user_name, "user", user_transcript)
         
         # Track token usage for transcription
-        if self.tracking_session_id:
-            try:
-                # Estimate token usage for transcription
-                # Note: This is an approximation since actual token usage may not be directly available
-                estimated_input_tokens = len(user_transcript.split()) * 1.3  # Rough estimate
-                estimated_output_tokens = len(user_transcript.split())  # Output is the transcript
-                
-                token_tracker.track_tokens(
-                    self.tracking_session_id, 
-                    "transcriber", 
-                    int(estimated_input_tokens), 
-                    int(estimated_output_tokens)
-                )
-                logger.debug(f"Tracked transcription tokens - Input: {int(estimated_input_tokens)}, Output: {int(estimated_output_tokens)}")
-            except Exception as e:
-                logger.error(f"Error tracking transcription tokens: {e}")
+        track_transcription_tokens(self.tracking_session_id, user_transcript)
         
         # Stop processing after transcription to avoid generating responses
         raise StopResponse()
 
+def prewarm(proc: JobProcess):
+    """Create database schemas while the job process is idle rather than on its first call"""
+    configure_logging()
+    token_db.ensure_initialized()
+    heartbeat_store.ensure_initialized()
+    transcript_db.ensure_initialized()
+
 async def entrypoint(ctx: JobContext):
+    bind_session(room=ctx.room.name)
     logger.info(f"Starting Service Desk Transcriber, room: {ctx.room.name}")
     
+    if os.getenv("WORKER_MODE", "split").strip().lower() == "combined":
+        # agent.py already transcribes this room in combined mode
+        logger.info("Transcriber: WORKER_MODE=combined, leaving transcription to the agent worker")
+        return
+    
+    if get_transcription_source(os.getenv("TRANSCRIPTION_SOURCE")) == TRANSCRIPTION_SOURCE_REALTIME:
+        # The agent's realtime model publishes the caller's transcripts itself
+        logger.info("Transcriber: TRANSCRIPTION_SOURCE=realtime, no separate STT pass needed")
+        return
+    
+    # Profile this job if PROFILE_ROOMS/PROFILE_SAMPLE_RATE select it; SIGUSR1 toggles it later
+    profiler = profiler_for_job(ctx.room.name)
+    ctx.add_shutdown_callback(profiler.aclose)
+    
+    # Event-loop lag of this job, reported under the transcriber worker's id
+    loop_monitor = monitor_for_job(heartbeat_store, os.getenv("TRANSCRIBER_WORKER_ID", ""))
+    if loop_monitor:
+        ctx.add_shutdown_callback(loop_monitor.aclose)
+    
     await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
     
     # Wait for participants to get user information
@@ -106,8 +210,13 @@ async def entrypoint(ctx: JobContext):
     else:
         logger.info(f"Transcriber: Using existing token tracking session: {tracking_session_id}")
     
+    profiler.name = f"{tracking_session_id}_transcriber"
+    bind_session(session_id=tracking_session_id)
+    
     # Register transcriber service for token tracking
-    token_tracker.register_service(tracking_session_id, "transcriber", "whisper")
+    token_tracker.register_service(tracking_session_id, "transcriber", TRANSCRIBER_STT_MODEL)
+    
+    vad_config, stt_sample_rate = stt_audio_settings()
     
     session = AgentSession(
         # Using session without VAD - will use default audio processing
@@ -119,8 +228,15 @@ async def entrypoint(ctx: JobContext):
     
     try:
         await session.start(
-            agent=ServiceDeskTranscriber(tracking_session_id),
+            agent=ServiceDeskTranscriber(
+                tracking_session_id,
+                vad_config,
+                stt_sample_rate,
+                room_name=ctx.room.name,
+                user_name=participant_name
+            ),
             room=ctx.room,
+            room_input_options=RoomInputOptions(audio_sample_rate=ROOM_INPUT_SAMPLE_RATE, audio_num_channels=1),
             room_output_options=RoomOutputOptions(
                 transcription_enabled=True,
                 # disable audio output since this is transcription only
@@ -133,15 +249,13 @@ async def entrypoint(ctx: JobContext):
         usage_summary = token_tracker.end_session(tracking_session_id, "transcriber")
         
         if usage_summary:
-            logger.info("Transcriber: Token Usage Summary:")
-            logger.info(f"  User: {usage_summary.get('user_name', 'Unknown')}")
-            logger.info(f"  Room: {usage_summary.get('room_name', 'Unknown')}")
-            
-            for service_type, service_data in usage_summary.get('services', {}).items():
-                logger.info(f"  {service_type.title()} Service ({service_data.get('model_name', 'Unknown')}):")
-                logger.info(f"    Input Tokens: {service_data.get('input_tokens', 0)}")
-                logger.info(f"    Output Tokens: {service_data.get('output_tokens', 0)}")
-                logger.info(f"    Total Tokens: {service_data.get('total_tokens', 0)}")
+            logger.info("Transcriber: Token usage summary", extra={"usage": usage_summary.get('services', {})})
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint))
+    worker_options = WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm)
+    # run_services.py gives each worker its own health check port
+    if os.getenv("WORKER_HTTP_PORT"):
+        worker_options.port = int(os.getenv("WORKER_HTTP_PORT"))
+    # Job processes inherit the id their loop lag is reported under
+    os.environ.setdefault("TRANSCRIBER_WORKER_ID", default_worker_id())
+    cli.run_app(worker_options)
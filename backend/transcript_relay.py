@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Transcript Relay
+Forwards final user transcripts from an AgentSession's user_input_transcribed events to
+listeners (token tracking, logging), whether the transcripts come from a separate STT or
+from the realtime model's own input audio transcription
+"""
+
+import asyncio
+import logging
+from types import SimpleNamespace
+from typing import Callable, List, Set
+
+logger = logging.getLogger("transcript-relay")
+
+# Where user transcripts come from
+TRANSCRIPTION_SOURCE_STT = "stt"            # separate gpt-4o-transcribe STT pass
+TRANSCRIPTION_SOURCE_REALTIME = "realtime"  # realtime model input audio transcription
+TRANSCRIPTION_SOURCES = (TRANSCRIPTION_SOURCE_STT, TRANSCRIPTION_SOURCE_REALTIME)
+
+# Text stream topic and attributes LiveKit agents use to publish transcriptions to the room
+TOPIC_TRANSCRIPTION = "lk.transcription"
+ATTRIBUTE_TRANSCRIPTION_FINAL = "lk.transcription_final"
+ATTRIBUTE_SEGMENT_ID = "lk.segment_id"
+
+def get_transcription_source(value: str) -> str:
+    """Validate a TRANSCRIPTION_SOURCE value, falling back to the separate STT"""
+    source = (value or TRANSCRIPTION_SOURCE_STT).strip().lower()
+    if source not in TRANSCRIPTION_SOURCES:
+        logger.warning(f"Unknown transcription source '{value}', using '{TRANSCRIPTION_SOURCE_STT}'")
+        return TRANSCRIPTION_SOURCE_STT
+    return source
+
+class TranscriptRelay:
+    def __init__(self, source: str = TRANSCRIPTION_SOURCE_STT):
+        self.source = source
+        self._listeners: List[Callable[[str], None]] = []
+        self._seen_item_ids = set()
+        self._room_tasks: Set[asyncio.Task] = set()
+        self.transcript_count = 0
+
+    def add_listener(self, callback: Callable[[str], None]):
+        """Call callback(transcript) for every final user transcript"""
+        self._listeners.append(callback)
+
+    def attach(self, session):
+        """Subscribe to a session's user_input_transcribed events"""
+        session.on("user_input_transcribed", self.on_user_input_transcribed)
+
+    def attach_room(self, room):
+        """Follow transcriptions another worker (the split-mode transcriber) publishes to the room"""
+        def on_text_stream(reader, participant_identity):
+            task = asyncio.create_task(self._read_room_transcription(reader))
+            self._room_tasks.add(task)
+            task.add_done_callback(self._room_tasks.discard)
+
+        room.register_text_stream_handler(TOPIC_TRANSCRIPTION, on_text_stream)
+
+    async def _read_room_transcription(self, reader):
+        # Interim updates arrive as their own streams; only the final one is relayed
+        attributes = reader.info.attributes or {}
+        text = await reader.read_all()
+        if attributes.get(ATTRIBUTE_TRANSCRIPTION_FINAL) != "true":
+            return
+        self.on_user_input_transcribed(SimpleNamespace(
+            transcript=text,
+            is_final=True,
+            item_id=attributes.get(ATTRIBUTE_SEGMENT_ID),
+        ))
+
+    def on_user_input_transcribed(self, event):
+        if not event.is_final:
+            return
+
+        transcript = (event.transcript or "").strip()
+        if not transcript:
+            return
+
+        # The realtime model can re-send a completed item; publish each one once
+        item_id = getattr(event, "item_id", None)
+        if item_id:
+            if item_id in self._seen_item_ids:
+                return
+            self._seen_item_ids.add(item_id)
+
+        self.transcript_count += 1
+        logger.info(f"Transcribed ({self.source}): {transcript}")
+
+        for listener in self._listeners:
+            try:
+                listener(transcript)
+            except Exception as e:
+                logger.error(f"Error in transcript listener: {e}")
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Voice Activity Gate
+Pure-NumPy energy / zero-crossing voice activity detector that drops silence before the
+caller's audio is sent to the cloud STT (Silero VAD is unavailable, see requirements.txt)
+"""
+
+import logging
+import os
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterable, AsyncIterator, List, Optional
+import numpy as np
+
+logger = logging.getLogger("vad-gate")
+
+# 10*log10 of the int16 full-scale power, so frame energy can be expressed in dBFS
+_FULL_SCALE_DB = 10 * np.log10(32768.0 ** 2)
+
+@dataclass
+class VADConfig:
+    energy_threshold_db: float = -50.0  # frames quieter than this (dBFS) are never speech
+    noise_margin_db: float = 9.0        # speech must be this far above the tracked noise floor
+    zcr_min: float = 0.01               # below this the frame is hum / DC rather than speech
+    zcr_max: float = 0.45               # above this the frame is hiss / broadband noise
+    noise_adapt_rate: float = 0.05      # how quickly the noise floor follows non-speech frames
+    speech_adapt_rate: float = 0.002    # noise floor creep during speech, so steady noise cannot hold the gate open
+    onset_s: float = 0.04               # speech needed before the gate opens
+    hangover_s: float = 0.4             # silence needed before the gate closes again
+    preroll_s: float = 0.2              # audio kept from before the onset, so words are not clipped
+
+    @classmethod
+    def from_env(cls) -> "VADConfig":
+        """Build a config from VAD_* environment variables, keeping defaults for unset ones"""
+        config = cls()
+        env_fields = {
+            "VAD_ENERGY_THRESHOLD_DB": "energy_threshold_db",
+            "VAD_NOISE_MARGIN_DB": "noise_margin_db",
+            "VAD_ZCR_MIN": "zcr_min",
+            "VAD_ZCR_MAX": "zcr_max",
+            "VAD_ONSET_MS": "onset_s",
+            "VAD_HANGOVER_MS": "hangover_s",
+            "VAD_PREROLL_MS": "preroll_s",
+        }
+        for env_name, field_name in env_fields.items():
+            value = os.getenv(env_name)
+            if not value:
+                continue
+            try:
+                number = float(value)
+            except ValueError:
+                logger.warning(f"Ignoring invalid {env_name}={value!r}")
+                continue
+            setattr(config, field_name, number / 1000.0 if env_name.endswith("_MS") else number)
+        return config
+
+class VADGate:
+    """Hangover state machine over per-frame energy/ZCR speech decisions"""
+
+    def __init__(self, config: Optional[VADConfig] = None):
+        self.config = config or VADConfig()
+        self.noise_floor_db = self.config.energy_threshold_db - self.config.noise_margin_db
+        self.is_open = False
+        self._onset_s = 0.0
+        self._silence_s = 0.0
+        self._preroll = deque()
+        self._preroll_duration_s = 0.0
+
+        # Stats for logging and benchmarks
+        self.frames_in = 0
+        self.frames_out = 0
+        self.seconds_in = 0.0
+        self.seconds_out = 0.0
+        self.segments = 0
+
+    def frame_features(self, samples: np.ndarray):
+        """Return (energy in dBFS, zero-crossing rate) for one mono int16 frame"""
+        n = samples.shape[0]
+        if n < 2:
+            return -120.0, 0.0
+
+        x = samples.astype(np.float32)
+        power = float(np.dot(x, x)) / n
+        energy_db = 10 * np.log10(power + 1e-9) - _FULL_SCALE_DB
+
+        signs = np.signbit(x)
+        zcr = np.count_nonzero(signs[1:] != signs[:-1]) / (n - 1)
+        return energy_db, zcr
+
+    def is_speech(self, samples: np.ndarray) -> bool:
+        """Per-frame speech decision, also updating the tracked noise floor"""
+        config = self.config
+        energy_db, zcr = self.frame_features(samples)
+
+        threshold_db = max(config.energy_threshold_db, self.noise_floor_db + config.noise_margin_db)
+        speech = energy_db > threshold_db and config.zcr_min <= zcr <= config.zcr_max
+
+        adapt_rate = config.speech_adapt_rate if speech else config.noise_adapt_rate
+        self.noise_floor_db += adapt_rate * (energy_db - self.noise_floor_db)
+        return speech
+
+    def process(self, frame, samples: np.ndarray, duration_s: float) -> List:
+        """Feed one frame; return the frames (possibly none) to forward to the STT"""
+        config = self.config
+        self.frames_in += 1
+        self.seconds_in += duration_s
+        speech = self.is_speech(samples)
+
+        if self.is_open:
+            if speech:
+                self._silence_s = 0.0
+            else:
+                self._silence_s += duration_s
+                if self._silence_s >= config.hangover_s:
+                    self.is_open = False
+                    self._onset_s = 0.0
+                    self._push_preroll(frame, duration_s)
+                    return []
+            return self._forward([frame], duration_s)
+
+        self._push_preroll(frame, duration_s)
+        self._onset_s = self._onset_s + duration_s if speech else 0.0
+        if self._onset_s < config.onset_s:
+            return []
+
+        # Onset confirmed: open the gate and flush the pre-roll, which includes this frame
+        self.is_open = True
+        self.segments += 1
+        self._silence_s = 0.0
+        frames = [preroll_frame for preroll_frame, _ in self._preroll]
+        preroll_duration_s = self._preroll_duration_s
+        self._preroll.clear()
+        self._preroll_duration_s = 0.0
+        return self._forward(frames, preroll_duration_s)
+
+    def _push_preroll(self, frame, duration_s: float):
+        self._preroll.append((frame, duration_s))
+        self._preroll_duration_s += duration_s
+        while len(self._preroll) > 1 and self._preroll_duration_s - self._preroll[0][1] >= self.config.preroll_s:
+            _, dropped_s = self._preroll.popleft()
+            self._preroll_duration_s -= dropped_s
+
+    def _forward(self, frames: List, duration_s: float) -> List:
+        self.frames_out += len(frames)
+        self.seconds_out += duration_s
+        return frames
+
+    async def gate(self, audio: AsyncIterable) -> AsyncIterator:
+        """Filter a stream of rtc.AudioFrame, yielding only frames around detected speech"""
+        try:
+            async for frame in audio:
+                samples = np.frombuffer(frame.data, dtype=np.int16)
+                if frame.num_channels > 1:
+                    samples = samples[::frame.num_channels]
+                duration_s = frame.samples_per_channel / frame.sample_rate
+                for out_frame in self.process(frame, samples, duration_s):
+                    yield out_frame
+        finally:
+            if self.seconds_in > 0:
+                logger.info(
+                    f"VAD gate sent {self.seconds_out:.1f}s of {self.seconds_in:.1f}s audio "
+                    f"({100 * self.seconds_out / self.seconds_in:.0f}%) in {self.segments} segments"
+                )
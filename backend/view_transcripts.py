@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Transcript Viewer
+Utility script for supervisors to read a call's transcript or search across calls
+"""
+
+import argparse
+import json
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from db_transcript import transcript_db
+
+def print_turns(turns, show_call: bool = False):
+    """Print formatted transcript turns"""
+    for turn in turns:
+        call = f" [{turn.room_name or turn.session_id}]" if show_call else ""
+        print(f"{turn.created_at.strftime('%Y-%m-%d %H:%M:%S')}{call} {turn.speaker.upper()}: {turn.text}")
+
+def main():
+    parser = argparse.ArgumentParser(description="View and search call transcripts")
+    parser.add_argument("--call", type=str, help="Show the transcript for a session ID or room name")
+    parser.add_argument("--search", type=str, help="Full-text search across calls (FTS5 syntax)")
+    parser.add_argument("--user", type=str, help="Only search calls for this user name")
+    parser.add_argument("--days", type=int, default=30, help="Number of days to search (default: 30)")
+    parser.add_argument("--limit", type=int, default=50, help="Maximum search results (default: 50)")
+    parser.add_argument("--json", action="store_true", help="Output as JSON")
+
+    args = parser.parse_args()
+
+    if args.call:
+        turns = transcript_db.get_call_transcript(args.call)
+    elif args.search:
+        start_date = datetime.now() - timedelta(days=args.days)
+        turns = transcript_db.search(args.search, user_name=args.user, start_date=start_date, limit=args.limit)
+    else:
+        parser.print_help()
+        return
+
+    if args.json:
+        print(json.dumps([asdict(turn) for turn in turns], indent=2, default=str))
+    elif not turns:
+        print("No transcript turns found")
+    else:
+        print_turns(turns, show_call=not args.call)
+
+if __name__ == "__main__":
+    main()
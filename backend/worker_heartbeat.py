@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Worker Heartbeat Store
+Agent workers record their call capacity, the calls they are serving, their tool call
+latencies and their jobs' event-loop lag in a local SQLite file. The token server reads it to
+decide whether a new caller can be given a room now, and to report per-worker metrics
+"""
+
+import bisect
+import json
+import logging
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("worker-heartbeat")
+
+HEARTBEAT_DB_PATH = os.getenv("WORKER_HEARTBEAT_DB", "worker_heartbeats.sqlite")
+
+# Upper bounds of the event-loop lag histogram buckets in seconds; a last bucket takes the rest
+LOOP_LAG_BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+@dataclass
+class CapacitySnapshot:
+    workers: int             # workers with a fresh heartbeat
+    capacity: int            # total concurrent calls those workers accept
+    active_calls: int        # calls in progress on those workers
+    rooms: frozenset         # room names of those calls
+    avg_call_s: Optional[float]  # mean duration of recently finished calls
+    degraded: int = 0        # live workers whose event-loop lag keeps them from taking new calls
+
+    @property
+    def free(self) -> int:
+        return max(0, self.capacity - self.active_calls)
+
+@dataclass
+class WorkerLoad:
+    worker_id: str
+    capacity: int
+    active_calls: int
+    heartbeat_age_s: float
+
+@dataclass
+class LagHistogram:
+    """Event-loop lag samples counted into LOOP_LAG_BUCKETS_S, plus stalls over the threshold"""
+    counts: List[int] = field(default_factory=lambda: [0] * (len(LOOP_LAG_BUCKETS_S) + 1))
+    sum_s: float = 0.0
+    max_s: float = 0.0
+    stalls: int = 0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, lag_s: float):
+        self.counts[bisect.bisect_left(LOOP_LAG_BUCKETS_S, lag_s)] += 1
+        self.sum_s += lag_s
+        self.max_s = max(self.max_s, lag_s)
+
+    def merge(self, other: "LagHistogram"):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.sum_s += other.sum_s
+        self.max_s = max(self.max_s, other.max_s)
+        self.stalls += other.stalls
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th sample (the maximum for the last bucket)"""
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for bound, count in zip(LOOP_LAG_BUCKETS_S, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max_s
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    rank = math.ceil(q * len(sorted_values))
+    return sorted_values[min(len(sorted_values), max(1, rank)) - 1]
+
+class WorkerHeartbeatStore:
+    def __init__(self, db_path: str = HEARTBEAT_DB_PATH):
+        self.db_path = db_path
+        # The schema is created on first use, so importing this module doesn't touch the disk
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        # WAL lets every worker write its heartbeat while the token server reads
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def ensure_initialized(self):
+        """Create the schema if this is the first use"""
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self.init_database()
+                    self._initialized = True
+
+    def _connect(self):
+        self.ensure_initialized()
+        return self._open()
+
+    def init_database(self):
+        with self._open() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS workers (
+                    worker_id TEXT PRIMARY KEY,
+                    capacity INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS calls (
+                    room_name TEXT PRIMARY KEY,
+                    worker_id TEXT NOT NULL,
+                    started_at REAL NOT NULL,
+                    ended_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_calls_ended ON calls(ended_at)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tool_calls (
+                    worker_id TEXT NOT NULL,
+                    tool TEXT NOT NULL,
+                    duration_s REAL NOT NULL,
+                    finished_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tool_calls_finished ON tool_calls(finished_at)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS loop_lag (
+                    worker_id TEXT NOT NULL,
+                    counts TEXT NOT NULL,
+                    sum_s REAL NOT NULL,
+                    max_s REAL NOT NULL,
+                    stalls INTEGER NOT NULL,
+                    recorded_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_loop_lag_recorded ON loop_lag(recorded_at)")
+            conn.commit()
+
+    def beat(self, worker_id: str, capacity: int):
+        with self._connect() as conn:
+            conn.execute("""
+                INSERT INTO workers (worker_id, capacity, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(worker_id) DO UPDATE SET capacity = excluded.capacity, updated_at = excluded.updated_at
+            """, (worker_id, capacity, time.time()))
+            conn.commit()
+
+    def remove_worker(self, worker_id: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+            conn.execute("UPDATE calls SET ended_at = ? WHERE worker_id = ? AND ended_at IS NULL",
+                         (time.time(), worker_id))
+            conn.commit()
+
+    def call_started(self, worker_id: str, room_name: str):
+        with self._connect() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO calls (room_name, worker_id, started_at, ended_at)
+                VALUES (?, ?, ?, NULL)
+            """, (room_name, worker_id, time.time()))
+            conn.commit()
+
+    def call_ended(self, room_name: str):
+        with self._connect() as conn:
+            conn.execute("UPDATE calls SET ended_at = ? WHERE room_name = ? AND ended_at IS NULL",
+                         (time.time(), room_name))
+            conn.commit()
+
+    def snapshot(self, stale_after_s: float = 15.0, max_call_s: float = 7200.0,
+                 duration_window_s: float = 3600.0, max_loop_lag_s: Optional[float] = None,
+                 lag_window_s: float = 60.0, lag_quantile: float = 0.99) -> CapacitySnapshot:
+        """Capacity of the live workers; calls of workers that stopped beating don't count.
+        With max_loop_lag_s, a worker whose jobs' event-loop lag (lag_quantile over the last
+        lag_window_s) exceeds it keeps its calls but offers no free slots"""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT worker_id, capacity FROM workers WHERE updated_at >= ?",
+                           (now - stale_after_s,))
+            capacities = dict(cursor.fetchall())
+
+            cursor.execute("""
+                SELECT c.room_name, c.worker_id FROM calls c JOIN workers w ON w.worker_id = c.worker_id
+                WHERE c.ended_at IS NULL AND w.updated_at >= ? AND c.started_at >= ?
+            """, (now - stale_after_s, now - max_call_s))
+            calls = cursor.fetchall()
+            rooms = frozenset(room for room, _ in calls)
+
+            cursor.execute("SELECT AVG(ended_at - started_at) FROM calls WHERE ended_at >= ?",
+                           (now - duration_window_s,))
+            avg_call_s = cursor.fetchone()[0]
+
+            degraded = set()
+            if max_loop_lag_s is not None:
+                lag = self._loop_lag(conn, now - lag_window_s)
+                degraded = {worker_id for worker_id in capacities
+                            if worker_id in lag and lag[worker_id].quantile(lag_quantile) > max_loop_lag_s}
+
+        if degraded:
+            active = Counter(worker_id for _, worker_id in calls)
+            for worker_id in degraded:
+                capacities[worker_id] = min(capacities[worker_id], active[worker_id])
+        return CapacitySnapshot(len(capacities), sum(capacities.values()), len(rooms), rooms, avg_call_s,
+                                len(degraded))
+
+    def worker_loads(self, stale_after_s: float = 15.0, max_call_s: float = 7200.0) -> List[WorkerLoad]:
+        """Capacity and calls in progress for each live worker"""
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute("""
+                SELECT w.worker_id, w.capacity, w.updated_at,
+                       (SELECT COUNT(*) FROM calls c
+                        WHERE c.worker_id = w.worker_id AND c.ended_at IS NULL AND c.started_at >= ?)
+                FROM workers w WHERE w.updated_at >= ? ORDER BY w.worker_id
+            """, (now - max_call_s, now - stale_after_s)).fetchall()
+        return [WorkerLoad(worker_id, capacity, active, now - updated_at)
+                for worker_id, capacity, updated_at, active in rows]
+
+    def record_tool_calls(self, worker_id: str, samples: Iterable[Tuple[str, float, float]]):
+        """Store (tool, duration_s, finished_at) samples from one job"""
+        with self._connect() as conn:
+            conn.executemany("INSERT INTO tool_calls (worker_id, tool, duration_s, finished_at) VALUES (?, ?, ?, ?)",
+                             ((worker_id, tool, duration_s, finished_at) for tool, duration_s, finished_at in samples))
+            conn.commit()
+
+    def tool_latency(self, window_s: float = 900.0,
+                     quantiles: Tuple[float, ...] = (0.5, 0.95, 0.99)) -> Dict[str, Dict[str, float]]:
+        """Latency percentiles per tool over the last window_s seconds, plus count and sum"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT tool, duration_s FROM tool_calls WHERE finished_at >= ? ORDER BY tool",
+                                (time.time() - window_s,)).fetchall()
+        by_tool: Dict[str, List[float]] = {}
+        for tool, duration_s in rows:
+            by_tool.setdefault(tool, []).append(duration_s)
+
+        stats = {}
+        for tool, durations in by_tool.items():
+            durations.sort()
+            stats[tool] = {"count": len(durations), "sum": sum(durations)}
+            for q in quantiles:
+                stats[tool][str(q)] = percentile(durations, q)
+        return stats
+
+    def record_loop_lag(self, worker_id: str, histogram: LagHistogram):
+        """Store the lag one job measured since its previous report"""
+        with self._connect() as conn:
+            conn.execute("""
+                INSERT INTO loop_lag (worker_id, counts, sum_s, max_s, stalls, recorded_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (worker_id, json.dumps(histogram.counts), histogram.sum_s, histogram.max_s,
+                  histogram.stalls, time.time()))
+            conn.commit()
+
+    @staticmethod
+    def _loop_lag(conn, since: float) -> Dict[str, LagHistogram]:
+        by_worker: Dict[str, LagHistogram] = {}
+        rows = conn.execute("SELECT worker_id, counts, sum_s, max_s, stalls FROM loop_lag WHERE recorded_at >= ?",
+                            (since,))
+        for worker_id, counts, sum_s, max_s, stalls in rows:
+            by_worker.setdefault(worker_id, LagHistogram()).merge(
+                LagHistogram(json.loads(counts), sum_s, max_s, stalls))
+        return by_worker
+
+    def loop_lag(self, window_s: float = 900.0) -> Dict[str, LagHistogram]:
+        """Event-loop lag of each worker's jobs over the last window_s seconds"""
+        with self._connect() as conn:
+            return self._loop_lag(conn, time.time() - window_s)
+
+    def purge(self, older_than_s: float = 86400.0):
+        """Drop finished calls, tool and lag samples and dead workers older than older_than_s"""
+        cutoff = time.time() - older_than_s
+        with self._connect() as conn:
+            conn.execute("DELETE FROM calls WHERE ended_at IS NOT NULL AND ended_at < ?", (cutoff,))
+            conn.execute("DELETE FROM tool_calls WHERE finished_at < ?", (cutoff,))
+            conn.execute("DELETE FROM loop_lag WHERE recorded_at < ?", (cutoff,))
+            conn.execute("DELETE FROM workers WHERE updated_at < ?", (cutoff,))
+            conn.commit()
+
+class HeartbeatPublisher:
+    """Background thread in the worker's main process that keeps its heartbeat fresh"""
+
+    def __init__(self, store: WorkerHeartbeatStore, worker_id: str, capacity: int, interval_s: float = 5.0):
+        self.store = store
+        self.worker_id = worker_id
+        self.capacity = capacity
+        self.interval_s = interval_s
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="worker-heartbeat", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.interval_s)
+        try:
+            self.store.remove_worker(self.worker_id)
+        except Exception as e:
+            logger.error(f"Error removing worker heartbeat: {e}")
+
+    def _run(self):
+        # Old calls and samples are dropped whenever a worker starts
+        try:
+            self.store.purge()
+        except Exception as e:
+            logger.error(f"Error purging worker heartbeat store: {e}")
+        while not self._stop.is_set():
+            try:
+                self.store.beat(self.worker_id, self.capacity)
+            except Exception as e:
+                logger.error(f"Error writing worker heartbeat: {e}")
+            self._stop.wait(self.interval_s)
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+# Global instance
+heartbeat_store = WorkerHeartbeatStore()
@@ -1,4 +1,4 @@
-import { useState, useCallback } from "react";
+import { useState, useCallback, useRef } from "react";
 import { LiveKitRoom, RoomAudioRenderer } from "@livekit/components-react";
 import "@livekit/components-styles";
 import PropTypes from "prop-types";
@@ -8,20 +8,67 @@ const LiveKitModal = ({ setShowSupport }) => {
   const [isSubmittingName, setIsSubmittingName] = useState(true);
   const [name, setName] = useState("");
   const [token, setToken] = useState(null);
+  // Place in line while all agents are busy: { ticket, position, estimated_wait_s }
+  const [queueStatus, setQueueStatus] = useState(null);
+  const [error, setError] = useState(null);
+  const queueTicketRef = useRef(null);
+
+  // Long-poll the token server until this caller is admitted or leaves the queue
+  const waitInQueue = useCallback(async (status) => {
+    queueTicketRef.current = status.ticket;
+    setQueueStatus(status);
+    while (queueTicketRef.current === status.ticket) {
+      const response = await fetch(`/api/queue/${status.ticket}?wait=20`);
+      if (queueTicketRef.current !== status.ticket) return null;
+      if (!response.ok) throw new Error("Lost place in the support queue");
+      const update = await response.json();
+      if (update.status === "admitted") {
+        queueTicketRef.current = null;
+        setQueueStatus(null);
+        return update.token;
+      }
+      setQueueStatus(update);
+    }
+    return null;
+  }, []);
 
   const getToken = useCallback(async (userName) => {
     try {
-      console.log("run")
+      setError(null);
+      setIsSubmittingName(false);
       const response = await fetch(
         `/api/getToken?name=${encodeURIComponent(userName)}`
       );
-      const token = await response.text();
-      setToken(token);
-      setIsSubmittingName(false);
+      let token = null;
+      if (response.status === 202) {
+        token = await waitInQueue(await response.json());
+      } else if (response.ok) {
+        token = await response.text();
+      } else {
+        const body = await response.json().catch(() => ({}));
+        throw new Error(body.error || "Failed to get a token");
+      }
+      if (token) {
+        setToken(token);
+      }
     } catch (error) {
       console.error(error);
+      setError(error.message);
+      setQueueStatus(null);
+      setIsSubmittingName(true);
     }
-  }, []);
+  }, [waitInQueue]);
+
+  const leaveQueue = useCallback(() => {
+    const ticket = queueTicketRef.current;
+    queueTicketRef.current = null;
+    setQueueStatus(null);
+    if (ticket) {
+      fetch(`/api/queue/${ticket}`, { method: "DELETE" }).catch(console.error);
+    }
+    setIsSubmittingName(true);
+    setShowSupport(false);
+  }, [setShowSupport]);
 
   const handleNameSubmit = (e) => {
     e.preventDefault();
@@ -54,6 +101,7 @@ const LiveKitModal = ({ setShowSupport }) => {
           {isSubmittingName ? (
             <form onSubmit={handleNameSubmit} className="name-form">
               <h2>Enter your name to connect with support</h2>
+              {error && <p className="error-message">{error}</p>}
               <input
                 type="text"
                 value={name}
@@ -82,6 +130,18 @@ const LiveKitModal = ({ setShowSupport }) => {
               <RoomAudioRenderer />
               <SimpleVoiceAssistant />
             </LiveKitRoom>
+          ) : queueStatus ? (
+            <div className="queue-status">
+              <h2>All support agents are busy</h2>
+              <p>You are number {queueStatus.position} in line.</p>
+              <p>
+                Estimated wait: about{" "}
+                {Math.max(1, Math.round(queueStatus.estimated_wait_s / 60))} min
+              </p>
+              <button type="button" className="cancel-button" onClick={leaveQueue}>
+                Leave queue
+              </button>
+            </div>
           ) : null}
         </div>
       </div>